@@ -0,0 +1,324 @@
+"""
+PermitIQ - Transform Microbenchmarks: harness and fixtures
+
+Each benchmark runs a hot-path function over a batch of synthetic but
+realistic features and records:
+
+- time per record: best of several passes, divided by a calibration loop timed
+  on the same machine so baselines carry across CI runners and laptops
+- bytes per record: tracemalloc peak while one pass runs with its output kept,
+  as the ETL keeps its transformed permits
+
+Results are compared with benchmarks/baselines.json; a benchmark fails when
+either figure exceeds its baseline by more than the tolerance.
+
+Usage:
+    pytest benchmarks                       # compare with baselines
+    pytest benchmarks --update-baselines    # record new baselines
+
+Tolerances (fractions over baseline):
+    PERMITIQ_BENCH_TIME_TOLERANCE   default 0.5 (timings are noisy)
+    PERMITIQ_BENCH_ALLOC_TOLERANCE  default 0.2
+"""
+
+import gc
+import os
+import sys
+import json
+import math
+import random
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import pytest
+
+ETL_DIR = Path(__file__).resolve().parent.parent / 'etl'
+sys.path.insert(0, str(ETL_DIR))
+
+from sources import SWFWMD_FIELD_MAP, PermitSource  # noqa: E402
+
+BASELINES_PATH = Path(__file__).resolve().parent / 'baselines.json'
+
+TIME_TOLERANCE = float(os.getenv('PERMITIQ_BENCH_TIME_TOLERANCE', '0.5'))
+ALLOC_TOLERANCE = float(os.getenv('PERMITIQ_BENCH_ALLOC_TOLERANCE', '0.2'))
+
+# Timed passes per benchmark (best is kept)
+TIMING_PASSES = 5
+
+# Tampa Bay area, where most SWFWMD permits are
+CENTER_LON = -82.45
+CENTER_LAT = 27.95
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--update-baselines', action='store_true', default=False,
+        help='Record benchmark results as the new baselines instead of comparing'
+    )
+
+
+def calibration_ns() -> float:
+    """
+    Time a fixed pure-Python workload (string formatting, dict building)
+
+    Benchmark times are stored relative to this, so a baseline recorded on
+    one machine is usable on a faster or slower one.
+
+    Returns:
+        Best time in nanoseconds
+    """
+    def workload():
+        rows = []
+        for i in range(20000):
+            rows.append({'key': f"{i} {i * 0.5}", 'value': i % 7 or None})
+        return [row for row in rows if row['value'] is not None]
+
+    best = float('inf')
+    for _ in range(TIMING_PASSES):
+        start = time.perf_counter_ns()
+        workload()
+        best = min(best, time.perf_counter_ns() - start)
+    return best
+
+
+class BenchmarkRecorder:
+    """
+    Runs benchmarks and checks them against the stored baselines
+    """
+
+    def __init__(self, update: bool):
+        self.update = update
+        self.calibration = calibration_ns()
+        self.results: Dict[str, Dict[str, float]] = {}
+        self.baselines: Dict[str, Any] = {}
+        if BASELINES_PATH.exists():
+            self.baselines = json.loads(BASELINES_PATH.read_text())
+
+    def measure(self, batch: Callable[[List[Any]], Any], records: List[Any]) -> Dict[str, float]:
+        """
+        Time and trace one batch function
+
+        Args:
+            batch: Processes all records and returns the output
+            records: Benchmark input
+
+        Returns:
+            {'ns_per_record', 'time_ratio', 'bytes_per_record'}
+        """
+        count = len(records)
+        batch(records)  # warm-up
+
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            best = float('inf')
+            for _ in range(TIMING_PASSES):
+                start = time.perf_counter_ns()
+                batch(records)
+                best = min(best, time.perf_counter_ns() - start)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            output = batch(records)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del output
+
+        ns_per_record = best / count
+        return {
+            'ns_per_record': round(ns_per_record, 1),
+            'time_ratio': round(ns_per_record / self.calibration, 9),
+            'bytes_per_record': round(peak / count, 1),
+        }
+
+    def check(self, name: str, batch: Callable[[List[Any]], Any], records: List[Any]) -> Dict[str, float]:
+        """
+        Measure a benchmark and fail on regression past the tolerances
+
+        Args:
+            name: Baseline key
+            batch: Processes all records and returns the output
+            records: Benchmark input
+
+        Returns:
+            Measured figures
+        """
+        result = self.measure(batch, records)
+        self.results[name] = result
+        if self.update:
+            return result
+
+        baseline = self.baselines.get(name)
+        if baseline is None:
+            pytest.skip(f"No baseline for {name}; run pytest benchmarks --update-baselines")
+
+        failures = []
+        time_limit = baseline['time_ratio'] * (1 + TIME_TOLERANCE)
+        if result['time_ratio'] > time_limit:
+            failures.append(
+                f"time {result['ns_per_record']:,.0f} ns/record is "
+                f"{result['time_ratio'] / baseline['time_ratio']:.2f}x baseline "
+                f"(limit {1 + TIME_TOLERANCE:.2f}x)"
+            )
+        alloc_limit = baseline['bytes_per_record'] * (1 + ALLOC_TOLERANCE)
+        if result['bytes_per_record'] > alloc_limit:
+            failures.append(
+                f"memory {result['bytes_per_record']:,.0f} B/record vs baseline "
+                f"{baseline['bytes_per_record']:,.0f} (limit {alloc_limit:,.0f})"
+            )
+        if failures:
+            pytest.fail(f"{name} regressed: " + '; '.join(failures))
+        return result
+
+    def save(self) -> None:
+        """Merge this session's results into baselines.json"""
+        baselines = {**self.baselines, **self.results}
+        baselines['_meta'] = {
+            'python': sys.version.split()[0],
+            'calibration_ns': round(self.calibration),
+            'recorded_at': time.strftime('%Y-%m-%d'),
+        }
+        BASELINES_PATH.write_text(json.dumps(dict(sorted(baselines.items())), indent=2) + '\n')
+
+
+@pytest.fixture(scope='session')
+def bench(request):
+    """Session-wide benchmark recorder; writes baselines at the end with --update-baselines"""
+    recorder = BenchmarkRecorder(update=request.config.getoption('--update-baselines'))
+    yield recorder
+    if recorder.update and recorder.results:
+        recorder.save()
+
+
+# ============================================================================
+# Synthetic features
+# ============================================================================
+
+def make_ring(rng: random.Random, vertices: int, radius: float,
+              center: Optional[tuple] = None) -> List[List[float]]:
+    """
+    Closed, roughly circular ring with jittered vertices
+
+    Args:
+        rng: Random source
+        vertices: Distinct vertices (the closing vertex is added)
+        radius: Radius in degrees
+        center: (lon, lat); random around Tampa Bay if None
+
+    Returns:
+        [[lon, lat], ...] with the first vertex repeated last
+    """
+    if center is None:
+        center = (CENTER_LON + rng.uniform(-0.5, 0.5), CENTER_LAT + rng.uniform(-0.5, 0.5))
+    ring = []
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices
+        r = radius * rng.uniform(0.85, 1.0)
+        ring.append([round(center[0] + r * math.cos(angle), 8), round(center[1] + r * math.sin(angle), 8)])
+    ring.append(list(ring[0]))
+    return ring
+
+
+def make_attributes(rng: random.Random, objectid: int, permit_number: Optional[str] = None) -> Dict[str, Any]:
+    """Attributes of one SWFWMD permit feature"""
+    issued = rng.randint(1_262_304_000_000, 1_760_000_000_000)  # 2010-2025, epoch ms
+    return {
+        SWFWMD_FIELD_MAP['objectid']: objectid,
+        SWFWMD_FIELD_MAP['permit_number']: permit_number or f"43{rng.randint(0, 999999):06d}.{rng.randint(0, 20):03d}",
+        SWFWMD_FIELD_MAP['applicant_name']: rng.choice([
+            'D.R. Horton, Inc. - Jacksonville', 'Lennar Homes, LLC', 'Pulte Home Company, LLC',
+            'Hillsborough County BOCC', 'Florida Department of Transportation', None,
+        ]),
+        SWFWMD_FIELD_MAP['permit_type']: rng.choice(['Individual', 'General', 'Conceptual', 'Minor Modification']),
+        SWFWMD_FIELD_MAP['permit_status']: rng.choice(['Issued', 'Pending', 'Withdrawn', 'Denied']),
+        SWFWMD_FIELD_MAP['activity_description']: rng.choice([
+            'Residential Subdivision', 'Commercial', 'Road Widening', 'Stormwater Retrofit', None,
+        ]),
+        SWFWMD_FIELD_MAP['application_date']: issued - rng.randint(0, 200) * 86_400_000,
+        SWFWMD_FIELD_MAP['issue_date']: issued,
+        SWFWMD_FIELD_MAP['expiration_date']: issued + 5 * 365 * 86_400_000 if rng.random() < 0.8 else None,
+        SWFWMD_FIELD_MAP['last_modified_date']: issued + rng.randint(0, 400) * 86_400_000,
+        SWFWMD_FIELD_MAP['project_name']: f"{rng.choice(['Oak', 'Cypress', 'Heron', 'Palm'])} "
+                                           f"{rng.choice(['Creek', 'Landing', 'Preserve', 'Phase 2'])}",
+        SWFWMD_FIELD_MAP['acreage']: round(rng.uniform(0.1, 800), 2) if rng.random() < 0.3 else None,
+        SWFWMD_FIELD_MAP['shape_area']: rng.uniform(1e-7, 1e-3),
+        SWFWMD_FIELD_MAP['shape_length']: rng.uniform(1e-3, 0.5),
+    }
+
+
+@pytest.fixture(scope='session')
+def swfwmd_source() -> PermitSource:
+    return PermitSource('SWFWMD', 'Southwest Florida WMD', field_map=SWFWMD_FIELD_MAP)
+
+
+@pytest.fixture(scope='session')
+def small_parcels() -> List[Dict[str, Any]]:
+    """Lots and small sites: 4-8 vertex single-ring polygons"""
+    rng = random.Random(1)
+    return [
+        {'attributes': make_attributes(rng, i), 'geometry': {'rings': [make_ring(rng, rng.randint(4, 8), 0.001)]}}
+        for i in range(2000)
+    ]
+
+
+@pytest.fixture(scope='session')
+def subdivisions() -> List[Dict[str, Any]]:
+    """Large subdivisions: one 5,000-vertex ring each"""
+    rng = random.Random(2)
+    return [
+        {'attributes': make_attributes(rng, i), 'geometry': {'rings': [make_ring(rng, 5000, 0.02)]}}
+        for i in range(20)
+    ]
+
+
+@pytest.fixture(scope='session')
+def multi_ring_polygons() -> List[Dict[str, Any]]:
+    """Sites with preserved wetlands: a 400-vertex outer ring and 8 holes of 50"""
+    rng = random.Random(3)
+    features = []
+    for i in range(100):
+        center = (CENTER_LON + rng.uniform(-0.5, 0.5), CENTER_LAT + rng.uniform(-0.5, 0.5))
+        # ArcGIS outer rings are clockwise, holes counter-clockwise
+        rings = [make_ring(rng, 400, 0.01, center)[::-1]]
+        for _ in range(8):
+            hole_center = (center[0] + rng.uniform(-0.004, 0.004), center[1] + rng.uniform(-0.004, 0.004))
+            rings.append(make_ring(rng, 50, 0.0008, hole_center))
+        features.append({'attributes': make_attributes(rng, i), 'geometry': {'rings': rings}})
+    return features
+
+
+@pytest.fixture(scope='session')
+def null_geometries() -> List[Dict[str, Any]]:
+    """Features without a usable polygon (attribute-only fetches, bad records)"""
+    rng = random.Random(4)
+    shapes = [None, {}, {'rings': []}]
+    features = []
+    for i in range(2000):
+        feature = {'attributes': make_attributes(rng, i)}
+        shape = shapes[i % 4] if i % 4 < 3 else 'absent'
+        if shape != 'absent':
+            feature['geometry'] = shape
+        features.append(feature)
+    return features
+
+
+@pytest.fixture(scope='session')
+def revisions_for_dedup(swfwmd_source) -> List[Dict[str, Any]]:
+    """Transformed-permit shaped rows: 10,000 permits with 1-4 revisions each, shuffled"""
+    rng = random.Random(5)
+    rows = []
+    objectid = 0
+    for p in range(10000):
+        permit_number = f"43{p:06d}.000"
+        for _ in range(rng.randint(1, 4)):
+            objectid += 1
+            rows.append({'objectid': objectid, 'permit_number': permit_number, 'data_source': swfwmd_source.data_source})
+    rng.shuffle(rows)
+    return rows
@@ -0,0 +1,98 @@
+"""
+PermitIQ - Transform Hot-Path Benchmarks
+
+Per-record functions the ETL runs over every feature of every district:
+streaming decode of JSON pages, transform_permit (per geometry shape),
+_parse_timestamp, deduplicate_permits and the ring centroid shared with the
+layer profiler. See conftest.py for the harness and baselines.
+"""
+
+import json
+
+import pytest
+
+import arcgis_json
+from arcgis_json import STREAM_CHUNK_SIZE, iter_features
+from fetch_permits import PermitIQETL
+from geometry import ring_centroid
+
+
+@pytest.fixture(scope='session')
+def etl() -> PermitIQETL:
+    """ETL instance without a Supabase client (the transform methods don't use it)"""
+    return PermitIQETL.__new__(PermitIQETL)
+
+
+def response_chunks(body: bytes):
+    return (body[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(body), STREAM_CHUNK_SIZE))
+
+
+def test_decode_json_page(bench, monkeypatch, small_parcels, subdivisions):
+    # Baselines are for the stdlib decoder (orjson is optional)
+    monkeypatch.setenv('PERMITIQ_API_JSON_BACKEND', 'stdlib')
+    arcgis_json.fast_loads.cache_clear()
+    try:
+        features = small_parcels[:980] + subdivisions
+        pages = [
+            json.dumps({'features': features[i:i + 100]}, separators=(',', ':')).encode()
+            for i in range(0, len(features), 100)
+        ]
+        assert list(iter_features(response_chunks(pages[0]))) == features[:100]
+
+        bench.check('decode_json_page', lambda bodies: [list(iter_features(response_chunks(b))) for b in bodies], pages)
+    finally:
+        arcgis_json.fast_loads.cache_clear()
+
+
+def transform_batch(etl, source):
+    return lambda features: [etl.transform_permit(feature, source) for feature in features]
+
+
+def test_transform_small_parcels(bench, etl, swfwmd_source, small_parcels):
+    permits = transform_batch(etl, swfwmd_source)(small_parcels[:1])
+    assert permits[0]['geometry'].startswith('MULTIPOLYGON(((')
+    assert permits[0]['location'].startswith('POINT(')
+
+    bench.check('transform_small_parcels', transform_batch(etl, swfwmd_source), small_parcels)
+
+
+def test_transform_subdivisions(bench, etl, swfwmd_source, subdivisions):
+    bench.check('transform_5000_vertex_subdivisions', transform_batch(etl, swfwmd_source), subdivisions)
+
+
+def test_transform_multi_ring(bench, etl, swfwmd_source, multi_ring_polygons):
+    permits = transform_batch(etl, swfwmd_source)(multi_ring_polygons[:1])
+    assert permits[0]['geometry'].count('(') == 2 + 9
+
+    bench.check('transform_multi_ring_polygons', transform_batch(etl, swfwmd_source), multi_ring_polygons)
+
+
+def test_transform_null_geometry(bench, etl, swfwmd_source, null_geometries):
+    permits = transform_batch(etl, swfwmd_source)(null_geometries)
+    assert not any('geometry' in permit or 'location' in permit for permit in permits)
+
+    bench.check('transform_null_geometry', transform_batch(etl, swfwmd_source), null_geometries)
+
+
+def test_parse_timestamp(bench, etl, small_parcels):
+    timestamps = [
+        value
+        for feature in small_parcels
+        for key, value in feature['attributes'].items()
+        if key.endswith('_DT')
+    ]
+
+    bench.check('parse_timestamp', lambda values: [etl._parse_timestamp(v) for v in values], timestamps)
+
+
+def test_deduplicate_permits(bench, etl, revisions_for_dedup):
+    deduplicated = etl.deduplicate_permits(revisions_for_dedup)
+    assert len(deduplicated) == 10000
+
+    bench.check('deduplicate_permits', etl.deduplicate_permits, revisions_for_dedup)
+
+
+def test_ring_centroid(bench, subdivisions, small_parcels):
+    rings = [feature['geometry']['rings'][0] for feature in subdivisions + small_parcels]
+
+    bench.check('ring_centroid', lambda batch: [ring_centroid(ring) for ring in batch], rings)
@@ -0,0 +1,302 @@
+-- PermitIQ Database Schema - Migration 011
+-- Run-versioned result cache for dashboard RPCs
+-- Version: 1.0.0
+-- Created: 2026-10-19
+
+-- ============================================================================
+-- PROBLEM
+-- ============================================================================
+-- Dashboard widgets (get_dashboard_permits_over_time, get_year_over_year_comparison,
+-- get_acreage_leaderboard, get_expiring_permits_summary, ...) re-aggregate
+-- erp_permits on every page view, even though the data only changes when the
+-- weekly ETL runs.
+--
+-- ============================================================================
+-- SOLUTION
+-- ============================================================================
+-- Cache each RPC result keyed by (function, arguments, latest etl_run_id
+-- that loaded data). A new ETL run that loads data changes the key, so stale
+-- entries are never served; the ETL then invalidates old entries and
+-- pre-warms the common argument sets. Entries also carry a TTL and the table
+-- is size-bounded (least recently hit entries are evicted first).
+-- - The version is the latest 'success' run or 'partial' run that upserted
+--   rows; failed runs, and partial runs that loaded nothing, keep it
+-- - Hits are a primary key SELECT; last_hit_at, which eviction orders by,
+--   is refreshed at most every 10 minutes, so hot entries shared by all
+--   viewers don't take row locks
+-- - The function is granted to anon, so callers can't churn the cache:
+--   dashboard_rpc_cache_functions lists each function's argument names
+--   (arg_names); arguments must be an object of those names with string or
+--   null values of at most 100 characters, and at most max_arg_sets
+--   argument sets are stored per function and ETL run (the no-argument call
+--   is always cached)
+
+-- ============================================================================
+-- ALTER TABLE: etl_runs
+-- Link tracked runs to the ETL's own run UUID
+-- ============================================================================
+
+ALTER TABLE etl_runs ADD COLUMN IF NOT EXISTS etl_run_id UUID;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_etl_runs_etl_run_id ON etl_runs(etl_run_id);
+
+COMMENT ON COLUMN etl_runs.etl_run_id IS 'ETL Run ID (UUID) logged by etl/fetch_permits.py';
+
+-- ============================================================================
+-- TABLE: dashboard_rpc_cache_functions
+-- Whitelist of cacheable dashboard RPCs with their TTL
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS dashboard_rpc_cache_functions (
+    function_name TEXT PRIMARY KEY,
+    ttl INTERVAL NOT NULL DEFAULT INTERVAL '8 days',
+    arg_names TEXT[] NOT NULL DEFAULT '{}',
+    max_arg_sets INTEGER NOT NULL DEFAULT 1
+);
+
+COMMENT ON COLUMN dashboard_rpc_cache_functions.arg_names IS 'Named arguments callers may pass (anything else is rejected)';
+COMMENT ON COLUMN dashboard_rpc_cache_functions.max_arg_sets IS 'Argument sets cached per ETL run; the no-argument call is always cached';
+
+INSERT INTO dashboard_rpc_cache_functions (function_name, ttl, arg_names, max_arg_sets) VALUES
+    ('get_dashboard_county_stats', INTERVAL '8 days', '{}', 1),
+    ('get_dashboard_permit_type_stats', INTERVAL '8 days', '{}', 1),
+    ('get_permit_status_breakdown', INTERVAL '8 days', '{}', 1),
+    ('get_dashboard_permits_over_time', INTERVAL '8 days', '{}', 1),
+    ('get_year_over_year_comparison', INTERVAL '8 days', '{}', 1),
+    ('get_acreage_leaderboard', INTERVAL '8 days', ARRAY['filter_county', 'filter_permit_type'], 100),
+    -- Relative to CURRENT_DATE, so it must not outlive the day it was computed
+    ('get_expiring_permits_summary', INTERVAL '1 day', '{}', 1)
+ON CONFLICT (function_name) DO NOTHING;
+
+-- ============================================================================
+-- TABLE: dashboard_rpc_cache
+-- Cached RPC results (UNLOGGED: contents are recomputable, writes stay cheap)
+-- ============================================================================
+
+CREATE UNLOGGED TABLE IF NOT EXISTS dashboard_rpc_cache (
+    function_name TEXT NOT NULL,
+    args JSONB NOT NULL DEFAULT '{}'::jsonb,
+    etl_run_id UUID NOT NULL,
+    payload JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_hit_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (function_name, args, etl_run_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_dashboard_rpc_cache_last_hit ON dashboard_rpc_cache(last_hit_at DESC);
+
+COMMENT ON TABLE dashboard_rpc_cache IS 'Run-versioned cache of dashboard RPC results (see get_cached_dashboard_rpc)';
+
+-- Only reachable through the SECURITY DEFINER functions below
+ALTER TABLE dashboard_rpc_cache ENABLE ROW LEVEL SECURITY;
+ALTER TABLE dashboard_rpc_cache_functions ENABLE ROW LEVEL SECURITY;
+
+-- ============================================================================
+-- FUNCTION: latest_successful_etl_run_id
+-- Purpose: Cache version key (nil UUID until the ETL has recorded a run)
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION latest_successful_etl_run_id()
+RETURNS UUID
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT COALESCE(
+    (SELECT etl_run_id
+     FROM etl_runs
+     WHERE (status = 'success' OR (status = 'partial' AND records_updated > 0))
+       AND etl_run_id IS NOT NULL
+     ORDER BY run_date DESC
+     LIMIT 1),
+    '00000000-0000-0000-0000-000000000000'::uuid
+  );
+$$;
+
+COMMENT ON FUNCTION latest_successful_etl_run_id IS 'Latest ETL run that loaded data (success, or partial with upserted rows); dashboard cache version';
+
+-- ============================================================================
+-- FUNCTION: evict_dashboard_rpc_cache
+-- Purpose: Drop expired entries and keep the cache under p_max_entries
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION evict_dashboard_rpc_cache(
+    p_max_entries INTEGER DEFAULT 500
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_expired INTEGER;
+    v_evicted INTEGER;
+BEGIN
+    DELETE FROM dashboard_rpc_cache WHERE expires_at <= NOW();
+    GET DIAGNOSTICS v_expired = ROW_COUNT;
+
+    -- Least recently hit entries go first
+    DELETE FROM dashboard_rpc_cache c
+    USING (
+        SELECT function_name, args, etl_run_id
+        FROM dashboard_rpc_cache
+        ORDER BY last_hit_at DESC
+        OFFSET p_max_entries
+    ) old
+    WHERE c.function_name = old.function_name
+      AND c.args = old.args
+      AND c.etl_run_id = old.etl_run_id;
+    GET DIAGNOSTICS v_evicted = ROW_COUNT;
+
+    RETURN v_expired + v_evicted;
+END;
+$$;
+
+-- ============================================================================
+-- FUNCTION: get_cached_dashboard_rpc
+-- Purpose: Return a dashboard RPC result as a JSON array, computing it on miss
+-- Usage: SELECT get_cached_dashboard_rpc('get_acreage_leaderboard', '{"filter_county": "Polk"}')
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION get_cached_dashboard_rpc(
+    p_function_name TEXT,
+    p_args JSONB DEFAULT '{}'::jsonb
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_function dashboard_rpc_cache_functions%ROWTYPE;
+    v_run_id UUID;
+    v_payload JSONB;
+    v_last_hit TIMESTAMP WITH TIME ZONE;
+    v_call_args TEXT;
+    v_cached_sets INTEGER;
+BEGIN
+    SELECT * INTO v_function
+    FROM dashboard_rpc_cache_functions
+    WHERE function_name = p_function_name;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Function % is not registered in dashboard_rpc_cache_functions', p_function_name;
+    END IF;
+
+    p_args := COALESCE(p_args, '{}'::jsonb);
+    IF jsonb_typeof(p_args) <> 'object' THEN
+        RAISE EXCEPTION 'Arguments of % must be a JSON object', p_function_name;
+    END IF;
+    IF EXISTS (
+        SELECT 1
+        FROM jsonb_each(p_args) a
+        WHERE a.key <> ALL(v_function.arg_names)
+           OR jsonb_typeof(a.value) NOT IN ('string', 'null')
+           OR length(a.value #>> '{}') > 100
+    ) THEN
+        RAISE EXCEPTION 'Invalid arguments for %: % (allowed: %, as strings)',
+            p_function_name, p_args, v_function.arg_names;
+    END IF;
+
+    v_run_id := latest_successful_etl_run_id();
+
+    -- Hit: primary key lookup; recency is refreshed at most every 10 minutes
+    SELECT payload, last_hit_at INTO v_payload, v_last_hit
+    FROM dashboard_rpc_cache
+    WHERE function_name = p_function_name
+      AND args = p_args
+      AND etl_run_id = v_run_id
+      AND expires_at > NOW();
+
+    IF FOUND THEN
+        IF v_last_hit < NOW() - INTERVAL '10 minutes' THEN
+            UPDATE dashboard_rpc_cache
+            SET last_hit_at = NOW()
+            WHERE function_name = p_function_name
+              AND args = p_args
+              AND etl_run_id = v_run_id;
+        END IF;
+        RETURN v_payload;
+    END IF;
+
+    -- Miss: call the function with named arguments from p_args
+    SELECT string_agg(format('%I => %L', key, value #>> '{}'), ', ')
+    INTO v_call_args
+    FROM jsonb_each(p_args);
+
+    EXECUTE format(
+        'SELECT COALESCE(jsonb_agg(t), ''[]''::jsonb) FROM %I(%s) t',
+        p_function_name,
+        COALESCE(v_call_args, '')
+    )
+    INTO v_payload;
+
+    IF p_args <> '{}'::jsonb THEN
+        SELECT COUNT(*) INTO v_cached_sets
+        FROM dashboard_rpc_cache
+        WHERE function_name = p_function_name
+          AND etl_run_id = v_run_id;
+
+        IF v_cached_sets >= v_function.max_arg_sets THEN
+            RETURN v_payload;
+        END IF;
+    END IF;
+
+    INSERT INTO dashboard_rpc_cache (function_name, args, etl_run_id, payload, expires_at)
+    VALUES (p_function_name, p_args, v_run_id, v_payload, NOW() + v_function.ttl)
+    ON CONFLICT (function_name, args, etl_run_id) DO UPDATE
+    SET payload = EXCLUDED.payload,
+        created_at = NOW(),
+        expires_at = EXCLUDED.expires_at,
+        last_hit_at = NOW();
+
+    PERFORM evict_dashboard_rpc_cache();
+
+    RETURN v_payload;
+END;
+$$;
+
+COMMENT ON FUNCTION get_cached_dashboard_rpc IS 'Dashboard RPC result cached per (function, args, latest successful etl_run_id); arguments limited to the function''s registered arg_names';
+
+-- ============================================================================
+-- FUNCTION: invalidate_dashboard_rpc_cache
+-- Purpose: Called by the ETL at the end of run() before pre-warming
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION invalidate_dashboard_rpc_cache()
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_deleted INTEGER;
+BEGIN
+    DELETE FROM dashboard_rpc_cache
+    WHERE etl_run_id <> latest_successful_etl_run_id()
+       OR expires_at <= NOW();
+
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+    RETURN v_deleted;
+END;
+$$;
+
+COMMENT ON FUNCTION invalidate_dashboard_rpc_cache IS 'Remove cache entries from previous ETL runs (called by ETL)';
+
+-- ============================================================================
+-- PERMISSIONS
+-- ============================================================================
+
+REVOKE ALL ON FUNCTION evict_dashboard_rpc_cache(INTEGER) FROM PUBLIC;
+REVOKE ALL ON FUNCTION invalidate_dashboard_rpc_cache() FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION evict_dashboard_rpc_cache(INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION invalidate_dashboard_rpc_cache() TO service_role;
+
+GRANT EXECUTE ON FUNCTION get_cached_dashboard_rpc(TEXT, JSONB) TO authenticated;
+GRANT EXECUTE ON FUNCTION get_cached_dashboard_rpc(TEXT, JSONB) TO anon;
+GRANT EXECUTE ON FUNCTION latest_successful_etl_run_id() TO authenticated;
+GRANT EXECUTE ON FUNCTION latest_successful_etl_run_id() TO anon;
+
+-- Reload schema cache
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,25 @@
+-- PermitIQ Database Schema - Migration 012
+-- Geometry fingerprint for attribute-only incremental fetches
+-- Version: 1.0.0
+-- Created: 2026-10-19
+
+-- ============================================================================
+-- PROBLEM
+-- ============================================================================
+-- Polygon rings are most of each SWFWMD API response, yet a permit's boundary
+-- rarely changes between revisions. Every ETL run downloads every polygon.
+--
+-- ============================================================================
+-- SOLUTION
+-- ============================================================================
+-- The ETL stores a fingerprint of the boundary derived from attributes
+-- (SHAPE.AREA, SHAPE.LEN). With PERMITIQ_FETCH_MODE=incremental it fetches
+-- attributes only (returnGeometry=false) and requests geometry by OBJECTID
+-- just for permits that are new or whose fingerprint or revision changed.
+
+ALTER TABLE erp_permits ADD COLUMN IF NOT EXISTS geometry_fingerprint VARCHAR(16);
+
+COMMENT ON COLUMN erp_permits.geometry_fingerprint IS 'Hash of SHAPE.AREA/SHAPE.LEN at last geometry fetch (set by ETL)';
+
+-- Existing rows have no fingerprint, so the first incremental run
+-- re-fetches their geometry once and records it.
@@ -0,0 +1,448 @@
+-- PermitIQ Database Schema - Migration 013
+-- Tombstone permits that disappear from the SWFWMD layer
+-- Version: 1.0.0
+-- Created: 2026-10-19
+
+-- ============================================================================
+-- PROBLEM
+-- ============================================================================
+-- The ETL only upserts what the API returns, so permits that are deleted or
+-- withdrawn upstream stay in erp_permits forever.
+--
+-- ============================================================================
+-- SOLUTION
+-- ============================================================================
+-- The ETL pulls only the ID set (returnIdsOnly=true), diffs it against the
+-- stored objectids and calls reconcile_source_permits() in bulk. Missing
+-- permits are tombstoned (source_removed_at) and logged as 'deleted' in
+-- erp_permit_changes; permits that reappear are restored.
+--
+-- Tombstoned permits are left out of every read path. The dashboard
+-- statistics views, calculate_daily_statistics(),
+-- get_expiring_permits_summary() and match_competitor_permits() (defined
+-- before this migration) are re-created here with
+-- `source_removed_at IS NULL`; signatures and results are otherwise
+-- unchanged. Functions added later in this series (search, radius search,
+-- clusters, the dashboard cube and leaderboard, viewport and export) filter
+-- on the column where they are defined. The web app's direct erp_permits
+-- queries and the ETL's dashboard payloads filter on it themselves.
+
+ALTER TABLE erp_permits ADD COLUMN IF NOT EXISTS source_removed_at TIMESTAMP WITH TIME ZONE;
+
+COMMENT ON COLUMN erp_permits.source_removed_at IS 'When the permit disappeared from the SWFWMD API (NULL = still present)';
+
+-- Tombstoned rows are rare; keep the index small
+CREATE INDEX IF NOT EXISTS idx_erp_permits_source_removed_at
+    ON erp_permits(source_removed_at)
+    WHERE source_removed_at IS NOT NULL;
+
+-- ============================================================================
+-- FUNCTION: reconcile_source_permits
+-- Purpose: Bulk tombstone/restore permits by objectid (called by ETL)
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION reconcile_source_permits(
+    p_missing_objectids INTEGER[],
+    p_restored_objectids INTEGER[] DEFAULT '{}',
+    p_etl_run_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+    tombstoned_count INTEGER,
+    restored_count INTEGER
+) AS $$
+DECLARE
+    v_tombstoned INTEGER;
+    v_restored INTEGER;
+BEGIN
+    WITH tombstoned AS (
+        UPDATE erp_permits p
+        SET source_removed_at = NOW()
+        WHERE p.objectid = ANY(p_missing_objectids)
+          AND p.source_removed_at IS NULL
+        RETURNING p.*
+    ),
+    logged AS (
+        INSERT INTO erp_permit_changes (
+            permit_id,
+            permit_number,
+            change_type,
+            permit_snapshot,
+            etl_run_id,
+            notes
+        )
+        SELECT
+            t.id,
+            t.permit_number,
+            'deleted',
+            to_jsonb(t) - 'raw_data' - 'geometry' - 'location',
+            p_etl_run_id,
+            'No longer returned by SWFWMD API'
+        FROM tombstoned t
+        RETURNING 1
+    )
+    SELECT COUNT(*) INTO v_tombstoned FROM logged;
+
+    WITH restored AS (
+        UPDATE erp_permits p
+        SET source_removed_at = NULL
+        WHERE p.objectid = ANY(p_restored_objectids)
+          AND p.source_removed_at IS NOT NULL
+        RETURNING p.id, p.permit_number
+    ),
+    logged AS (
+        INSERT INTO erp_permit_changes (
+            permit_id,
+            permit_number,
+            change_type,
+            etl_run_id,
+            notes
+        )
+        SELECT r.id, r.permit_number, 'restored', p_etl_run_id, 'Returned by SWFWMD API again'
+        FROM restored r
+        RETURNING 1
+    )
+    SELECT COUNT(*) INTO v_restored FROM logged;
+
+    RETURN QUERY SELECT v_tombstoned, v_restored;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION reconcile_source_permits IS 'Tombstone permits missing from the source and restore reappearing ones (called by ETL)';
+
+REVOKE ALL ON FUNCTION reconcile_source_permits(INTEGER[], INTEGER[], UUID) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION reconcile_source_permits(INTEGER[], INTEGER[], UUID) TO service_role;
+
+-- ============================================================================
+-- MATERIALIZED VIEWS: dashboard statistics
+-- (supabase/migrations/007_dashboard_statistics_views.sql)
+-- ============================================================================
+
+DROP MATERIALIZED VIEW IF EXISTS dashboard_county_stats;
+DROP MATERIALIZED VIEW IF EXISTS dashboard_status_stats;
+DROP MATERIALIZED VIEW IF EXISTS dashboard_applicant_stats;
+DROP MATERIALIZED VIEW IF EXISTS dashboard_monthly_trends;
+DROP MATERIALIZED VIEW IF EXISTS dashboard_overall_stats;
+
+CREATE MATERIALIZED VIEW dashboard_county_stats AS
+SELECT
+  county,
+  COUNT(*) as permit_count,
+  AVG(acreage) as avg_acreage,
+  SUM(acreage) as total_acreage
+FROM erp_permits
+WHERE county IS NOT NULL
+  AND source_removed_at IS NULL
+GROUP BY county
+ORDER BY permit_count DESC;
+
+CREATE INDEX IF NOT EXISTS idx_dashboard_county_stats_county ON dashboard_county_stats(county);
+
+CREATE MATERIALIZED VIEW dashboard_status_stats AS
+SELECT
+  permit_status as status,
+  COUNT(*) as permit_count
+FROM erp_permits
+WHERE permit_status IS NOT NULL
+  AND source_removed_at IS NULL
+GROUP BY permit_status
+ORDER BY permit_count DESC;
+
+CREATE MATERIALIZED VIEW dashboard_applicant_stats AS
+SELECT
+  applicant_name,
+  COUNT(*) as permit_count
+FROM erp_permits
+WHERE applicant_name IS NOT NULL
+  AND source_removed_at IS NULL
+GROUP BY applicant_name
+ORDER BY permit_count DESC
+LIMIT 50;
+
+CREATE INDEX IF NOT EXISTS idx_dashboard_applicant_stats ON dashboard_applicant_stats(applicant_name);
+
+CREATE MATERIALIZED VIEW dashboard_monthly_trends AS
+SELECT
+  DATE_TRUNC('month', issue_date) as month,
+  COUNT(*) as permit_count
+FROM erp_permits
+WHERE issue_date IS NOT NULL
+  AND issue_date >= NOW() - INTERVAL '24 months'
+  AND source_removed_at IS NULL
+GROUP BY DATE_TRUNC('month', issue_date)
+ORDER BY month DESC;
+
+CREATE MATERIALIZED VIEW dashboard_overall_stats AS
+WITH current_permits AS (
+  SELECT * FROM erp_permits WHERE source_removed_at IS NULL
+),
+top_county AS (
+  SELECT county, COUNT(*) AS permit_count
+  FROM current_permits
+  WHERE county IS NOT NULL
+  GROUP BY county
+  ORDER BY COUNT(*) DESC
+  LIMIT 1
+)
+SELECT
+  COUNT(*) as total_permits,
+  COUNT(DISTINCT county) as total_counties,
+  AVG(acreage) as avg_acreage,
+  COUNT(*) FILTER (WHERE issue_date >= NOW() - INTERVAL '30 days') as permits_last_30_days,
+  (SELECT county FROM top_county) as top_county,
+  (SELECT permit_count FROM top_county) as top_county_count
+FROM current_permits;
+
+COMMENT ON MATERIALIZED VIEW dashboard_overall_stats IS 'Overall permit statistics including average acreage (uses acreage column, not total_acreage)';
+
+ALTER MATERIALIZED VIEW dashboard_county_stats OWNER TO postgres;
+ALTER MATERIALIZED VIEW dashboard_status_stats OWNER TO postgres;
+ALTER MATERIALIZED VIEW dashboard_applicant_stats OWNER TO postgres;
+ALTER MATERIALIZED VIEW dashboard_monthly_trends OWNER TO postgres;
+ALTER MATERIALIZED VIEW dashboard_overall_stats OWNER TO postgres;
+
+GRANT SELECT ON dashboard_county_stats TO authenticated;
+GRANT SELECT ON dashboard_status_stats TO authenticated;
+GRANT SELECT ON dashboard_applicant_stats TO authenticated;
+GRANT SELECT ON dashboard_monthly_trends TO authenticated;
+GRANT SELECT ON dashboard_overall_stats TO authenticated;
+
+-- ============================================================================
+-- FUNCTION: calculate_daily_statistics
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION calculate_daily_statistics(
+    p_stat_date DATE DEFAULT CURRENT_DATE
+)
+RETURNS VOID AS $$
+BEGIN
+    -- Delete existing stats for this date (if re-running)
+    DELETE FROM erp_statistics WHERE stat_date = p_stat_date;
+
+    -- Calculate county-level statistics
+    INSERT INTO erp_statistics (
+        stat_date,
+        county,
+        city,
+        total_permits,
+        new_permits,
+        modified_permits,
+        active_permits,
+        expired_permits,
+        total_acreage,
+        avg_acreage
+    )
+    SELECT
+        p_stat_date,
+        county,
+        NULL AS city,  -- County-level aggregation
+        COUNT(*) AS total_permits,
+        COUNT(*) FILTER (WHERE created_at::date = p_stat_date) AS new_permits,
+        COUNT(*) FILTER (WHERE updated_at::date = p_stat_date AND created_at::date != p_stat_date) AS modified_permits,
+        COUNT(*) FILTER (WHERE permit_status = 'Active' OR expiration_date >= p_stat_date) AS active_permits,
+        COUNT(*) FILTER (WHERE expiration_date < p_stat_date) AS expired_permits,
+        SUM(acreage) AS total_acreage,
+        AVG(acreage) AS avg_acreage
+    FROM erp_permits
+    WHERE county IS NOT NULL
+      AND source_removed_at IS NULL
+    GROUP BY county;
+
+    -- Calculate trend indicators
+    UPDATE erp_statistics s
+    SET
+        permits_vs_30day_avg = (
+            SELECT
+                CASE WHEN AVG(total_permits) > 0
+                THEN ((s.total_permits::DECIMAL / AVG(total_permits)) - 1) * 100
+                ELSE 0 END
+            FROM erp_statistics
+            WHERE county = s.county
+            AND stat_date BETWEEN p_stat_date - INTERVAL '30 days' AND p_stat_date - INTERVAL '1 day'
+        ),
+        permits_vs_90day_avg = (
+            SELECT
+                CASE WHEN AVG(total_permits) > 0
+                THEN ((s.total_permits::DECIMAL / AVG(total_permits)) - 1) * 100
+                ELSE 0 END
+            FROM erp_statistics
+            WHERE county = s.county
+            AND stat_date BETWEEN p_stat_date - INTERVAL '90 days' AND p_stat_date - INTERVAL '1 day'
+        )
+    WHERE stat_date = p_stat_date;
+
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- FUNCTION: get_expiring_permits_summary
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION get_expiring_permits_summary()
+RETURNS TABLE (
+  time_period text,
+  days_range text,
+  permit_count bigint,
+  total_acreage numeric
+)
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT * FROM (
+    -- Expiring in next 30 days
+    SELECT
+      '30 Days' as time_period,
+      '0-30 days' as days_range,
+      COUNT(*)::bigint as permit_count,
+      COALESCE(SUM(acreage), 0) as total_acreage
+    FROM erp_permits
+    WHERE expiration_date IS NOT NULL
+      AND expiration_date >= CURRENT_DATE
+      AND expiration_date <= CURRENT_DATE + INTERVAL '30 days'
+      AND source_removed_at IS NULL
+
+    UNION ALL
+
+    -- Expiring in next 31-60 days
+    SELECT
+      '60 Days' as time_period,
+      '31-60 days' as days_range,
+      COUNT(*)::bigint as permit_count,
+      COALESCE(SUM(acreage), 0) as total_acreage
+    FROM erp_permits
+    WHERE expiration_date IS NOT NULL
+      AND expiration_date > CURRENT_DATE + INTERVAL '30 days'
+      AND expiration_date <= CURRENT_DATE + INTERVAL '60 days'
+      AND source_removed_at IS NULL
+
+    UNION ALL
+
+    -- Expiring in next 61-90 days
+    SELECT
+      '90 Days' as time_period,
+      '61-90 days' as days_range,
+      COUNT(*)::bigint as permit_count,
+      COALESCE(SUM(acreage), 0) as total_acreage
+    FROM erp_permits
+    WHERE expiration_date IS NOT NULL
+      AND expiration_date > CURRENT_DATE + INTERVAL '60 days'
+      AND expiration_date <= CURRENT_DATE + INTERVAL '90 days'
+      AND source_removed_at IS NULL
+  ) sub
+  ORDER BY
+    CASE time_period
+      WHEN '30 Days' THEN 1
+      WHEN '60 Days' THEN 2
+      WHEN '90 Days' THEN 3
+    END;
+$$;
+
+-- ============================================================================
+-- FUNCTION: match_competitor_permits
+-- ============================================================================
+-- Removed permits are not matched; existing matches are kept as history.
+
+CREATE OR REPLACE FUNCTION match_competitor_permits(
+    p_competitor_id BIGINT
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_competitor RECORD;
+    v_matches_found INTEGER := 0;
+    v_row_count INTEGER;
+    v_alias TEXT;
+BEGIN
+    -- Get competitor details
+    SELECT * INTO v_competitor
+    FROM competitor_watchlist
+    WHERE id = p_competitor_id;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Competitor not found: %', p_competitor_id;
+    END IF;
+
+    -- Match on exact company name
+    INSERT INTO competitor_permit_matches (
+        competitor_id,
+        permit_id,
+        match_confidence,
+        match_method
+    )
+    SELECT
+        p_competitor_id,
+        p.id,
+        1.0,
+        'exact'
+    FROM erp_permits p
+    WHERE p.applicant_name = v_competitor.company_name
+      AND p.source_removed_at IS NULL
+    ON CONFLICT (competitor_id, permit_id) DO NOTHING;
+
+    GET DIAGNOSTICS v_matches_found = ROW_COUNT;
+
+    -- Match on aliases (case-insensitive)
+    IF v_competitor.company_aliases IS NOT NULL THEN
+        FOREACH v_alias IN ARRAY v_competitor.company_aliases
+        LOOP
+            INSERT INTO competitor_permit_matches (
+                competitor_id,
+                permit_id,
+                match_confidence,
+                match_method
+            )
+            SELECT
+                p_competitor_id,
+                p.id,
+                0.95,
+                'alias'
+            FROM erp_permits p
+            WHERE LOWER(p.applicant_name) = LOWER(v_alias)
+              AND p.source_removed_at IS NULL
+            ON CONFLICT (competitor_id, permit_id) DO NOTHING;
+
+            GET DIAGNOSTICS v_row_count = ROW_COUNT;
+            v_matches_found := v_matches_found + v_row_count;
+        END LOOP;
+    END IF;
+
+    -- Fuzzy matching (contains company name)
+    INSERT INTO competitor_permit_matches (
+        competitor_id,
+        permit_id,
+        match_confidence,
+        match_method
+    )
+    SELECT
+        p_competitor_id,
+        p.id,
+        0.75,
+        'fuzzy'
+    FROM erp_permits p
+    WHERE p.applicant_name ILIKE '%' || v_competitor.company_name || '%'
+        AND p.source_removed_at IS NULL
+        AND NOT EXISTS (
+            SELECT 1 FROM competitor_permit_matches m
+            WHERE m.competitor_id = p_competitor_id AND m.permit_id = p.id
+        )
+    ON CONFLICT (competitor_id, permit_id) DO NOTHING;
+
+    GET DIAGNOSTICS v_row_count = ROW_COUNT;
+    v_matches_found := v_matches_found + v_row_count;
+
+    -- Update competitor statistics
+    UPDATE competitor_watchlist
+    SET
+        total_permits = (
+            SELECT COUNT(*)
+            FROM competitor_permit_matches
+            WHERE competitor_id = p_competitor_id
+        ),
+        updated_at = NOW()
+    WHERE id = p_competitor_id;
+
+    RETURN v_matches_found;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Reload schema cache
+NOTIFY pgrst, 'reload schema';
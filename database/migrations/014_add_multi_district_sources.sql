@@ -0,0 +1,123 @@
+-- PermitIQ Database Schema - Migration 014
+-- Load permits from multiple water management districts
+-- Version: 1.0.0
+-- Created: 2026-10-19
+
+-- ============================================================================
+-- PROBLEM
+-- ============================================================================
+-- erp_permits assumes a single source: permit_number is globally UNIQUE and
+-- reconcile_source_permits() matches on objectid alone. Permit numbers and
+-- OBJECTIDs are only unique within one district's ArcGIS layer, so a second
+-- district would overwrite or tombstone SWFWMD permits.
+--
+-- ============================================================================
+-- SOLUTION
+-- ============================================================================
+-- Permits are keyed by (data_source, permit_number). The ETL upserts with
+-- on_conflict = 'data_source,permit_number' and reconciles one source at a
+-- time. Existing rows already carry data_source = 'SWFWMD_API'.
+
+UPDATE erp_permits SET data_source = 'SWFWMD_API' WHERE data_source IS NULL;
+
+ALTER TABLE erp_permits ALTER COLUMN data_source SET NOT NULL;
+
+ALTER TABLE erp_permits DROP CONSTRAINT IF EXISTS erp_permits_permit_number_key;
+
+ALTER TABLE erp_permits
+    ADD CONSTRAINT erp_permits_data_source_permit_number_key UNIQUE (data_source, permit_number);
+
+-- Per-source reconcile and stored-state loads filter on data_source + objectid
+CREATE INDEX IF NOT EXISTS idx_erp_permits_data_source_objectid
+    ON erp_permits(data_source, objectid);
+
+COMMENT ON COLUMN erp_permits.data_source IS 'Source layer (SWFWMD_API, SFWMD_API, SJRWMD_API, SRWMD_API, NWFWMD_API)';
+
+-- ============================================================================
+-- FUNCTION: reconcile_source_permits
+-- Purpose: Bulk tombstone/restore one source's permits by objectid (called by ETL)
+-- ============================================================================
+
+DROP FUNCTION IF EXISTS reconcile_source_permits(INTEGER[], INTEGER[], UUID);
+
+CREATE OR REPLACE FUNCTION reconcile_source_permits(
+    p_missing_objectids INTEGER[],
+    p_restored_objectids INTEGER[] DEFAULT '{}',
+    p_etl_run_id UUID DEFAULT NULL,
+    p_data_source TEXT DEFAULT 'SWFWMD_API'
+)
+RETURNS TABLE (
+    tombstoned_count INTEGER,
+    restored_count INTEGER
+) AS $$
+DECLARE
+    v_tombstoned INTEGER;
+    v_restored INTEGER;
+BEGIN
+    WITH tombstoned AS (
+        UPDATE erp_permits p
+        SET source_removed_at = NOW()
+        WHERE p.data_source = p_data_source
+          AND p.objectid = ANY(p_missing_objectids)
+          AND p.source_removed_at IS NULL
+        RETURNING p.*
+    ),
+    logged AS (
+        INSERT INTO erp_permit_changes (
+            permit_id,
+            permit_number,
+            change_type,
+            permit_snapshot,
+            etl_run_id,
+            notes
+        )
+        SELECT
+            t.id,
+            t.permit_number,
+            'deleted',
+            -- Derived columns (search text from 016, projected geometry
+            -- from 019) are left out with the payload and polygons
+            to_jsonb(t) - ARRAY[
+                'raw_data', 'geometry', 'location',
+                'geometry_3086', 'location_3086', 'search_vector', 'search_text'
+            ],
+            p_etl_run_id,
+            'No longer returned by ' || p_data_source
+        FROM tombstoned t
+        RETURNING 1
+    )
+    SELECT COUNT(*) INTO v_tombstoned FROM logged;
+
+    WITH restored AS (
+        UPDATE erp_permits p
+        SET source_removed_at = NULL
+        WHERE p.data_source = p_data_source
+          AND p.objectid = ANY(p_restored_objectids)
+          AND p.source_removed_at IS NOT NULL
+        RETURNING p.id, p.permit_number
+    ),
+    logged AS (
+        INSERT INTO erp_permit_changes (
+            permit_id,
+            permit_number,
+            change_type,
+            etl_run_id,
+            notes
+        )
+        SELECT r.id, r.permit_number, 'restored', p_etl_run_id, 'Returned by ' || p_data_source || ' again'
+        FROM restored r
+        RETURNING 1
+    )
+    SELECT COUNT(*) INTO v_restored FROM logged;
+
+    RETURN QUERY SELECT v_tombstoned, v_restored;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION reconcile_source_permits IS 'Tombstone one source''s permits missing from its layer and restore reappearing ones (called by ETL)';
+
+REVOKE ALL ON FUNCTION reconcile_source_permits(INTEGER[], INTEGER[], UUID, TEXT) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION reconcile_source_permits(INTEGER[], INTEGER[], UUID, TEXT) TO service_role;
+
+-- Reload schema cache
+NOTIFY pgrst, 'reload schema';
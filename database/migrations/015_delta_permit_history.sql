@@ -0,0 +1,444 @@
+-- PermitIQ Database Schema - Migration 015
+-- Delta-compressed permit revision history captured by the ETL
+-- Version: 1.0.0
+-- Created: 2026-10-19
+
+-- ============================================================================
+-- PROBLEM
+-- ============================================================================
+-- erp_permit_history (migration 004) is never populated: the ETL keeps only
+-- the highest-objectid revision per permit and discards the rest. Its schema
+-- also stores a full raw_data JSON copy per revision, although consecutive
+-- revisions usually differ in one or two fields.
+--
+-- ============================================================================
+-- SOLUTION
+-- ============================================================================
+-- Each history row stores only the fields that changed since the previous
+-- revision (delta). Every Nth revision of a permit is a keyframe holding the
+-- full state, so a revision is rebuilt by merging the deltas since the
+-- nearest keyframe: state = keyframe || delta || delta ...
+--
+-- The ETL sends every revision whose state hash differs from the permit's
+-- latest history row (get_permit_history_heads) to append_permit_history(),
+-- which computes the deltas server-side. Revisions are numbered per
+-- (data_source, permit_number); the latest objectid can get further
+-- revisions when its attributes change.
+--
+-- Polygons are stored only on keyframes and on revisions whose
+-- geometry_fingerprint changed; most revisions keep the boundary, and a copy
+-- per row would dominate the history size and the ETL's request payloads.
+-- get_permit_history_heads() returns each head's fingerprint so the ETL
+-- sends the polygon only where it is stored (select_history_revisions).
+
+-- ============================================================================
+-- TABLE CHANGES: erp_permit_history
+-- ============================================================================
+
+ALTER TABLE erp_permit_history
+    ADD COLUMN IF NOT EXISTS data_source VARCHAR(50) NOT NULL DEFAULT 'SWFWMD_API',
+    ADD COLUMN IF NOT EXISTS delta JSONB,
+    ADD COLUMN IF NOT EXISTS is_keyframe BOOLEAN NOT NULL DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS state_hash TEXT;
+
+ALTER TABLE erp_permit_history ALTER COLUMN raw_data DROP NOT NULL;
+
+-- Rows captured before this migration become keyframes of their typed columns
+UPDATE erp_permit_history
+SET delta = jsonb_build_object(
+        'applicant_name', applicant_name,
+        'project_name', project_name,
+        'permit_status', status,
+        'issue_date', issue_date,
+        'expiration_date', expiration_date,
+        'acreage', acreage
+    ),
+    is_keyframe = TRUE
+WHERE delta IS NULL;
+
+-- A revision is identified by its number; one objectid can have several
+ALTER TABLE erp_permit_history DROP CONSTRAINT IF EXISTS erp_permit_history_permit_number_objectid_key;
+
+ALTER TABLE erp_permit_history
+    ADD CONSTRAINT erp_permit_history_source_permit_revision_key
+    UNIQUE (data_source, permit_number, revision_number);
+
+-- Nearest keyframe lookup when rebuilding a single revision
+CREATE INDEX IF NOT EXISTS idx_permit_history_keyframes
+    ON erp_permit_history(data_source, permit_number, revision_number)
+    WHERE is_keyframe;
+
+COMMENT ON COLUMN erp_permit_history.delta IS 'Fields changed since the previous revision (full state on keyframes)';
+COMMENT ON COLUMN erp_permit_history.is_keyframe IS 'Delta holds the complete state; reconstruction starts here';
+COMMENT ON COLUMN erp_permit_history.state_hash IS 'MD5 of the full revision state, computed by the ETL to detect changes';
+COMMENT ON COLUMN erp_permit_history.data_source IS 'Source layer the revision came from (see erp_permits.data_source)';
+COMMENT ON COLUMN erp_permit_history.raw_data IS 'Deprecated: full API attributes, only on revisions captured before migration 015';
+
+-- ============================================================================
+-- AGGREGATE: jsonb_merge_agg
+-- Purpose: Merge JSONB objects in order (later keys win); rebuilds a revision
+--          from its keyframe and deltas
+-- ============================================================================
+
+DROP AGGREGATE IF EXISTS jsonb_merge_agg(JSONB);
+
+CREATE AGGREGATE jsonb_merge_agg(JSONB) (
+    SFUNC = jsonb_concat,
+    STYPE = JSONB,
+    INITCOND = '{}'
+);
+
+-- ============================================================================
+-- FUNCTION: get_permit_revision_state
+-- Purpose: Rebuild the full state of one revision from its nearest keyframe
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION get_permit_revision_state(
+    p_permit_number TEXT,
+    p_revision INTEGER,
+    p_data_source TEXT DEFAULT 'SWFWMD_API'
+)
+RETURNS JSONB AS $$
+    SELECT jsonb_merge_agg(h.delta ORDER BY h.revision_number)
+    FROM erp_permit_history h
+    WHERE h.data_source = p_data_source
+      AND h.permit_number = p_permit_number
+      AND h.revision_number <= p_revision
+      AND h.revision_number >= COALESCE((
+          SELECT MAX(k.revision_number)
+          FROM erp_permit_history k
+          WHERE k.data_source = p_data_source
+            AND k.permit_number = p_permit_number
+            AND k.revision_number <= p_revision
+            AND k.is_keyframe
+      ), 1);
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION get_permit_revision_state IS 'Full state of one permit revision, rebuilt from keyframe + deltas';
+
+-- ============================================================================
+-- FUNCTION: get_permit_history_heads
+-- Purpose: Latest revision and boundary fingerprint of each permit of a
+--          source (called by ETL to decide which revisions are new)
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION get_permit_history_heads(
+    p_data_source TEXT,
+    p_after_permit_number TEXT DEFAULT '',
+    p_limit INTEGER DEFAULT 1000
+)
+RETURNS TABLE (
+    permit_number TEXT,
+    objectid INTEGER,
+    revision_number INTEGER,
+    state_hash TEXT,
+    geometry_fingerprint TEXT
+) AS $$
+    SELECT
+        head.permit_number,
+        head.objectid,
+        head.revision_number,
+        head.state_hash,
+        -- Deltas carry the fingerprint when it changed, keyframes always
+        (
+            SELECT f.delta ->> 'geometry_fingerprint'
+            FROM erp_permit_history f
+            WHERE f.data_source = p_data_source
+              AND f.permit_number = head.permit_number
+              AND f.delta ? 'geometry_fingerprint'
+            ORDER BY f.revision_number DESC
+            LIMIT 1
+        )
+    FROM (
+        SELECT DISTINCT ON (h.permit_number)
+            h.permit_number,
+            h.objectid,
+            h.revision_number,
+            h.state_hash
+        FROM erp_permit_history h
+        WHERE h.data_source = p_data_source
+          AND h.permit_number > p_after_permit_number
+        ORDER BY h.permit_number, h.revision_number DESC
+        LIMIT p_limit
+    ) head
+    ORDER BY head.permit_number;
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION get_permit_history_heads IS 'Latest history revision and geometry fingerprint per permit of a source, keyset-paginated by permit_number (called by ETL)';
+
+REVOKE ALL ON FUNCTION get_permit_history_heads(TEXT, TEXT, INTEGER) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION get_permit_history_heads(TEXT, TEXT, INTEGER) TO service_role;
+
+-- ============================================================================
+-- FUNCTION: append_permit_history
+-- Purpose: Bulk-append revisions as deltas; polygons only on keyframes and
+--          boundary changes (called by ETL)
+-- ============================================================================
+-- p_revisions: JSON array of
+--   {data_source, permit_number, objectid, state_hash, state, geometry}
+-- where state is the complete revision state (every field present, nulls
+-- included) and geometry an optional WKT (MULTI)POLYGON.
+
+CREATE OR REPLACE FUNCTION append_permit_history(
+    p_revisions JSONB,
+    p_keyframe_interval INTEGER DEFAULT 10
+)
+RETURNS INTEGER AS $$
+DECLARE
+    r RECORD;
+    v_source TEXT;
+    v_permit TEXT;
+    v_permit_id BIGINT;
+    v_revision INTEGER;
+    v_hash TEXT;
+    v_state JSONB;
+    v_delta JSONB;
+    v_keyframe BOOLEAN;
+    v_store_geometry BOOLEAN;
+    v_appended INTEGER := 0;
+BEGIN
+    FOR r IN
+        SELECT x.*
+        FROM jsonb_to_recordset(p_revisions)
+            AS x(data_source TEXT, permit_number TEXT, objectid INTEGER, state_hash TEXT, state JSONB, geometry TEXT)
+        ORDER BY x.data_source, x.permit_number, x.objectid
+    LOOP
+        IF r.data_source IS DISTINCT FROM v_source OR r.permit_number IS DISTINCT FROM v_permit THEN
+            v_source := r.data_source;
+            v_permit := r.permit_number;
+
+            SELECT h.revision_number, h.state_hash
+            INTO v_revision, v_hash
+            FROM erp_permit_history h
+            WHERE h.data_source = v_source AND h.permit_number = v_permit
+            ORDER BY h.revision_number DESC
+            LIMIT 1;
+
+            v_revision := COALESCE(v_revision, 0);
+            v_state := CASE
+                WHEN v_revision > 0 THEN get_permit_revision_state(v_permit, v_revision, v_source)
+                ELSE '{}'::JSONB
+            END;
+
+            SELECT p.id INTO v_permit_id
+            FROM erp_permits p
+            WHERE p.data_source = v_source AND p.permit_number = v_permit;
+        END IF;
+
+        -- Unchanged since the latest stored revision
+        IF r.state_hash IS NOT DISTINCT FROM v_hash THEN
+            CONTINUE;
+        END IF;
+
+        v_revision := v_revision + 1;
+        v_keyframe := (v_revision - 1) % GREATEST(p_keyframe_interval, 1) = 0;
+        v_store_geometry := r.geometry IS NOT NULL AND (
+            v_keyframe
+            OR (r.state -> 'geometry_fingerprint') IS DISTINCT FROM (v_state -> 'geometry_fingerprint')
+        );
+
+        IF v_keyframe THEN
+            v_delta := r.state;
+        ELSE
+            SELECT COALESCE(jsonb_object_agg(s.key, s.value), '{}'::JSONB)
+            INTO v_delta
+            FROM jsonb_each(r.state) s
+            WHERE s.value IS DISTINCT FROM v_state -> s.key;
+        END IF;
+
+        INSERT INTO erp_permit_history (
+            permit_id,
+            data_source,
+            objectid,
+            permit_number,
+            revision_number,
+            delta,
+            is_keyframe,
+            state_hash,
+            geometry
+        ) VALUES (
+            v_permit_id,
+            v_source,
+            r.objectid,
+            v_permit,
+            v_revision,
+            v_delta,
+            v_keyframe,
+            r.state_hash,
+            CASE WHEN v_store_geometry THEN ST_Multi(ST_SetSRID(ST_GeomFromText(r.geometry), 4326)) END
+        );
+
+        v_state := v_state || r.state;
+        v_hash := r.state_hash;
+        v_appended := v_appended + 1;
+    END LOOP;
+
+    RETURN v_appended;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION append_permit_history IS 'Append permit revisions as field-level deltas with periodic keyframes; polygons only on keyframes and geometry fingerprint changes (called by ETL)';
+
+REVOKE ALL ON FUNCTION append_permit_history(JSONB, INTEGER) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION append_permit_history(JSONB, INTEGER) TO service_role;
+
+-- ============================================================================
+-- FUNCTION: get_permit_revision_history
+-- Purpose: Retrieve all historical versions of a specific permit, rebuilt
+--          from the nearest keyframe
+-- ============================================================================
+
+DROP FUNCTION IF EXISTS get_permit_revision_history(TEXT);
+
+CREATE OR REPLACE FUNCTION get_permit_revision_history(
+    p_permit_number TEXT,
+    p_data_source TEXT DEFAULT 'SWFWMD_API'
+)
+RETURNS TABLE (
+    revision_number INTEGER,
+    objectid INTEGER,
+    applicant_name TEXT,
+    project_name TEXT,
+    status TEXT,
+    issue_date TIMESTAMP WITH TIME ZONE,
+    expiration_date TIMESTAMP WITH TIME ZONE,
+    acreage NUMERIC,
+    captured_at TIMESTAMP WITH TIME ZONE,
+    geometry_changed BOOLEAN
+) AS $$
+BEGIN
+    RETURN QUERY
+    WITH grouped AS (
+        -- Each keyframe starts a group; revisions before the first keyframe
+        -- form group 0
+        SELECT
+            h.revision_number,
+            h.objectid,
+            h.captured_at,
+            h.geometry,
+            h.delta,
+            COUNT(*) FILTER (WHERE h.is_keyframe) OVER (ORDER BY h.revision_number) AS keyframe_group
+        FROM erp_permit_history h
+        WHERE h.data_source = p_data_source
+          AND h.permit_number = p_permit_number
+    ),
+    revisions AS (
+        -- Running merge within a group: the keyframe holds the full state
+        SELECT
+            g.revision_number,
+            g.objectid,
+            g.captured_at,
+            g.geometry,
+            jsonb_merge_agg(g.delta) OVER (PARTITION BY g.keyframe_group ORDER BY g.revision_number) AS state
+        FROM grouped g
+    ),
+    compared AS (
+        SELECT
+            rv.*,
+            LAG(rv.state -> 'geometry_fingerprint') OVER (ORDER BY rv.revision_number) AS previous_fingerprint,
+            LAG(rv.geometry) OVER (ORDER BY rv.revision_number) AS previous_geometry,
+            ROW_NUMBER() OVER (ORDER BY rv.revision_number) AS position
+        FROM revisions rv
+    )
+    SELECT
+        c.revision_number,
+        c.objectid,
+        c.state ->> 'applicant_name',
+        c.state ->> 'project_name',
+        c.state ->> 'permit_status',
+        (c.state ->> 'issue_date')::TIMESTAMP WITH TIME ZONE,
+        (c.state ->> 'expiration_date')::TIMESTAMP WITH TIME ZONE,
+        (c.state ->> 'acreage')::NUMERIC,
+        c.captured_at,
+        -- Detect if geometry changed from previous revision (polygons are
+        -- compared only on revisions captured before migration 015)
+        CASE
+            WHEN c.position = 1 THEN FALSE
+            WHEN c.state ? 'geometry_fingerprint' THEN c.previous_fingerprint IS DISTINCT FROM c.state -> 'geometry_fingerprint'
+            WHEN c.geometry IS NOT NULL AND c.previous_geometry IS NOT NULL THEN NOT ST_Equals(c.geometry, c.previous_geometry)
+            ELSE FALSE
+        END
+    FROM compared c
+    ORDER BY c.revision_number DESC;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+COMMENT ON FUNCTION get_permit_revision_history IS 'Get complete revision history for a permit with change detection (rebuilt from the nearest keyframe)';
+
+-- ============================================================================
+-- FUNCTION: find_permits_with_recent_revisions
+-- Purpose: Find permits that have been revised in the last N days
+-- ============================================================================
+-- Revisions no longer carry typed name columns; current names come from
+-- erp_permits.
+
+CREATE OR REPLACE FUNCTION find_permits_with_recent_revisions(
+    days_back INTEGER DEFAULT 30
+)
+RETURNS TABLE (
+    permit_number TEXT,
+    revision_count BIGINT,
+    latest_revision_date TIMESTAMP WITH TIME ZONE,
+    current_applicant TEXT,
+    current_project TEXT
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        h.permit_number,
+        COUNT(*) as revision_count,
+        MAX(h.captured_at) as latest_revision_date,
+        MAX(COALESCE(p.applicant_name, h.applicant_name))::TEXT as current_applicant,
+        MAX(COALESCE(p.project_name, h.project_name))::TEXT as current_project
+    FROM erp_permit_history h
+    LEFT JOIN erp_permits p
+        ON p.data_source = h.data_source AND p.permit_number = h.permit_number
+    WHERE h.captured_at >= NOW() - (days_back || ' days')::INTERVAL
+    GROUP BY h.data_source, h.permit_number
+    HAVING COUNT(*) > 1
+    ORDER BY latest_revision_date DESC, revision_count DESC;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- ============================================================================
+-- FUNCTION: compare_permit_revisions
+-- Purpose: Compare two revisions of the same permit, field by field
+-- ============================================================================
+
+DROP FUNCTION IF EXISTS compare_permit_revisions(TEXT, INTEGER, INTEGER);
+
+CREATE OR REPLACE FUNCTION compare_permit_revisions(
+    p_permit_number TEXT,
+    p_revision_1 INTEGER,
+    p_revision_2 INTEGER,
+    p_data_source TEXT DEFAULT 'SWFWMD_API'
+)
+RETURNS TABLE (
+    field_name TEXT,
+    old_value TEXT,
+    new_value TEXT,
+    changed BOOLEAN
+) AS $$
+DECLARE
+    v_state_1 JSONB := get_permit_revision_state(p_permit_number, p_revision_1, p_data_source);
+    v_state_2 JSONB := get_permit_revision_state(p_permit_number, p_revision_2, p_data_source);
+BEGIN
+    IF v_state_1 IS NULL OR v_state_2 IS NULL THEN
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    SELECT
+        k.key,
+        v_state_1 ->> k.key,
+        v_state_2 ->> k.key,
+        (v_state_1 -> k.key) IS DISTINCT FROM (v_state_2 -> k.key)
+    FROM (SELECT jsonb_object_keys(v_state_1 || v_state_2) AS key) k
+    ORDER BY k.key;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+COMMENT ON FUNCTION compare_permit_revisions IS 'Compare two specific revisions of a permit to identify changes (rebuilt from deltas)';
+
+-- Reload schema cache
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,289 @@
+-- PermitIQ Database Schema - Migration 016
+-- Stored weighted search documents and ranked permit search
+-- Version: 1.0.0
+-- Created: 2026-10-19
+
+-- ============================================================================
+-- PROBLEM
+-- ============================================================================
+-- search_permits_by_name() runs three ILIKE '%term%' scans and three
+-- similarity() calls per row, so every search reads the whole table.
+-- The GIN index idx_erp_permits_search is built on an expression that a query
+-- has to repeat exactly to use it, and nothing does. Search latency grows
+-- with the table.
+--
+-- ============================================================================
+-- SOLUTION
+-- ============================================================================
+-- Each permit stores its search document, maintained on every ETL upsert by
+-- a trigger:
+--   search_vector  weighted tsvector
+--                    A: permit number, applicant, company
+--                    B: project name
+--                    C: activity description
+--   search_text    lowercased names + permit number for trigram matching
+--                  (partial words, typos)
+-- Both are indexed with GIN; search_text also has a GiST trigram index,
+-- which returns rows in order of word-similarity distance (<<->).
+--
+-- search_permits() ranks full-text and trigram matches together and pages
+-- through them with a (rank, id) keyset. A broad query ("llc", a common
+-- street name) matches a large share of the table, so the candidates are
+-- bounded by relevance before the full score is computed:
+-- - the 1,000 permits whose names are closest to the query, read from the
+--   GiST index in distance order (no per-match work)
+-- - the 1,000 full-text matches with the highest ts_rank_cd(), computed on
+--   the stored tsvector of the GIN matches
+-- It only builds ts_headline() snippets for the rows it returns. Permits
+-- removed from their source (source_removed_at, migration 013) are not
+-- returned.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- ============================================================================
+-- COLUMNS
+-- ============================================================================
+
+ALTER TABLE erp_permits
+    ADD COLUMN IF NOT EXISTS search_vector TSVECTOR,
+    ADD COLUMN IF NOT EXISTS search_text TEXT;
+
+COMMENT ON COLUMN erp_permits.search_vector IS 'Weighted search document (A: permit number/applicant/company, B: project, C: activity); maintained by trigger';
+COMMENT ON COLUMN erp_permits.search_text IS 'Lowercased names and permit number for trigram search; maintained by trigger';
+
+-- ============================================================================
+-- FUNCTION: permit_search_vector / permit_search_text
+-- Purpose: Build the search document (shared by the trigger and backfill)
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION permit_search_vector(
+    p_permit_number TEXT,
+    p_applicant_name TEXT,
+    p_company_name TEXT,
+    p_project_name TEXT,
+    p_activity_description TEXT
+)
+RETURNS TSVECTOR AS $$
+    SELECT
+        setweight(to_tsvector('english'::regconfig,
+            concat_ws(' ', p_permit_number, p_applicant_name,
+                -- The ETL copies applicant into company; don't count it twice
+                NULLIF(p_company_name, p_applicant_name))), 'A') ||
+        setweight(to_tsvector('english'::regconfig, COALESCE(p_project_name, '')), 'B') ||
+        setweight(to_tsvector('english'::regconfig, COALESCE(p_activity_description, '')), 'C');
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION permit_search_text(
+    p_permit_number TEXT,
+    p_applicant_name TEXT,
+    p_company_name TEXT,
+    p_project_name TEXT
+)
+RETURNS TEXT AS $$
+    SELECT lower(concat_ws(' ', p_permit_number, p_applicant_name,
+        NULLIF(p_company_name, p_applicant_name), p_project_name));
+$$ LANGUAGE sql IMMUTABLE;
+
+-- ============================================================================
+-- TRIGGER: maintain search columns on insert/update
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION update_erp_permits_search()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.search_vector := permit_search_vector(
+        NEW.permit_number, NEW.applicant_name, NEW.company_name,
+        NEW.project_name, NEW.activity_description
+    );
+    NEW.search_text := permit_search_text(
+        NEW.permit_number, NEW.applicant_name, NEW.company_name, NEW.project_name
+    );
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS update_erp_permits_search ON erp_permits;
+CREATE TRIGGER update_erp_permits_search
+    BEFORE INSERT OR UPDATE OF permit_number, applicant_name, company_name, project_name, activity_description
+    ON erp_permits
+    FOR EACH ROW
+    EXECUTE FUNCTION update_erp_permits_search();
+
+-- Backfill existing permits
+UPDATE erp_permits
+SET search_vector = permit_search_vector(permit_number, applicant_name, company_name, project_name, activity_description),
+    search_text = permit_search_text(permit_number, applicant_name, company_name, project_name)
+WHERE search_vector IS NULL;
+
+-- ============================================================================
+-- INDEXES
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_erp_permits_search_vector
+    ON erp_permits USING GIN(search_vector);
+
+CREATE INDEX IF NOT EXISTS idx_erp_permits_search_text_trgm
+    ON erp_permits USING GIN(search_text gin_trgm_ops);
+
+-- Nearest-first trigram scans (ORDER BY ... <<-> search_text); GIN can
+-- match but not order
+CREATE INDEX IF NOT EXISTS idx_erp_permits_search_text_trgm_gist
+    ON erp_permits USING GIST(search_text gist_trgm_ops);
+
+-- Superseded by idx_erp_permits_search_vector
+DROP INDEX IF EXISTS idx_erp_permits_search;
+
+-- ============================================================================
+-- FUNCTION: search_permits
+-- Purpose: Ranked, keyset-paginated permit search with highlighting
+-- ============================================================================
+-- Page 1:  search_permits('horton lakewood')
+-- Page 2+: search_permits('horton lakewood', 20, <last rank>, <last id>)
+
+CREATE OR REPLACE FUNCTION search_permits(
+    p_query TEXT,
+    p_limit INTEGER DEFAULT 20,
+    p_after_rank DOUBLE PRECISION DEFAULT NULL,
+    p_after_id BIGINT DEFAULT NULL,
+    p_data_source TEXT DEFAULT NULL
+)
+RETURNS TABLE (
+    id BIGINT,
+    permit_number VARCHAR,
+    applicant_name VARCHAR,
+    project_name VARCHAR,
+    permit_status VARCHAR,
+    county VARCHAR,
+    issue_date DATE,
+    data_source VARCHAR,
+    rank DOUBLE PRECISION,
+    headline TEXT
+) AS $$
+DECLARE
+    v_tsquery TSQUERY := websearch_to_tsquery('english', p_query);
+    v_text TEXT := lower(trim(p_query));
+BEGIN
+    IF v_text = '' THEN
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    WITH matches AS (
+        -- Closest names and permit numbers, in GiST index order
+        (
+            SELECT p.id
+            FROM erp_permits p
+            WHERE v_text <% p.search_text
+              AND p.source_removed_at IS NULL
+              AND (p_data_source IS NULL OR p.data_source = p_data_source)
+            ORDER BY v_text <<-> p.search_text, p.id DESC
+            LIMIT 1000
+        )
+        UNION
+        -- Best full-text matches (GIN), ranked on the tsvector alone
+        (
+            SELECT p.id
+            FROM erp_permits p
+            WHERE p.search_vector @@ v_tsquery
+              AND p.source_removed_at IS NULL
+              AND (p_data_source IS NULL OR p.data_source = p_data_source)
+            ORDER BY ts_rank_cd('{0.1, 0.2, 0.4, 1.0}', p.search_vector, v_tsquery) DESC, p.id DESC
+            LIMIT 1000
+        )
+    ),
+    candidates AS (
+        SELECT
+            p.id,
+            -- Full-text relevance (weights D, C, B, A) plus trigram closeness,
+            -- so partial words and typos still rank
+            COALESCE(ts_rank_cd('{0.1, 0.2, 0.4, 1.0}', p.search_vector, v_tsquery), 0)
+                + word_similarity(v_text, p.search_text) AS score
+        FROM matches m
+        JOIN erp_permits p ON p.id = m.id
+    ),
+    page AS (
+        SELECT c.id, c.score
+        FROM candidates c
+        WHERE p_after_rank IS NULL
+           OR (c.score, c.id) < (p_after_rank, p_after_id)
+        ORDER BY c.score DESC, c.id DESC
+        LIMIT LEAST(GREATEST(p_limit, 1), 100)
+    )
+    SELECT
+        p.id,
+        p.permit_number,
+        p.applicant_name,
+        p.project_name,
+        p.permit_status,
+        p.county,
+        p.issue_date,
+        p.data_source,
+        pg.score,
+        ts_headline(
+            'english',
+            concat_ws(' | ', p.applicant_name, p.project_name, p.activity_description),
+            v_tsquery,
+            'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=18, MinWords=6, FragmentDelimiter=" … "'
+        )
+    FROM page pg
+    JOIN erp_permits p ON p.id = pg.id
+    ORDER BY pg.score DESC, p.id DESC;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+COMMENT ON FUNCTION search_permits IS 'Ranked permit search (full-text + trigram) over the 1,000 closest trigram and 1,000 best full-text matches, with keyset pagination on (rank, id) and <mark> highlighting';
+
+-- ============================================================================
+-- FUNCTION: search_permits_by_name (index-backed)
+-- ============================================================================
+-- Same signature and results; finds candidates with the trigram-indexed
+-- search_text instead of scanning three columns, then keeps those where one
+-- field (applicant, company or project name) contains the term, as in
+-- migration 002.
+
+CREATE OR REPLACE FUNCTION search_permits_by_name(
+    search_term VARCHAR,
+    limit_results INTEGER DEFAULT 50
+)
+RETURNS TABLE (
+    permit_number VARCHAR,
+    applicant_name VARCHAR,
+    company_name VARCHAR,
+    project_name VARCHAR,
+    issue_date DATE,
+    county VARCHAR,
+    similarity_score REAL
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        p.permit_number,
+        p.applicant_name,
+        p.company_name,
+        p.project_name,
+        p.issue_date,
+        p.county,
+        GREATEST(
+            similarity(p.applicant_name, search_term),
+            similarity(p.company_name, search_term),
+            similarity(p.project_name, search_term)
+        ) AS similarity_score
+    FROM erp_permits p
+    -- Trigram index finds candidates; each name field contains its own
+    -- text, so every per-field match is also a search_text match
+    WHERE p.search_text LIKE '%' || lower(search_term) || '%'
+      AND (
+          p.applicant_name ILIKE '%' || search_term || '%'
+          OR p.company_name ILIKE '%' || search_term || '%'
+          OR p.project_name ILIKE '%' || search_term || '%'
+      )
+      AND p.source_removed_at IS NULL
+    ORDER BY similarity_score DESC
+    LIMIT limit_results;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION search_permits_by_name IS 'Fuzzy search permits by applicant, company, or project name';
+
+-- Reload schema cache
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,380 @@
+-- PermitIQ Database Schema - Migration 017
+-- Monthly partitioning and partition-drop retention for change and history tables
+-- Version: 1.0.0
+-- Created: 2026-10-19
+
+-- ============================================================================
+-- PROBLEM
+-- ============================================================================
+-- cleanup_old_changes() enforces retention with a row-by-row DELETE on
+-- erp_permit_changes, leaving dead tuples and bloated indexes behind in the
+-- table the ETL and reconcile write to. erp_permit_history has no retention.
+-- Queries over a recent window (find_permits_with_recent_revisions, change
+-- feeds) scan both tables' full history.
+--
+-- ============================================================================
+-- SOLUTION
+-- ============================================================================
+-- Both tables are range-partitioned by month:
+--   erp_permit_changes  on change_detected_at
+--   erp_permit_history  on captured_at
+-- Partitions are named <table>_pYYYYMM. A DEFAULT partition catches rows
+-- outside the created range.
+--
+-- maintain_change_partitions(), called by the ETL at the start of each run:
+-- - creates partitions for the coming months
+-- - detaches and drops whole partitions older than the retention periods
+--   (no DELETE, no vacuum debt)
+--
+-- Only the owner of a partitioned table can create, detach or drop its
+-- partitions, and the ETL calls as service_role. The partition functions are
+-- SECURITY DEFINER, owned by the tables' owner; only
+-- maintain_change_partitions() is granted, to service_role.
+--
+-- Postgres refuses to create a partition whose range would move rows out of
+-- the DEFAULT partition. When it holds rows for a missing month (maintenance
+-- didn't run), create_monthly_partitions() builds that partition as a
+-- standalone table, moves the rows into it and then attaches it.
+--
+-- History revisions are deltas (migration 015). Before old history partitions
+-- are dropped, the oldest surviving revision of each permit is rewritten as a
+-- keyframe so the remaining chain can still be rebuilt.
+--
+-- The primary keys become (id, <partition column>), as partitioned tables
+-- require. erp_permit_history's UNIQUE (data_source, permit_number,
+-- revision_number) becomes a plain index. append_permit_history() numbers
+-- revisions from the stored head and never relied on the constraint.
+
+-- ============================================================================
+-- FUNCTION: create_monthly_partitions
+-- Purpose: Create the monthly partitions of a table covering a date range
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION create_monthly_partitions(
+    p_table TEXT,
+    p_from DATE,
+    p_to DATE
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_month DATE := date_trunc('month', p_from)::DATE;
+    v_column TEXT;
+    v_default TEXT := p_table || '_default';
+    v_partition TEXT;
+    v_start TIMESTAMP WITH TIME ZONE;
+    v_end TIMESTAMP WITH TIME ZONE;
+    v_has_rows BOOLEAN;
+    v_created INTEGER := 0;
+BEGIN
+    v_column := CASE p_table
+        WHEN 'erp_permit_changes' THEN 'change_detected_at'
+        WHEN 'erp_permit_history' THEN 'captured_at'
+    END;
+    IF v_column IS NULL THEN
+        RAISE EXCEPTION 'Table % is not partitioned by month', p_table;
+    END IF;
+
+    WHILE v_month <= p_to LOOP
+        v_partition := p_table || '_p' || to_char(v_month, 'YYYYMM');
+        v_start := v_month::TIMESTAMP WITH TIME ZONE;
+        v_end := (v_month + INTERVAL '1 month')::TIMESTAMP WITH TIME ZONE;
+
+        IF to_regclass(v_partition) IS NULL THEN
+            v_has_rows := FALSE;
+            IF to_regclass(v_default) IS NOT NULL THEN
+                EXECUTE format(
+                    'SELECT EXISTS (SELECT 1 FROM %I WHERE %I >= $1 AND %I < $2)',
+                    v_default, v_column, v_column
+                ) INTO v_has_rows USING v_start, v_end;
+            END IF;
+
+            IF v_has_rows THEN
+                -- Rows for this month sit in the default partition: move them
+                -- into a standalone table, then attach it
+                EXECUTE format(
+                    'CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                    v_partition, p_table
+                );
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM %I WHERE %I >= $1 AND %I < $2 RETURNING *) '
+                    'INSERT INTO %I SELECT * FROM moved',
+                    v_default, v_column, v_column, v_partition
+                ) USING v_start, v_end;
+                EXECUTE format(
+                    'ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                    p_table, v_partition, v_start, v_end
+                );
+            ELSE
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                    v_partition, p_table, v_start, v_end
+                );
+            END IF;
+            v_created := v_created + 1;
+        END IF;
+
+        v_month := (v_month + INTERVAL '1 month')::DATE;
+    END LOOP;
+
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+COMMENT ON FUNCTION create_monthly_partitions IS 'Create missing <table>_pYYYYMM partitions for the months between p_from and p_to, moving matching rows out of <table>_default';
+
+-- ============================================================================
+-- FUNCTION: drop_old_partitions
+-- Purpose: Retention by detaching and dropping whole monthly partitions
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION drop_old_partitions(
+    p_table TEXT,
+    p_retention_months INTEGER
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_cutoff DATE := (date_trunc('month', NOW()) - make_interval(months => p_retention_months))::DATE;
+    v_partition RECORD;
+    v_dropped INTEGER := 0;
+BEGIN
+    IF p_table NOT IN ('erp_permit_changes', 'erp_permit_history') THEN
+        RAISE EXCEPTION 'Table % is not partitioned by month', p_table;
+    END IF;
+
+    IF p_retention_months IS NULL OR p_retention_months <= 0 THEN
+        RETURN 0;
+    END IF;
+
+    IF p_table = 'erp_permit_history' THEN
+        -- Revisions are deltas: the oldest surviving revision of each permit
+        -- must carry its full state before its keyframe is dropped
+        UPDATE erp_permit_history h
+        SET delta = get_permit_revision_state(h.permit_number, h.revision_number, h.data_source),
+            is_keyframe = TRUE
+        FROM (
+            SELECT DISTINCT ON (s.data_source, s.permit_number)
+                s.data_source, s.permit_number, s.revision_number
+            FROM erp_permit_history s
+            WHERE s.captured_at >= v_cutoff
+              AND EXISTS (
+                  SELECT 1 FROM erp_permit_history o
+                  WHERE o.data_source = s.data_source
+                    AND o.permit_number = s.permit_number
+                    AND o.captured_at < v_cutoff
+              )
+            ORDER BY s.data_source, s.permit_number, s.revision_number
+        ) first_kept
+        WHERE h.data_source = first_kept.data_source
+          AND h.permit_number = first_kept.permit_number
+          AND h.revision_number = first_kept.revision_number
+          AND h.captured_at >= v_cutoff
+          AND NOT h.is_keyframe;
+    END IF;
+
+    FOR v_partition IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = p_table::REGCLASS
+          AND c.relname ~ ('^' || p_table || '_p[0-9]{6}$')
+          AND to_date(right(c.relname, 6), 'YYYYMM') < v_cutoff
+        ORDER BY c.relname
+    LOOP
+        EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', p_table, v_partition.relname);
+        EXECUTE format('DROP TABLE %I', v_partition.relname);
+        v_dropped := v_dropped + 1;
+    END LOOP;
+
+    RETURN v_dropped;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+COMMENT ON FUNCTION drop_old_partitions IS 'Detach and drop monthly partitions that ended more than p_retention_months ago';
+
+-- ============================================================================
+-- FUNCTION: maintain_change_partitions
+-- Purpose: Create upcoming partitions and apply retention (called by ETL)
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION maintain_change_partitions(
+    p_months_ahead INTEGER DEFAULT 3,
+    p_changes_retention_months INTEGER DEFAULT 24,
+    p_history_retention_months INTEGER DEFAULT 60
+)
+RETURNS TABLE (
+    table_name TEXT,
+    partitions_created INTEGER,
+    partitions_dropped INTEGER
+) AS $$
+DECLARE
+    v_until DATE := (date_trunc('month', NOW()) + make_interval(months => p_months_ahead))::DATE;
+BEGIN
+    RETURN QUERY SELECT
+        'erp_permit_changes'::TEXT,
+        create_monthly_partitions('erp_permit_changes', CURRENT_DATE, v_until),
+        drop_old_partitions('erp_permit_changes', p_changes_retention_months);
+
+    RETURN QUERY SELECT
+        'erp_permit_history'::TEXT,
+        create_monthly_partitions('erp_permit_history', CURRENT_DATE, v_until),
+        drop_old_partitions('erp_permit_history', p_history_retention_months);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+COMMENT ON FUNCTION maintain_change_partitions IS 'Create the next months'' partitions and drop expired ones for erp_permit_changes/erp_permit_history (called by ETL)';
+
+REVOKE ALL ON FUNCTION create_monthly_partitions(TEXT, DATE, DATE) FROM PUBLIC;
+REVOKE ALL ON FUNCTION drop_old_partitions(TEXT, INTEGER) FROM PUBLIC;
+REVOKE ALL ON FUNCTION maintain_change_partitions(INTEGER, INTEGER, INTEGER) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION maintain_change_partitions(INTEGER, INTEGER, INTEGER) TO service_role;
+
+-- ============================================================================
+-- TABLE: erp_permit_changes (partitioned by change_detected_at)
+-- ============================================================================
+
+ALTER TABLE erp_permit_changes RENAME TO erp_permit_changes_unpartitioned;
+
+UPDATE erp_permit_changes_unpartitioned SET change_detected_at = NOW() WHERE change_detected_at IS NULL;
+
+CREATE TABLE erp_permit_changes (
+    LIKE erp_permit_changes_unpartitioned INCLUDING DEFAULTS INCLUDING COMMENTS
+) PARTITION BY RANGE (change_detected_at);
+
+ALTER TABLE erp_permit_changes ALTER COLUMN change_detected_at SET NOT NULL;
+
+-- The id sequence outlives the old table
+ALTER SEQUENCE erp_permit_changes_id_seq OWNED BY erp_permit_changes.id;
+
+SELECT create_monthly_partitions(
+    'erp_permit_changes',
+    COALESCE((SELECT MIN(change_detected_at)::DATE FROM erp_permit_changes_unpartitioned), CURRENT_DATE),
+    (CURRENT_DATE + INTERVAL '3 months')::DATE
+);
+CREATE TABLE erp_permit_changes_default PARTITION OF erp_permit_changes DEFAULT;
+
+INSERT INTO erp_permit_changes SELECT * FROM erp_permit_changes_unpartitioned;
+
+DROP TABLE erp_permit_changes_unpartitioned;
+
+ALTER TABLE erp_permit_changes ADD PRIMARY KEY (id, change_detected_at);
+ALTER TABLE erp_permit_changes
+    ADD CONSTRAINT erp_permit_changes_permit_id_fkey
+    FOREIGN KEY (permit_id) REFERENCES erp_permits(id) ON DELETE CASCADE;
+
+CREATE INDEX IF NOT EXISTS idx_erp_changes_permit_id ON erp_permit_changes(permit_id);
+CREATE INDEX IF NOT EXISTS idx_erp_changes_permit_number ON erp_permit_changes(permit_number);
+CREATE INDEX IF NOT EXISTS idx_erp_changes_detected_at ON erp_permit_changes(change_detected_at DESC);
+CREATE INDEX IF NOT EXISTS idx_erp_changes_type ON erp_permit_changes(change_type);
+CREATE INDEX IF NOT EXISTS idx_erp_changes_etl_run ON erp_permit_changes(etl_run_id);
+
+ALTER TABLE erp_permit_changes ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Service role full access to changes"
+    ON erp_permit_changes
+    FOR ALL
+    TO service_role
+    USING (true)
+    WITH CHECK (true);
+
+CREATE POLICY "Authenticated users can read changes"
+    ON erp_permit_changes
+    FOR SELECT
+    TO authenticated
+    USING (true);
+
+COMMENT ON TABLE erp_permit_changes IS 'Permit change log, partitioned by month of change_detected_at (see maintain_change_partitions)';
+
+-- ============================================================================
+-- TABLE: erp_permit_history (partitioned by captured_at)
+-- ============================================================================
+
+ALTER TABLE erp_permit_history RENAME TO erp_permit_history_unpartitioned;
+
+UPDATE erp_permit_history_unpartitioned
+SET captured_at = COALESCE(created_at, NOW())
+WHERE captured_at IS NULL;
+
+CREATE TABLE erp_permit_history (
+    LIKE erp_permit_history_unpartitioned INCLUDING DEFAULTS INCLUDING COMMENTS
+) PARTITION BY RANGE (captured_at);
+
+ALTER TABLE erp_permit_history ALTER COLUMN captured_at SET NOT NULL;
+
+ALTER SEQUENCE erp_permit_history_id_seq OWNED BY erp_permit_history.id;
+
+SELECT create_monthly_partitions(
+    'erp_permit_history',
+    COALESCE((SELECT MIN(captured_at)::DATE FROM erp_permit_history_unpartitioned), CURRENT_DATE),
+    (CURRENT_DATE + INTERVAL '3 months')::DATE
+);
+CREATE TABLE erp_permit_history_default PARTITION OF erp_permit_history DEFAULT;
+
+INSERT INTO erp_permit_history SELECT * FROM erp_permit_history_unpartitioned;
+
+DROP TABLE erp_permit_history_unpartitioned;
+
+ALTER TABLE erp_permit_history ADD PRIMARY KEY (id, captured_at);
+ALTER TABLE erp_permit_history
+    ADD CONSTRAINT erp_permit_history_permit_id_fkey
+    FOREIGN KEY (permit_id) REFERENCES erp_permits(id) ON DELETE CASCADE;
+
+CREATE INDEX IF NOT EXISTS idx_permit_history_source_permit_revision
+    ON erp_permit_history(data_source, permit_number, revision_number);
+CREATE INDEX IF NOT EXISTS idx_permit_history_keyframes
+    ON erp_permit_history(data_source, permit_number, revision_number)
+    WHERE is_keyframe;
+CREATE INDEX IF NOT EXISTS idx_permit_history_permit_id ON erp_permit_history(permit_id);
+CREATE INDEX IF NOT EXISTS idx_permit_history_permit_number ON erp_permit_history(permit_number);
+CREATE INDEX IF NOT EXISTS idx_permit_history_objectid ON erp_permit_history(objectid);
+CREATE INDEX IF NOT EXISTS idx_permit_history_captured_at ON erp_permit_history(captured_at DESC);
+CREATE INDEX IF NOT EXISTS idx_permit_history_geometry ON erp_permit_history USING GIST(geometry);
+CREATE INDEX IF NOT EXISTS idx_permit_history_location ON erp_permit_history USING GIST(location);
+
+ALTER TABLE erp_permit_history ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow authenticated read access to permit history"
+    ON erp_permit_history
+    FOR SELECT
+    TO authenticated
+    USING (true);
+
+CREATE POLICY "Allow service role full access to permit history"
+    ON erp_permit_history
+    FOR ALL
+    TO service_role
+    USING (true)
+    WITH CHECK (true);
+
+COMMENT ON TABLE erp_permit_history IS 'Permit revisions as deltas with periodic keyframes, partitioned by month of captured_at (see maintain_change_partitions)';
+
+-- ============================================================================
+-- OWNERSHIP: partition functions
+-- ============================================================================
+
+-- Partition DDL needs the owner of the partitioned tables
+DO $$
+DECLARE
+    v_owner NAME := (SELECT tableowner FROM pg_tables WHERE schemaname = 'public' AND tablename = 'erp_permit_changes');
+BEGIN
+    EXECUTE format('ALTER FUNCTION create_monthly_partitions(TEXT, DATE, DATE) OWNER TO %I', v_owner);
+    EXECUTE format('ALTER FUNCTION drop_old_partitions(TEXT, INTEGER) OWNER TO %I', v_owner);
+    EXECUTE format('ALTER FUNCTION maintain_change_partitions(INTEGER, INTEGER, INTEGER) OWNER TO %I', v_owner);
+END;
+$$;
+
+-- ============================================================================
+-- FUNCTION: cleanup_old_changes
+-- Purpose: Keep the last 2 years of changes (now drops whole partitions)
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION cleanup_old_changes()
+RETURNS INTEGER AS $$
+BEGIN
+    RETURN drop_old_partitions('erp_permit_changes', 24);
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION cleanup_old_changes IS 'Drop change partitions older than 2 years (returns partitions dropped)';
+
+-- Reload schema cache
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,219 @@
+-- PermitIQ Database Schema - Migration 018
+-- Multipart polygon repair on write and bounding-box columns for viewport queries
+-- Version: 1.0.0
+-- Created: 2026-10-19
+
+-- ============================================================================
+-- PROBLEM
+-- ============================================================================
+-- ArcGIS rings were stored as received. Self-intersecting polygons and
+-- multipart permits flattened into one POLYGON (extra outer rings stored as
+-- holes) are invalid: ST_Intersects/ST_Area on them are slow or raise
+-- TopologyException. The map loads every permit in pages of 1,000 instead of
+-- asking for what is on screen, and a viewport lookup on the GIST index still
+-- has to fetch the full polygons.
+--
+-- ============================================================================
+-- SOLUTION
+-- ============================================================================
+-- - The ETL closes rings, drops repeated vertices and degenerate rings, and
+--   groups rings into parts by their ArcGIS orientation (clockwise rings are
+--   outer boundaries, counter-clockwise rings holes of the preceding part).
+--   It sends a MULTIPOLYGON (etl/geometry.py, repair_polygons)
+-- - erp_permits.geometry and erp_permit_history.geometry become
+--   MULTIPOLYGON, so multipart permits keep every part
+-- - A trigger makes the remaining invalid polygons valid on write
+--   (ST_MakeValid), keeping every polygon part of the result
+-- - The same trigger keeps min_lon/min_lat/max_lon/max_lat of the polygon
+--   (or the centroid when there is no polygon)
+-- - get_permits_in_viewport() filters on a GiST index over those columns and
+--   pages with an id keyset, so each map pan returns a bounded page
+
+-- ============================================================================
+-- COLUMNS
+-- ============================================================================
+
+ALTER TABLE erp_permits
+    ADD COLUMN IF NOT EXISTS min_lon DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS min_lat DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS max_lon DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS max_lat DOUBLE PRECISION;
+
+COMMENT ON COLUMN erp_permits.min_lon IS 'Bounding box of geometry (or location) - west; maintained by trigger';
+COMMENT ON COLUMN erp_permits.min_lat IS 'Bounding box of geometry (or location) - south; maintained by trigger';
+COMMENT ON COLUMN erp_permits.max_lon IS 'Bounding box of geometry (or location) - east; maintained by trigger';
+COMMENT ON COLUMN erp_permits.max_lat IS 'Bounding box of geometry (or location) - north; maintained by trigger';
+
+-- ============================================================================
+-- FUNCTION: permit_bbox
+-- Purpose: Box of the bounding-box columns (indexed expression)
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION permit_bbox(
+    p_min_lon DOUBLE PRECISION,
+    p_min_lat DOUBLE PRECISION,
+    p_max_lon DOUBLE PRECISION,
+    p_max_lat DOUBLE PRECISION
+)
+RETURNS BOX AS $$
+    SELECT box(point(p_min_lon, p_min_lat), point(p_max_lon, p_max_lat));
+$$ LANGUAGE sql IMMUTABLE;
+
+-- ============================================================================
+-- FUNCTION: repair_polygon
+-- Purpose: Valid MULTIPOLYGON from any polygon, keeping every part
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION repair_polygon(p_geometry GEOMETRY)
+RETURNS GEOMETRY AS $$
+    SELECT CASE
+        WHEN p_geometry IS NULL THEN NULL
+        WHEN ST_IsValid(p_geometry) THEN ST_Multi(p_geometry)
+        ELSE (
+            SELECT CASE WHEN ST_IsEmpty(repaired.geom) THEN NULL ELSE repaired.geom END
+            FROM (SELECT ST_Multi(ST_CollectionExtract(ST_MakeValid(p_geometry), 3)) AS geom) repaired
+        )
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+COMMENT ON FUNCTION repair_polygon IS 'ST_MakeValid for MULTIPOLYGON columns: returns the input as a MULTIPOLYGON if valid, else every polygon part of the repaired shape (NULL if it collapses)';
+
+-- ============================================================================
+-- COLUMN TYPES: MULTIPOLYGON
+-- ============================================================================
+
+-- Depends on erp_permits.* (migration 003); re-created with the same definition below
+DROP VIEW IF EXISTS recent_permit_activity;
+
+ALTER TABLE erp_permits
+    ALTER COLUMN geometry TYPE GEOMETRY(MultiPolygon, 4326) USING ST_Multi(geometry);
+
+ALTER TABLE erp_permit_history
+    ALTER COLUMN geometry TYPE GEOMETRY(MultiPolygon, 4326) USING ST_Multi(geometry);
+
+COMMENT ON COLUMN erp_permits.geometry IS 'Permit boundary with every part (ArcGIS rings grouped by orientation); repaired by trigger';
+
+CREATE OR REPLACE VIEW recent_permit_activity AS
+SELECT
+    p.*,
+    CASE
+        WHEN p.created_at >= NOW() - INTERVAL '30 days' THEN 'new'
+        WHEN p.updated_at >= NOW() - INTERVAL '30 days' THEN 'updated'
+        ELSE 'stable'
+    END AS activity_status
+FROM erp_permits p
+WHERE p.created_at >= NOW() - INTERVAL '30 days'
+   OR p.updated_at >= NOW() - INTERVAL '30 days'
+ORDER BY p.updated_at DESC;
+
+-- ============================================================================
+-- TRIGGER: repair geometry and maintain bounding box on insert/update
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION update_erp_permits_geometry()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_shape GEOMETRY;
+BEGIN
+    NEW.geometry := repair_polygon(NEW.geometry);
+
+    v_shape := COALESCE(NEW.geometry, NEW.location);
+    NEW.min_lon := ST_XMin(v_shape);
+    NEW.min_lat := ST_YMin(v_shape);
+    NEW.max_lon := ST_XMax(v_shape);
+    NEW.max_lat := ST_YMax(v_shape);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS update_erp_permits_geometry ON erp_permits;
+CREATE TRIGGER update_erp_permits_geometry
+    BEFORE INSERT OR UPDATE OF geometry, location
+    ON erp_permits
+    FOR EACH ROW
+    EXECUTE FUNCTION update_erp_permits_geometry();
+
+-- Backfill existing permits (without touching updated_at, which the map
+-- orders by)
+ALTER TABLE erp_permits DISABLE TRIGGER update_erp_permits_updated_at;
+
+UPDATE erp_permits
+SET geometry = repair_polygon(geometry)
+WHERE geometry IS NOT NULL AND NOT ST_IsValid(geometry);
+
+UPDATE erp_permits
+SET min_lon = ST_XMin(COALESCE(geometry, location)),
+    min_lat = ST_YMin(COALESCE(geometry, location)),
+    max_lon = ST_XMax(COALESCE(geometry, location)),
+    max_lat = ST_YMax(COALESCE(geometry, location))
+WHERE min_lon IS NULL AND (geometry IS NOT NULL OR location IS NOT NULL);
+
+ALTER TABLE erp_permits ENABLE TRIGGER update_erp_permits_updated_at;
+
+-- ============================================================================
+-- INDEXES
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_erp_permits_bbox
+    ON erp_permits USING GIST(permit_bbox(min_lon, min_lat, max_lon, max_lat))
+    WHERE source_removed_at IS NULL;
+
+-- ============================================================================
+-- FUNCTION: get_permits_in_viewport
+-- Purpose: Permits overlapping a map viewport, keyset-paginated by id
+-- ============================================================================
+-- Page 1:  get_permits_in_viewport(-82.6, 27.8, -82.3, 28.1)
+-- Page 2+: get_permits_in_viewport(-82.6, 27.8, -82.3, 28.1, 1000, <last id>)
+
+CREATE OR REPLACE FUNCTION get_permits_in_viewport(
+    p_min_lon DOUBLE PRECISION,
+    p_min_lat DOUBLE PRECISION,
+    p_max_lon DOUBLE PRECISION,
+    p_max_lat DOUBLE PRECISION,
+    p_limit INTEGER DEFAULT 1000,
+    p_after_id BIGINT DEFAULT 0,
+    p_data_source TEXT DEFAULT NULL
+)
+RETURNS TABLE (
+    id BIGINT,
+    permit_number VARCHAR,
+    applicant_name VARCHAR,
+    project_name VARCHAR,
+    permit_type VARCHAR,
+    permit_status VARCHAR,
+    county VARCHAR,
+    issue_date DATE,
+    acreage DECIMAL,
+    latitude DECIMAL,
+    longitude DECIMAL,
+    data_source VARCHAR,
+    geometry GEOMETRY
+) AS $$
+    SELECT
+        p.id,
+        p.permit_number,
+        p.applicant_name,
+        p.project_name,
+        p.permit_type,
+        p.permit_status,
+        p.county,
+        p.issue_date,
+        p.acreage,
+        p.latitude,
+        p.longitude,
+        p.data_source,
+        p.geometry
+    FROM erp_permits p
+    WHERE permit_bbox(p.min_lon, p.min_lat, p.max_lon, p.max_lat)
+            && box(point(p_min_lon, p_min_lat), point(p_max_lon, p_max_lat))
+      AND p.source_removed_at IS NULL
+      AND p.id > COALESCE(p_after_id, 0)
+      AND (p_data_source IS NULL OR p.data_source = p_data_source)
+    ORDER BY p.id
+    LIMIT LEAST(GREATEST(p_limit, 1), 5000);
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION get_permits_in_viewport IS 'Permits whose bounding box overlaps the viewport, ordered by id; pass the last id to get the next page';
+
+-- Reload schema cache
+NOTIFY pgrst, 'reload schema';
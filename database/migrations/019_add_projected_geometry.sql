@@ -0,0 +1,221 @@
+-- PermitIQ Database Schema - Migration 019
+-- Metric-projected geometry columns for index-driven radius searches
+-- Version: 1.0.0
+-- Created: 2026-10-19
+
+-- ============================================================================
+-- PROBLEM
+-- ============================================================================
+-- find_permits_near_point() and find_nearby_competitor_activity() cast
+-- every permit to geography and run ST_DWithin on the casts. The GIST
+-- indexes are on the raw EPSG:4326 columns, so the casts can't use them:
+-- every radius search computes a geography distance for every permit.
+-- detect_permit_clusters() passes its radius in meters as a DBSCAN eps in
+-- degrees.
+--
+-- ============================================================================
+-- SOLUTION
+-- ============================================================================
+-- - geometry_3086 / location_3086: the polygon and centroid in EPSG:3086
+--   (NAD83 / Florida GDL Albers, meters; covers all five districts)
+-- - They are maintained by the geometry trigger from migration 018 on every
+--   ETL write, and both have GIST indexes
+-- - Radius searches are two-step:
+--     1. ST_DWithin on the projected column (index scan, meters)
+--     2. ST_DWithin on geography for the candidates (precise recheck)
+--   Scale error of EPSG:3086 is well under 1% within Florida. Step 1 uses
+--   a radius 1% larger so no permit within the true radius is missed.
+-- - Function signatures are unchanged; permits removed from their source
+--   (source_removed_at, migration 013) are skipped
+
+-- ============================================================================
+-- COLUMNS
+-- ============================================================================
+
+ALTER TABLE erp_permits
+    ADD COLUMN IF NOT EXISTS geometry_3086 GEOMETRY(MultiPolygon, 3086),
+    ADD COLUMN IF NOT EXISTS location_3086 GEOMETRY(Point, 3086);
+
+COMMENT ON COLUMN erp_permits.geometry_3086 IS 'geometry in EPSG:3086 (Florida GDL Albers, meters) for radius searches; maintained by trigger';
+COMMENT ON COLUMN erp_permits.location_3086 IS 'location in EPSG:3086 (Florida GDL Albers, meters) for radius searches; maintained by trigger';
+
+-- ============================================================================
+-- TRIGGER: repair geometry, maintain bounding box and projected columns
+-- ============================================================================
+-- Replaces the function from migration 018; the trigger itself
+-- (BEFORE INSERT OR UPDATE OF geometry, location) is unchanged.
+
+CREATE OR REPLACE FUNCTION update_erp_permits_geometry()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_shape GEOMETRY;
+BEGIN
+    NEW.geometry := repair_polygon(NEW.geometry);
+
+    v_shape := COALESCE(NEW.geometry, NEW.location);
+    NEW.min_lon := ST_XMin(v_shape);
+    NEW.min_lat := ST_YMin(v_shape);
+    NEW.max_lon := ST_XMax(v_shape);
+    NEW.max_lat := ST_YMax(v_shape);
+
+    NEW.geometry_3086 := ST_Transform(NEW.geometry, 3086);
+    NEW.location_3086 := ST_Transform(NEW.location, 3086);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill existing permits (without touching updated_at)
+ALTER TABLE erp_permits DISABLE TRIGGER update_erp_permits_updated_at;
+
+UPDATE erp_permits
+SET geometry_3086 = ST_Transform(geometry, 3086),
+    location_3086 = ST_Transform(location, 3086)
+WHERE (geometry IS NOT NULL AND geometry_3086 IS NULL)
+   OR (location IS NOT NULL AND location_3086 IS NULL);
+
+ALTER TABLE erp_permits ENABLE TRIGGER update_erp_permits_updated_at;
+
+-- ============================================================================
+-- INDEXES
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_erp_permits_geometry_3086 ON erp_permits USING GIST(geometry_3086);
+CREATE INDEX IF NOT EXISTS idx_erp_permits_location_3086 ON erp_permits USING GIST(location_3086);
+
+-- ============================================================================
+-- FUNCTION: find_permits_near_point (index-driven)
+-- ============================================================================
+-- Usage: SELECT * FROM find_permits_near_point(-82.4572, 27.9506, 16093) -- 10 miles of Tampa
+
+CREATE OR REPLACE FUNCTION find_permits_near_point(
+    lng DECIMAL,
+    lat DECIMAL,
+    radius_meters INTEGER DEFAULT 1609  -- Default 1 mile
+)
+RETURNS TABLE (
+    permit_number VARCHAR,
+    applicant_name VARCHAR,
+    distance_meters DECIMAL,
+    geometry GEOMETRY
+) AS $$
+DECLARE
+    v_point GEOMETRY := ST_SetSRID(ST_MakePoint(lng, lat), 4326);
+    v_point_3086 GEOMETRY := ST_Transform(ST_SetSRID(ST_MakePoint(lng, lat), 4326), 3086);
+BEGIN
+    RETURN QUERY
+    SELECT
+        p.permit_number,
+        p.applicant_name,
+        ST_Distance(p.geometry::geography, v_point::geography)::DECIMAL AS distance_meters,
+        p.geometry
+    FROM erp_permits p
+    -- Index candidates in meters, then the precise geography check
+    WHERE ST_DWithin(p.geometry_3086, v_point_3086, radius_meters * 1.01)
+      AND ST_DWithin(p.geometry::geography, v_point::geography, radius_meters)
+      AND p.source_removed_at IS NULL
+    ORDER BY distance_meters;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+COMMENT ON FUNCTION find_permits_near_point IS 'Find all permits within specified radius of a point (EPSG:3086 index scan, geography recheck)';
+
+-- ============================================================================
+-- FUNCTION: find_nearby_competitor_activity (index-driven)
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION find_nearby_competitor_activity(
+    p_longitude NUMERIC,
+    p_latitude NUMERIC,
+    p_radius_miles NUMERIC DEFAULT 5.0,
+    p_competitor_type TEXT DEFAULT NULL
+)
+RETURNS TABLE (
+    company_name TEXT,
+    competitor_type TEXT,
+    priority_level TEXT,
+    permit_number TEXT,
+    project_name TEXT,
+    distance_miles NUMERIC,
+    issue_date TIMESTAMP WITH TIME ZONE
+) AS $$
+DECLARE
+    v_point GEOMETRY := ST_SetSRID(ST_MakePoint(p_longitude, p_latitude), 4326);
+    v_point_3086 GEOMETRY := ST_Transform(ST_SetSRID(ST_MakePoint(p_longitude, p_latitude), 4326), 3086);
+    v_radius_meters DOUBLE PRECISION := p_radius_miles * 1609.34;  -- Convert miles to meters
+BEGIN
+    RETURN QUERY
+    WITH nearby AS (
+        -- Index candidates in meters, then the precise geography check
+        SELECT
+            p.id,
+            p.permit_number,
+            p.project_name,
+            p.issue_date,
+            ST_Distance(p.location::geography, v_point::geography) AS distance_meters
+        FROM erp_permits p
+        WHERE ST_DWithin(p.location_3086, v_point_3086, v_radius_meters * 1.01)
+          AND ST_DWithin(p.location::geography, v_point::geography, v_radius_meters)
+          AND p.source_removed_at IS NULL
+    )
+    SELECT
+        c.company_name,
+        c.competitor_type,
+        c.priority_level,
+        n.permit_number::TEXT,
+        n.project_name::TEXT,
+        ROUND((n.distance_meters * 0.000621371)::NUMERIC, 2) AS distance_miles,
+        n.issue_date::TIMESTAMP WITH TIME ZONE
+    FROM nearby n
+    JOIN competitor_permit_matches m ON m.permit_id = n.id
+    JOIN competitor_watchlist c ON c.id = m.competitor_id
+    WHERE (p_competitor_type IS NULL OR c.competitor_type = p_competitor_type)
+    ORDER BY distance_miles ASC;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+COMMENT ON FUNCTION find_nearby_competitor_activity IS 'Find competitor permits within radius of a location (EPSG:3086 index scan, geography recheck)';
+
+-- ============================================================================
+-- FUNCTION: detect_permit_clusters (eps in meters)
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION detect_permit_clusters(
+    radius_meters INTEGER DEFAULT 1609,  -- 1 mile
+    min_permits INTEGER DEFAULT 5
+)
+RETURNS TABLE (
+    cluster_center GEOMETRY,
+    permit_count BIGINT,
+    center_lat DECIMAL,
+    center_lng DECIMAL,
+    county VARCHAR
+) AS $$
+BEGIN
+    RETURN QUERY
+    WITH clusters AS (
+        SELECT
+            -- Projected polygons, so eps is in meters (it was degrees on 4326)
+            ST_ClusterDBSCAN(geometry_3086, eps := radius_meters, minpoints := min_permits) OVER () AS cluster_id,
+            geometry,
+            erp_permits.county
+        FROM erp_permits
+        WHERE geometry_3086 IS NOT NULL
+        AND issue_date >= CURRENT_DATE - INTERVAL '90 days'
+        AND source_removed_at IS NULL
+    )
+    SELECT
+        ST_Centroid(ST_Collect(clusters.geometry)) AS cluster_center,
+        COUNT(*) AS permit_count,
+        ST_Y(ST_Centroid(ST_Collect(clusters.geometry)))::DECIMAL AS center_lat,
+        ST_X(ST_Centroid(ST_Collect(clusters.geometry)))::DECIMAL AS center_lng,
+        clusters.county
+    FROM clusters
+    WHERE cluster_id IS NOT NULL
+    GROUP BY cluster_id, clusters.county
+    HAVING COUNT(*) >= min_permits
+    ORDER BY permit_count DESC;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Reload schema cache
+NOTIFY pgrst, 'reload schema';
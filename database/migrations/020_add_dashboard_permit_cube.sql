@@ -0,0 +1,394 @@
+-- PermitIQ Database Schema - Migration 020
+-- Rollup cube behind the dashboard widgets
+-- Version: 1.0.0
+-- Created: 2026-10-19
+
+-- ============================================================================
+-- PROBLEM
+-- ============================================================================
+-- Every dashboard widget function (supabase/migrations/create_*.sql) scans
+-- erp_permits with its own GROUP BY: permits over time, permit types,
+-- status breakdown, counties, year over year. A dashboard load (or cache
+-- prewarm) scans the whole table five times to produce a few hundred numbers.
+--
+-- ============================================================================
+-- SOLUTION
+-- ============================================================================
+-- dashboard_permit_cube holds one row per
+--   (month, county, permit_type, permit_status, data_source)
+-- with the permit count and acreage sum/count. It has a few thousand cells
+-- and is rebuilt by the ETL after each load (refresh_permit_cube()) from the
+-- permits still in their source (source_removed_at IS NULL, migration 013).
+-- The rebuild TRUNCATEs the cube, which leaves no dead tuples but blocks
+-- readers until the function's transaction commits. It is one GROUP BY into
+-- a few thousand cells, and the widgets are served from dashboard_rpc_cache,
+-- which the ETL pre-warms after the load.
+--
+-- slice_permit_cube(group_by, filters...) rolls the cube up to any subset of
+-- the dimensions (plus status_category), and the widget functions are
+-- rewritten on top of it. Their signatures and columns are unchanged.
+--
+-- get_acreage_leaderboard() ranks individual permits, which a cube can't
+-- answer. It gets a sargable issue_date range and a partial index instead,
+-- and skips removed permits.
+
+-- ============================================================================
+-- FUNCTION: permit_status_category
+-- Purpose: Status grouping used by the status widget
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION permit_status_category(p_permit_status TEXT)
+RETURNS TEXT AS $$
+    SELECT CASE
+        WHEN p_permit_status IS NULL THEN NULL
+        WHEN LOWER(p_permit_status) LIKE '%active%' OR LOWER(p_permit_status) LIKE '%issued%' THEN 'Active'
+        WHEN LOWER(p_permit_status) LIKE '%expired%' OR LOWER(p_permit_status) LIKE '%expiration%' THEN 'Expired'
+        WHEN LOWER(p_permit_status) LIKE '%pending%' OR LOWER(p_permit_status) LIKE '%review%' OR LOWER(p_permit_status) LIKE '%processing%' THEN 'Pending'
+        WHEN LOWER(p_permit_status) LIKE '%denied%' OR LOWER(p_permit_status) LIKE '%rejected%' THEN 'Denied'
+        WHEN LOWER(p_permit_status) LIKE '%withdrawn%' OR LOWER(p_permit_status) LIKE '%cancelled%' THEN 'Withdrawn'
+        ELSE 'Other'
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- ============================================================================
+-- TABLE: dashboard_permit_cube
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS dashboard_permit_cube (
+    month DATE,                -- date_trunc('month', issue_date); NULL = no issue date
+    county TEXT,
+    permit_type TEXT,
+    permit_status TEXT,
+    data_source TEXT,
+    permit_count BIGINT NOT NULL,
+    acreage_count BIGINT NOT NULL,  -- permits with acreage (for averages)
+    acreage_sum NUMERIC NOT NULL,
+    refreshed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_dashboard_permit_cube_month ON dashboard_permit_cube(month);
+
+-- Read through the SECURITY DEFINER functions only
+ALTER TABLE dashboard_permit_cube ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE dashboard_permit_cube IS 'Permit counts and acreage by month/county/type/status/source; rebuilt by refresh_permit_cube() after each ETL load';
+
+-- ============================================================================
+-- FUNCTION: refresh_permit_cube
+-- Purpose: Rebuild the cube (called by ETL after the load)
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION refresh_permit_cube()
+RETURNS INTEGER AS $$
+DECLARE
+    v_cells INTEGER;
+BEGIN
+    TRUNCATE dashboard_permit_cube;
+
+    INSERT INTO dashboard_permit_cube (
+        month, county, permit_type, permit_status, data_source,
+        permit_count, acreage_count, acreage_sum
+    )
+    SELECT
+        date_trunc('month', issue_date)::DATE,
+        county,
+        permit_type,
+        permit_status,
+        data_source,
+        COUNT(*),
+        COUNT(acreage),
+        COALESCE(SUM(acreage), 0)
+    FROM erp_permits
+    WHERE source_removed_at IS NULL
+    GROUP BY 1, 2, 3, 4, 5;
+
+    GET DIAGNOSTICS v_cells = ROW_COUNT;
+    RETURN v_cells;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+COMMENT ON FUNCTION refresh_permit_cube IS 'Rebuild dashboard_permit_cube from the permits still in their source (called by ETL); returns the number of cells';
+
+REVOKE ALL ON FUNCTION refresh_permit_cube() FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION refresh_permit_cube() TO service_role;
+
+-- Initial build
+SELECT refresh_permit_cube();
+
+-- ============================================================================
+-- FUNCTION: slice_permit_cube
+-- Purpose: Roll the cube up to any set of dimensions, with filters
+-- ============================================================================
+-- p_group_by: any of 'month', 'year', 'county', 'permit_type',
+-- 'permit_status', 'status_category', 'data_source'. Dimensions not grouped
+-- by come back NULL.
+--
+-- Usage: SELECT * FROM slice_permit_cube(ARRAY['county'], p_from_month => '2025-01-01')
+
+CREATE OR REPLACE FUNCTION slice_permit_cube(
+    p_group_by TEXT[],
+    p_from_month DATE DEFAULT NULL,
+    p_to_month DATE DEFAULT NULL,
+    p_county TEXT DEFAULT NULL,
+    p_permit_type TEXT DEFAULT NULL,
+    p_permit_status TEXT DEFAULT NULL,
+    p_data_source TEXT DEFAULT NULL
+)
+RETURNS TABLE (
+    month DATE,
+    year INTEGER,
+    county TEXT,
+    permit_type TEXT,
+    permit_status TEXT,
+    status_category TEXT,
+    data_source TEXT,
+    permit_count BIGINT,
+    total_acreage NUMERIC,
+    avg_acreage NUMERIC
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    SELECT
+        CASE WHEN 'month' = ANY(p_group_by) THEN c.month END,
+        CASE WHEN 'year' = ANY(p_group_by) THEN EXTRACT(YEAR FROM c.month)::INTEGER END,
+        CASE WHEN 'county' = ANY(p_group_by) THEN c.county END,
+        CASE WHEN 'permit_type' = ANY(p_group_by) THEN c.permit_type END,
+        CASE WHEN 'permit_status' = ANY(p_group_by) THEN c.permit_status END,
+        CASE WHEN 'status_category' = ANY(p_group_by) THEN permit_status_category(c.permit_status) END,
+        CASE WHEN 'data_source' = ANY(p_group_by) THEN c.data_source END,
+        SUM(c.permit_count)::BIGINT,
+        -- NULL when no permit has acreage, like SUM(acreage)
+        CASE WHEN SUM(c.acreage_count) > 0 THEN SUM(c.acreage_sum) END,
+        SUM(c.acreage_sum) / NULLIF(SUM(c.acreage_count), 0)
+    FROM dashboard_permit_cube c
+    WHERE (p_from_month IS NULL OR c.month >= p_from_month)
+      AND (p_to_month IS NULL OR c.month <= p_to_month)
+      AND (p_county IS NULL OR c.county = p_county)
+      AND (p_permit_type IS NULL OR c.permit_type = p_permit_type)
+      AND (p_permit_status IS NULL OR c.permit_status = p_permit_status)
+      AND (p_data_source IS NULL OR c.data_source = p_data_source)
+    GROUP BY 1, 2, 3, 4, 5, 6, 7;
+$$;
+
+COMMENT ON FUNCTION slice_permit_cube IS 'Permit counts and acreage from dashboard_permit_cube, grouped by any of month/year/county/permit_type/permit_status/status_category/data_source';
+
+GRANT EXECUTE ON FUNCTION slice_permit_cube(TEXT[], DATE, DATE, TEXT, TEXT, TEXT, TEXT) TO authenticated;
+GRANT EXECUTE ON FUNCTION slice_permit_cube(TEXT[], DATE, DATE, TEXT, TEXT, TEXT, TEXT) TO anon;
+
+-- ============================================================================
+-- WIDGET FUNCTIONS (same signatures, answered from the cube)
+-- ============================================================================
+
+-- Monthly permit counts for the last 24 months. Months are whole: the first
+-- month counts all of its permits, not only those after the same day
+-- 24 months ago.
+CREATE OR REPLACE FUNCTION get_dashboard_permits_over_time()
+RETURNS TABLE (
+  month text,
+  permit_count bigint,
+  year_month date
+)
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT
+    TO_CHAR(s.month, 'Mon YYYY') as month,
+    s.permit_count,
+    s.month as year_month
+  FROM slice_permit_cube(
+    ARRAY['month'],
+    p_from_month => date_trunc('month', CURRENT_DATE - INTERVAL '24 months')::date,
+    p_to_month => CURRENT_DATE
+  ) s
+  WHERE s.month IS NOT NULL
+  ORDER BY s.month ASC;
+$$;
+
+CREATE OR REPLACE FUNCTION get_dashboard_permit_type_stats()
+RETURNS TABLE (
+  permit_type text,
+  permit_count bigint,
+  avg_acreage numeric,
+  total_acreage numeric
+)
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT s.permit_type, s.permit_count, s.avg_acreage, s.total_acreage
+  FROM slice_permit_cube(ARRAY['permit_type']) s
+  WHERE s.permit_type IS NOT NULL
+  ORDER BY s.permit_count DESC
+  LIMIT 10;
+$$;
+
+CREATE OR REPLACE FUNCTION get_dashboard_county_stats()
+RETURNS TABLE (
+  county text,
+  permit_count bigint,
+  avg_acreage numeric,
+  total_acreage numeric
+)
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT s.county, s.permit_count, s.avg_acreage, s.total_acreage
+  FROM slice_permit_cube(ARRAY['county']) s
+  WHERE s.county IS NOT NULL
+  ORDER BY s.permit_count DESC
+  LIMIT 10;
+$$;
+
+CREATE OR REPLACE FUNCTION get_permit_status_breakdown()
+RETURNS TABLE (
+  status_category text,
+  permit_count bigint,
+  percentage numeric
+)
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT
+    s.status_category,
+    s.permit_count,
+    ROUND((s.permit_count::numeric / SUM(s.permit_count) OVER () * 100), 2) as percentage
+  FROM slice_permit_cube(ARRAY['status_category']) s
+  WHERE s.status_category IS NOT NULL
+  ORDER BY s.permit_count DESC;
+$$;
+
+CREATE OR REPLACE FUNCTION get_year_over_year_comparison()
+RETURNS TABLE (
+  metric text,
+  current_year_value bigint,
+  previous_year_value bigint,
+  change_count bigint,
+  change_percentage numeric
+)
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  WITH years AS (
+    SELECT s.year, s.permit_count, s.total_acreage, s.avg_acreage
+    FROM slice_permit_cube(
+      ARRAY['year'],
+      p_from_month => date_trunc('year', CURRENT_DATE - INTERVAL '1 year')::date,
+      p_to_month => date_trunc('year', CURRENT_DATE)::date + INTERVAL '11 months'
+    ) s
+  ),
+  current_year_stats AS (
+    SELECT
+      COALESCE(SUM(permit_count), 0) as total_permits,
+      COALESCE(SUM(total_acreage), 0) as total_acreage,
+      COALESCE(MAX(avg_acreage), 0) as avg_acreage
+    FROM years WHERE year = EXTRACT(YEAR FROM CURRENT_DATE)
+  ),
+  previous_year_stats AS (
+    SELECT
+      COALESCE(SUM(permit_count), 0) as total_permits,
+      COALESCE(SUM(total_acreage), 0) as total_acreage,
+      COALESCE(MAX(avg_acreage), 0) as avg_acreage
+    FROM years WHERE year = EXTRACT(YEAR FROM CURRENT_DATE) - 1
+  )
+  SELECT * FROM (
+    SELECT
+      'Total Permits' as metric,
+      cy.total_permits::bigint as current_year_value,
+      py.total_permits::bigint as previous_year_value,
+      (cy.total_permits - py.total_permits)::bigint as change_count,
+      CASE
+        WHEN py.total_permits > 0 THEN
+          ROUND(((cy.total_permits - py.total_permits)::numeric / py.total_permits::numeric * 100), 2)
+        ELSE 0
+      END as change_percentage
+    FROM current_year_stats cy, previous_year_stats py
+
+    UNION ALL
+
+    SELECT
+      'Total Acreage' as metric,
+      cy.total_acreage::bigint as current_year_value,
+      py.total_acreage::bigint as previous_year_value,
+      (cy.total_acreage - py.total_acreage)::bigint as change_count,
+      CASE
+        WHEN py.total_acreage > 0 THEN
+          ROUND(((cy.total_acreage - py.total_acreage)::numeric / py.total_acreage::numeric * 100), 2)
+        ELSE 0
+      END as change_percentage
+    FROM current_year_stats cy, previous_year_stats py
+
+    UNION ALL
+
+    SELECT
+      'Avg Acreage' as metric,
+      ROUND(cy.avg_acreage)::bigint as current_year_value,
+      ROUND(py.avg_acreage)::bigint as previous_year_value,
+      (ROUND(cy.avg_acreage) - ROUND(py.avg_acreage))::bigint as change_count,
+      CASE
+        WHEN py.avg_acreage > 0 THEN
+          ROUND(((cy.avg_acreage - py.avg_acreage)::numeric / py.avg_acreage::numeric * 100), 2)
+        ELSE 0
+      END as change_percentage
+    FROM current_year_stats cy, previous_year_stats py
+  ) sub
+  ORDER BY metric;
+$$;
+
+-- ============================================================================
+-- FUNCTION: get_acreage_leaderboard (row-level; index-backed)
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_erp_permits_issue_date_acreage
+    ON erp_permits(issue_date, acreage DESC)
+    WHERE acreage > 0;
+
+CREATE OR REPLACE FUNCTION get_acreage_leaderboard(
+  filter_county text DEFAULT NULL,
+  filter_permit_type text DEFAULT NULL
+)
+RETURNS TABLE (
+  rank bigint,
+  permit_number text,
+  applicant_name text,
+  project_name text,
+  county text,
+  permit_type text,
+  acreage numeric,
+  issue_date date,
+  permit_status text
+)
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT
+    ROW_NUMBER() OVER (ORDER BY acreage DESC NULLS LAST) as rank,
+    permit_number,
+    applicant_name,
+    project_name,
+    county,
+    permit_type,
+    acreage,
+    issue_date::date,
+    permit_status
+  FROM erp_permits
+  WHERE acreage > 0
+    -- Current year as a range so the partial index applies
+    AND issue_date >= date_trunc('year', CURRENT_DATE)::date
+    AND issue_date < (date_trunc('year', CURRENT_DATE) + INTERVAL '1 year')::date
+    AND source_removed_at IS NULL
+    AND (filter_county IS NULL OR county = filter_county)
+    AND (filter_permit_type IS NULL OR permit_type = filter_permit_type)
+  ORDER BY acreage DESC
+  LIMIT 10;
+$$;
+
+-- Reload schema cache
+NOTIFY pgrst, 'reload schema';
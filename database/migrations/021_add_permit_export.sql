@@ -0,0 +1,124 @@
+-- PermitIQ Database Schema - Migration 021
+-- Keyset-paginated permit export
+-- Version: 1.0.0
+-- Created: 2026-10-19
+
+-- ============================================================================
+-- PROBLEM
+-- ============================================================================
+-- Bulk exports go through ad hoc select() calls on erp_permits. PostgREST
+-- caps responses at max-rows and OFFSET pagination rescans every earlier
+-- page. Geometry comes back as hex EWKB, and there is no way to express a
+-- bounding-box filter.
+--
+-- ============================================================================
+-- SOLUTION
+-- ============================================================================
+-- export_permits_page() returns one page of permits after a given id
+-- (keyset on the primary key), optionally capped at an upper id so
+-- etl/export_permits.py can read disjoint id ranges in parallel. It takes
+-- filters for county, issue date range, status and bounding box (on the
+-- bbox index from migration 018), and returns geometry as WKT, GeoJSON or
+-- hex WKB for the output format.
+
+-- ============================================================================
+-- FUNCTION: export_permits_page
+-- Purpose: One keyset page of filtered permits for bulk export
+-- ============================================================================
+-- Page 1:  export_permits_page(0, NULL, 1000)
+-- Page 2+: export_permits_page(<last id>, NULL, 1000)
+
+CREATE OR REPLACE FUNCTION export_permits_page(
+    p_after_id BIGINT,
+    p_max_id BIGINT DEFAULT NULL,
+    p_limit INTEGER DEFAULT 1000,
+    p_geometry_format TEXT DEFAULT 'geojson',  -- 'geojson', 'wkt', 'wkb' or 'none'
+    p_county TEXT DEFAULT NULL,
+    p_issued_from DATE DEFAULT NULL,
+    p_issued_to DATE DEFAULT NULL,
+    p_permit_status TEXT DEFAULT NULL,
+    p_min_lon DOUBLE PRECISION DEFAULT NULL,
+    p_min_lat DOUBLE PRECISION DEFAULT NULL,
+    p_max_lon DOUBLE PRECISION DEFAULT NULL,
+    p_max_lat DOUBLE PRECISION DEFAULT NULL,
+    p_include_removed BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE (
+    id BIGINT,
+    permit_number VARCHAR,
+    objectid INTEGER,
+    applicant_name VARCHAR,
+    company_name VARCHAR,
+    permit_type VARCHAR,
+    permit_status VARCHAR,
+    activity_description TEXT,
+    application_date DATE,
+    issue_date DATE,
+    expiration_date DATE,
+    last_modified_date TIMESTAMP WITH TIME ZONE,
+    county VARCHAR,
+    city VARCHAR,
+    address TEXT,
+    project_name VARCHAR,
+    project_type VARCHAR,
+    acreage DECIMAL,
+    latitude DECIMAL,
+    longitude DECIMAL,
+    data_source VARCHAR,
+    updated_at TIMESTAMP WITH TIME ZONE,
+    source_removed_at TIMESTAMP WITH TIME ZONE,
+    geometry TEXT
+) AS $$
+    SELECT
+        p.id,
+        p.permit_number,
+        p.objectid,
+        p.applicant_name,
+        p.company_name,
+        p.permit_type,
+        p.permit_status,
+        p.activity_description,
+        p.application_date,
+        p.issue_date,
+        p.expiration_date,
+        p.last_modified_date,
+        p.county,
+        p.city,
+        p.address,
+        p.project_name,
+        p.project_type,
+        p.acreage,
+        p.latitude,
+        p.longitude,
+        p.data_source,
+        p.updated_at,
+        p.source_removed_at,
+        CASE p_geometry_format
+            WHEN 'geojson' THEN ST_AsGeoJSON(p.geometry)
+            WHEN 'wkt' THEN ST_AsText(p.geometry)
+            WHEN 'wkb' THEN encode(ST_AsBinary(p.geometry), 'hex')
+        END
+    FROM erp_permits p
+    WHERE p.id > COALESCE(p_after_id, 0)
+      AND (p_max_id IS NULL OR p.id <= p_max_id)
+      AND (p_include_removed OR p.source_removed_at IS NULL)
+      AND (p_county IS NULL OR p.county = p_county)
+      AND (p_issued_from IS NULL OR p.issue_date >= p_issued_from)
+      AND (p_issued_to IS NULL OR p.issue_date <= p_issued_to)
+      AND (p_permit_status IS NULL OR p.permit_status = p_permit_status)
+      AND (
+          p_min_lon IS NULL
+          OR permit_bbox(p.min_lon, p.min_lat, p.max_lon, p.max_lat)
+               && box(point(p_min_lon, p_min_lat), point(p_max_lon, p_max_lat))
+      )
+    ORDER BY p.id
+    LIMIT LEAST(GREATEST(p_limit, 1), 5000);
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION export_permits_page IS 'One page of filtered permits with id > p_after_id (and <= p_max_id), ordered by id; pass the last id to get the next page';
+
+REVOKE ALL ON FUNCTION export_permits_page(BIGINT, BIGINT, INTEGER, TEXT, TEXT, DATE, DATE, TEXT, DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION, BOOLEAN) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION export_permits_page(BIGINT, BIGINT, INTEGER, TEXT, TEXT, DATE, DATE, TEXT, DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION, BOOLEAN) TO service_role;
+
+-- Reload schema cache
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,132 @@
+-- PermitIQ Database Schema - Migration 022
+-- Raw API payloads in a compressed, content-addressed side table
+-- Version: 1.0.0
+-- Created: 2026-10-19
+
+-- ============================================================================
+-- PROBLEM
+-- ============================================================================
+-- The ETL stores a full JSON copy of every feature's attributes in
+-- erp_permits.raw_data. That roughly doubles the row width of the table
+-- every dashboard, map and search query scans. Most of the copy duplicates
+-- the typed columns, and it is rewritten (with its TOAST chunks) on every
+-- upsert even when nothing changed.
+--
+-- ============================================================================
+-- SOLUTION
+-- ============================================================================
+-- Raw payloads move to erp_permit_raw, keyed by the MD5 of their content.
+-- erp_permits keeps only the 32-character raw_hash:
+-- - The ETL stores every attribute under its ArcGIS name with its raw value,
+--   and sends only payloads whose hash is not stored yet. An unchanged
+--   permit rewrites a hash, not a JSON document
+-- - Payloads are compressed (lz4 where available), also the small ones
+--   (toast_tuple_target = 128)
+-- - get_permit_raw_data() returns the stored payload for debugging
+-- - prune_permit_raw() drops payloads no permit references any more
+--
+-- Existing raw_data is moved over as-is; payloads the next ETL run replaces
+-- are pruned once unreferenced.
+
+-- ============================================================================
+-- TABLE: erp_permit_raw
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS erp_permit_raw (
+    content_hash TEXT PRIMARY KEY,
+    raw_data JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+) WITH (toast_tuple_target = 128);
+
+-- lz4 needs PostgreSQL 14+ built with lz4; pglz is used otherwise
+DO $$
+BEGIN
+    ALTER TABLE erp_permit_raw ALTER COLUMN raw_data SET COMPRESSION lz4;
+EXCEPTION WHEN OTHERS THEN
+    RAISE NOTICE 'lz4 compression unavailable (%), using the default', SQLERRM;
+END $$;
+
+COMMENT ON TABLE erp_permit_raw IS 'Raw API attributes of permits, deduplicated by content hash';
+COMMENT ON COLUMN erp_permit_raw.content_hash IS 'MD5 of the payload (canonical JSON, computed by the ETL)';
+
+ALTER TABLE erp_permit_raw ENABLE ROW LEVEL SECURITY;
+
+-- ============================================================================
+-- TABLE CHANGES: erp_permits
+-- ============================================================================
+
+ALTER TABLE erp_permits ADD COLUMN IF NOT EXISTS raw_hash TEXT;
+
+COMMENT ON COLUMN erp_permits.raw_hash IS 'erp_permit_raw.content_hash of the permit''s raw API payload';
+COMMENT ON COLUMN erp_permits.raw_data IS 'Deprecated: moved to erp_permit_raw by migration 022 (see raw_hash)';
+
+-- Move existing payloads (older loads stored them as a JSON string)
+INSERT INTO erp_permit_raw (content_hash, raw_data)
+SELECT DISTINCT ON (md5(raw_data::text))
+    md5(raw_data::text),
+    CASE WHEN jsonb_typeof(raw_data) = 'string' THEN (raw_data #>> '{}')::jsonb ELSE raw_data END
+FROM erp_permits
+WHERE raw_data IS NOT NULL
+ON CONFLICT (content_hash) DO NOTHING;
+
+-- Without touching updated_at
+ALTER TABLE erp_permits DISABLE TRIGGER update_erp_permits_updated_at;
+
+UPDATE erp_permits
+SET raw_hash = md5(raw_data::text),
+    raw_data = NULL
+WHERE raw_data IS NOT NULL;
+
+ALTER TABLE erp_permits ENABLE TRIGGER update_erp_permits_updated_at;
+
+-- Reference check when pruning
+CREATE INDEX IF NOT EXISTS idx_erp_permits_raw_hash ON erp_permits(raw_hash);
+
+-- ============================================================================
+-- FUNCTION: get_permit_raw_data
+-- Purpose: Raw API attributes of a permit (debugging)
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION get_permit_raw_data(p_permit_id BIGINT)
+RETURNS JSONB AS $$
+    SELECT r.raw_data
+    FROM erp_permits p
+    LEFT JOIN erp_permit_raw r ON r.content_hash = p.raw_hash
+    WHERE p.id = p_permit_id;
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION get_permit_raw_data IS 'Raw API attributes of a permit, keyed by ArcGIS field name';
+
+REVOKE ALL ON FUNCTION get_permit_raw_data(BIGINT) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION get_permit_raw_data(BIGINT) TO service_role;
+
+-- ============================================================================
+-- FUNCTION: prune_permit_raw
+-- Purpose: Delete payloads no permit references (called by ETL)
+-- ============================================================================
+-- The ETL writes payloads before the permits that reference them, so recent
+-- rows are kept until a concurrent load has finished.
+
+CREATE OR REPLACE FUNCTION prune_permit_raw(p_min_age INTERVAL DEFAULT '1 day')
+RETURNS INTEGER AS $$
+DECLARE
+    v_deleted INTEGER;
+BEGIN
+    DELETE FROM erp_permit_raw r
+    WHERE r.created_at < NOW() - p_min_age
+      AND NOT EXISTS (
+          SELECT 1 FROM erp_permits p WHERE p.raw_hash = r.content_hash
+      );
+
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+    RETURN v_deleted;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION prune_permit_raw IS 'Delete raw payloads older than p_min_age that no permit references; returns rows deleted';
+
+REVOKE ALL ON FUNCTION prune_permit_raw(INTERVAL) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION prune_permit_raw(INTERVAL) TO service_role;
+
+-- Reload schema cache
+NOTIFY pgrst, 'reload schema';
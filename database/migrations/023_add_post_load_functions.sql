@@ -0,0 +1,96 @@
+-- PermitIQ Database Schema - Migration 023
+-- Post-load county backfill and competitor matching for the ETL
+-- Version: 1.0.0
+-- Created: 2026-10-19
+
+-- ============================================================================
+-- PROBLEM
+-- ============================================================================
+-- After each load the ETL refreshes statistics and dashboard rollups. Two
+-- post-processing steps are still manual:
+-- - Competitor matching (scripts/test_competitor_watchlist.py calls
+--   match_competitor_permits() per competitor), so new permits of watched
+--   competitors are neither matched nor alerted on
+-- - County assignment for permits that missed the trigger from
+--   supabase/migrations/008_add_county_reverse_geocoding.sql, e.g. rows
+--   loaded before it existed. Those permits are missing from every per-county
+--   statistic and widget
+--
+-- ============================================================================
+-- SOLUTION
+-- ============================================================================
+-- Two service-role functions the ETL's post-load stage (etl/post_load.py)
+-- runs after every load:
+-- - backfill_permit_counties() assigns counties to located permits without one
+-- - match_watchlist_competitors() runs match_competitor_permits() for every
+--   watched competitor in one call
+-- Per-county statistics and rollups wait for the backfill; matching runs
+-- alongside them.
+
+-- ============================================================================
+-- FUNCTION: backfill_permit_counties
+-- Purpose: Reverse-geocode located permits without a county
+-- ============================================================================
+
+-- Keeps the lookup cheap once almost every permit has a county
+CREATE INDEX IF NOT EXISTS idx_erp_permits_county_missing
+    ON erp_permits(id)
+    WHERE county IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION backfill_permit_counties()
+RETURNS INTEGER AS $$
+DECLARE
+    v_updated INTEGER;
+BEGIN
+    UPDATE erp_permits p
+    SET county = c.county
+    FROM (
+        SELECT id, get_county_from_coords(latitude, longitude) AS county
+        FROM erp_permits
+        WHERE county IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL
+    ) c
+    WHERE p.id = c.id
+      AND c.county IS NOT NULL;
+
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+    RETURN v_updated;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION backfill_permit_counties IS 'Assign counties to located permits without one (called by ETL); returns permits updated';
+
+REVOKE ALL ON FUNCTION backfill_permit_counties() FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION backfill_permit_counties() TO service_role;
+
+-- ============================================================================
+-- FUNCTION: match_watchlist_competitors
+-- Purpose: Match new permits against every watched competitor
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION match_watchlist_competitors()
+RETURNS TABLE (
+    competitors_matched INTEGER,
+    matches_found INTEGER
+) AS $$
+DECLARE
+    v_competitor_id BIGINT;
+    v_competitors INTEGER := 0;
+    v_matches INTEGER := 0;
+BEGIN
+    FOR v_competitor_id IN SELECT id FROM competitor_watchlist ORDER BY id
+    LOOP
+        v_matches := v_matches + match_competitor_permits(v_competitor_id);
+        v_competitors := v_competitors + 1;
+    END LOOP;
+
+    RETURN QUERY SELECT v_competitors, v_matches;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION match_watchlist_competitors IS 'Run match_competitor_permits() for every watched competitor (called by ETL)';
+
+REVOKE ALL ON FUNCTION match_watchlist_competitors() FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION match_watchlist_competitors() TO service_role;
+
+-- Reload schema cache
+NOTIFY pgrst, 'reload schema';
@@ -8,187 +8,226 @@ Usage:
     python dev.py test         # Test ETL with dry run
     python dev.py load         # Load data into database
     python dev.py stats        # Recalculate statistics
-    python dev.py count        # Count records in database
+    python dev.py count        # Count records in database (estimated)
     python dev.py recent       # Show recent permits
+    python dev.py shell        # Interactive prompt; commands share one connection
+
+Batch mode runs several commands in one process over one connection:
+    python dev.py count recent stats
+
+Commands run in-process. Heavy dependencies (supabase, the ETL modules) are
+imported on first use and the Supabase client is created once and reused.
 """
 
 import sys
 import os
-import subprocess
+import time
+from functools import lru_cache
 from pathlib import Path
 
-# Add project root to path
+# Add project root and etl/ (flat ETL modules) to path
 PROJECT_ROOT = Path(__file__).parent
+ETL_DIR = PROJECT_ROOT / 'etl'
 sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(ETL_DIR))
+
+
+@lru_cache(maxsize=None)
+def load_env():
+    """Load .env once per process"""
+    from dotenv import load_dotenv
+    load_dotenv(PROJECT_ROOT / '.env')
+
+
+@lru_cache(maxsize=None)
+def get_client():
+    """
+    Shared Supabase client (created on first use)
+
+    The client keeps its HTTP connection pool open, so every command after
+    the first reuses the same connection.
+    """
+    load_env()
+    from supabase import create_client
+
+    return create_client(
+        os.getenv('PERMITIQ_SUPABASE_URL'),
+        os.getenv('PERMITIQ_SUPABASE_SERVICE_KEY')
+    )
 
 
-def run_command(cmd: str, description: str):
-    """Run a shell command with description"""
+def banner(description: str):
+    """Print a command banner"""
     print(f"\n{'='*80}")
     print(f"  {description}")
     print('='*80)
-    result = subprocess.run(cmd, shell=True, cwd=PROJECT_ROOT)
-    return result.returncode
 
 
 def discover():
     """Run API field discovery"""
-    return run_command(
-        "python etl/discover_fields.py",
-        "Discovering API field structure..."
-    )
+    banner("Discovering API field structure...")
+    load_env()
+    import discover_fields
+
+    discover_fields.main([])
+    return 0
 
 
 def test():
     """Test ETL with dry run"""
-    env = os.environ.copy()
-    env['PERMITIQ_DRY_RUN'] = 'true'
-    
-    print(f"\n{'='*80}")
-    print("  Testing ETL pipeline (DRY RUN - no database writes)")
-    print('='*80)
-    
-    result = subprocess.run(
-        ["python", "etl/fetch_permits.py"],
-        cwd=PROJECT_ROOT,
-        env=env
-    )
-    return result.returncode
+    banner("Testing ETL pipeline (DRY RUN - no database writes)")
+    load_env()
+    import fetch_permits
+
+    previous = os.environ.get('PERMITIQ_DRY_RUN')
+    os.environ['PERMITIQ_DRY_RUN'] = 'true'
+    try:
+        fetch_permits.main([])
+    finally:
+        if previous is None:
+            os.environ.pop('PERMITIQ_DRY_RUN', None)
+        else:
+            os.environ['PERMITIQ_DRY_RUN'] = previous
+    return 0
 
 
 def load():
     """Load data into database"""
-    print(f"\n{'='*80}")
-    print("  WARNING: This will load data into the database!")
-    print('='*80)
-    
+    banner("WARNING: This will load data into the database!")
+
     confirm = input("Continue? (yes/no): ")
     if confirm.lower() != 'yes':
         print("Cancelled.")
         return 1
-    
-    return run_command(
-        "python etl/fetch_permits.py",
-        "Loading data into database..."
-    )
 
+    banner("Loading data into database...")
+    load_env()
+    import fetch_permits
 
-def stats():
-    """Recalculate statistics"""
-    script = """
-from dotenv import load_dotenv
-import os
-from supabase import create_client
+    fetch_permits.main([])
+    return 0
 
-load_dotenv()
 
-supabase = create_client(
-    os.getenv('PERMITIQ_SUPABASE_URL'),
-    os.getenv('PERMITIQ_SUPABASE_SERVICE_KEY')
-)
+def stats():
+    """Recalculate statistics"""
+    banner("Recalculating statistics...")
+    supabase = get_client()
 
-print("Refreshing statistics for last 7 days...")
-supabase.rpc('refresh_statistics', {'days_back': 7}).execute()
-print("Statistics updated!")
-"""
-    
-    print(f"\n{'='*80}")
-    print("  Recalculating statistics...")
-    print('='*80)
-    
-    result = subprocess.run(
-        ["python", "-c", script],
-        cwd=PROJECT_ROOT
-    )
-    return result.returncode
+    print("Refreshing statistics for last 7 days...")
+    supabase.rpc('refresh_statistics', {'days_back': 7}).execute()
+    print("Statistics updated!")
+    return 0
 
 
 def count():
     """Count records in database"""
-    script = """
-from dotenv import load_dotenv
-import os
-from supabase import create_client
+    banner("Counting database records...")
+    supabase = get_client()
 
-load_dotenv()
+    print("\nRecord counts (estimated):")
+    print("-" * 40)
 
-supabase = create_client(
-    os.getenv('PERMITIQ_SUPABASE_URL'),
-    os.getenv('PERMITIQ_SUPABASE_SERVICE_KEY')
-)
+    # 'estimated' is exact for small tables and uses the planner's row
+    # estimate for large ones, so it never scans erp_permits/erp_permit_changes
+    for label, table in (
+        ('Permits', 'erp_permits'),
+        ('Changes', 'erp_permit_changes'),
+        ('Statistics', 'erp_statistics'),
+    ):
+        result = supabase.table(table).select('id', count='estimated', head=True).execute()
+        print(f"{label}: {result.count:,}")
 
-print("\\nRecord counts:")
-print("-" * 40)
+    print("-" * 40)
+    return 0
 
-# Permits
-result = supabase.table('erp_permits').select('*', count='exact').limit(1).execute()
-print(f"Permits: {result.count:,}")
 
-# Changes
-result = supabase.table('erp_permit_changes').select('*', count='exact').limit(1).execute()
-print(f"Changes: {result.count:,}")
+def recent():
+    """Show recent permits"""
+    banner("Fetching recent permits...")
+    supabase = get_client()
 
-# Statistics
-result = supabase.table('erp_statistics').select('*', count='exact').limit(1).execute()
-print(f"Statistics: {result.count:,}")
+    print("\nMost recent permits:")
+    print("-" * 80)
 
-print("-" * 40)
-"""
-    
-    print(f"\n{'='*80}")
-    print("  Counting database records...")
-    print('='*80)
-    
-    result = subprocess.run(
-        ["python", "-c", script],
-        cwd=PROJECT_ROOT
-    )
-    return result.returncode
+    result = supabase.table('erp_permits')\
+        .select('permit_number,applicant_name,county,issue_date')\
+        .order('issue_date', desc=True)\
+        .limit(10)\
+        .execute()
 
+    for permit in result.data:
+        print(
+            f"{permit['permit_number']:20} {permit.get('applicant_name') or '':40} "
+            f"{permit.get('county') or '':15} {permit.get('issue_date', 'N/A')}"
+        )
 
-def recent():
-    """Show recent permits"""
-    script = """
-from dotenv import load_dotenv
-import os
-from supabase import create_client
+    print("-" * 80)
+    return 0
 
-load_dotenv()
 
-supabase = create_client(
-    os.getenv('PERMITIQ_SUPABASE_URL'),
-    os.getenv('PERMITIQ_SUPABASE_SERVICE_KEY')
-)
+def help_text():
+    """Show help"""
+    print(__doc__)
+    return 0
 
-print("\\nMost recent permits:")
-print("-" * 80)
 
-result = supabase.table('erp_permits')\\
-    .select('permit_number,applicant_name,county,issue_date')\\
-    .order('issue_date', desc=True)\\
-    .limit(10)\\
-    .execute()
+COMMANDS = {
+    'discover': discover,
+    'test': test,
+    'load': load,
+    'stats': stats,
+    'count': count,
+    'recent': recent,
+    'help': help_text,
+}
 
-for permit in result.data:
-    print(f"{permit['permit_number']:20} {permit['applicant_name']:40} {permit['county']:15} {permit.get('issue_date', 'N/A')}")
 
-print("-" * 80)
-"""
-    
-    print(f"\n{'='*80}")
-    print("  Fetching recent permits...")
-    print('='*80)
-    
-    result = subprocess.run(
-        ["python", "-c", script],
-        cwd=PROJECT_ROOT
-    )
-    return result.returncode
+def run(command: str) -> int:
+    """
+    Run one command in-process
 
+    Args:
+        command: Command name
 
-def help_text():
-    """Show help"""
-    print(__doc__)
+    Returns:
+        Exit code (0 on success)
+    """
+    command = command.lower()
+    if command not in COMMANDS:
+        print(f"Unknown command: {command}")
+        help_text()
+        return 1
+
+    started = time.perf_counter()
+    try:
+        code = COMMANDS[command]() or 0
+    except SystemExit as e:
+        # ETL entry points exit on configuration errors
+        code = e.code if isinstance(e.code, int) else 1
+    except Exception as e:
+        print(f"{command} failed: {e}")
+        code = 1
+    print(f"({command} took {time.perf_counter() - started:.2f}s)")
+    return code
+
+
+def shell():
+    """Interactive prompt; all commands share one process and connection"""
+    print("PermitIQ dev shell - commands: " + ', '.join(sorted(COMMANDS)) + ", quit")
+    code = 0
+    while True:
+        try:
+            line = input("permitiq> ").strip()
+        except (EOFError, KeyboardInterrupt):
+            print()
+            break
+        if not line:
+            continue
+        if line in ('quit', 'exit'):
+            break
+        for command in line.split():
+            code = run(command)
+    return code
 
 
 def main():
@@ -196,25 +235,16 @@ def main():
     if len(sys.argv) < 2:
         help_text()
         return 1
-    
-    command = sys.argv[1].lower()
-    
-    commands = {
-        'discover': discover,
-        'test': test,
-        'load': load,
-        'stats': stats,
-        'count': count,
-        'recent': recent,
-        'help': help_text,
-    }
-    
-    if command not in commands:
-        print(f"Unknown command: {command}")
-        help_text()
-        return 1
-    
-    return commands[command]()
+
+    if sys.argv[1].lower() == 'shell':
+        return shell()
+
+    # Batch mode: run each command in order, stop at the first failure
+    for command in sys.argv[1:]:
+        code = run(command)
+        if code:
+            return code
+    return 0
 
 
 if __name__ == '__main__':
@@ -0,0 +1,444 @@
+"""
+PermitIQ - API Request Scheduler
+Availability-window aware, adaptively rate-limited request scheduling
+for the SWFWMD ArcGIS API
+
+- AvailabilityWindow: the API only serves 6 AM - 10 PM Eastern; requests
+  pause shortly before the cutoff and resume when the next window opens
+- TokenBucket: caps the request rate
+- AIMDController: tunes rate and concurrency from observed latency and
+  429/5xx responses (additive increase, multiplicative decrease)
+- APIScheduler: ties them together and runs page requests concurrently
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from zoneinfo import ZoneInfo
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Sentinel for an exhausted input iterator in APIScheduler.imap
+_END = object()
+
+
+class APIUnavailableError(Exception):
+    """Raised when the API window stays closed longer than the scheduler may wait"""
+
+
+class AvailabilityWindow:
+    """
+    Daily window in which the API accepts requests
+    """
+
+    def __init__(
+        self,
+        open_hour: int = 6,
+        close_hour: int = 22,
+        timezone: str = 'America/New_York',
+        cutoff_margin: timedelta = timedelta(minutes=10)
+    ):
+        """
+        Initialize the window
+
+        Args:
+            open_hour: Hour the API starts serving (local time)
+            close_hour: Hour the API stops serving (local time, 24 = midnight)
+            timezone: Timezone of the window
+            cutoff_margin: Stop issuing requests this long before close
+        """
+        self.open_hour = open_hour
+        self.close_hour = close_hour
+        self.tz = ZoneInfo(timezone)
+        self.cutoff_margin = cutoff_margin
+
+    def _bounds(self, now: datetime):
+        """Open and (margin-adjusted) close time for the day of `now`"""
+        day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        opens = day + timedelta(hours=self.open_hour)
+        closes = day + timedelta(hours=self.close_hour) - self.cutoff_margin
+        return opens, closes
+
+    def is_open(self, now: Optional[datetime] = None) -> bool:
+        """
+        Check whether requests may be issued now
+
+        Args:
+            now: Current time (defaults to now in the window's timezone)
+
+        Returns:
+            True if inside the window and before the cutoff margin
+        """
+        now = now or datetime.now(self.tz)
+        opens, closes = self._bounds(now)
+        return opens <= now < closes
+
+    def seconds_until_open(self, now: Optional[datetime] = None) -> float:
+        """
+        Time until the next window opens
+
+        Args:
+            now: Current time (defaults to now in the window's timezone)
+
+        Returns:
+            Seconds to wait (0 if open)
+        """
+        now = now or datetime.now(self.tz)
+        if self.is_open(now):
+            return 0.0
+
+        opens, _ = self._bounds(now)
+        if now >= opens:
+            opens, _ = self._bounds(now + timedelta(days=1))
+        return (opens - now).total_seconds()
+
+    @property
+    def closed_duration(self) -> timedelta:
+        """Longest pause the window imposes: the daily closure plus the cutoff margin"""
+        hours_open = self.close_hour - self.open_hour
+        if hours_open >= 24:
+            return timedelta(0)
+        return timedelta(hours=24 - hours_open) + self.cutoff_margin
+
+    def __str__(self) -> str:
+        return f"{self.open_hour:02d}:00 - {self.close_hour:02d}:00 {self.tz.key}"
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with an adjustable refill rate
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        """
+        Initialize the bucket
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum burst size
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate: float) -> None:
+        """Change the refill rate"""
+        with self._lock:
+            self._refill()
+            self.rate = rate
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> None:
+        """Block until a token is available, then take it"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AIMDController:
+    """
+    Additive-increase / multiplicative-decrease control of rate and concurrency
+    """
+
+    def __init__(
+        self,
+        min_rate: float = 0.2,
+        max_rate: float = 5.0,
+        max_concurrency: int = 4,
+        rate_step: float = 0.1,
+        decrease_factor: float = 0.5,
+        latency_threshold: float = 3.0
+    ):
+        """
+        Initialize the controller
+
+        Args:
+            min_rate: Lowest request rate (requests/second)
+            max_rate: Highest request rate (requests/second)
+            max_concurrency: Highest number of requests in flight
+            rate_step: Rate added per healthy response
+            decrease_factor: Multiplier applied on congestion
+            latency_threshold: Latency (x baseline) treated as congestion
+        """
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_concurrency = max_concurrency
+        self.rate_step = rate_step
+        self.decrease_factor = decrease_factor
+        self.latency_threshold = latency_threshold
+
+        self.rate = min(1.0, max_rate)
+        self.concurrency = 1.0
+        self.baseline_latency: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def on_success(self, latency: float) -> None:
+        """
+        Record a healthy response
+
+        Args:
+            latency: Request latency in seconds
+        """
+        with self._lock:
+            if self.baseline_latency is None:
+                self.baseline_latency = latency
+            else:
+                # Slow-moving baseline so one slow page doesn't reset it
+                self.baseline_latency = 0.9 * self.baseline_latency + 0.1 * min(
+                    latency, self.baseline_latency * self.latency_threshold
+                )
+
+            if latency > self.baseline_latency * self.latency_threshold:
+                self._decrease()
+                return
+
+            self.rate = min(self.max_rate, self.rate + self.rate_step)
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1.0 / self.concurrency)
+
+    def on_congestion(self) -> None:
+        """Record a 429 / 5xx / latency spike"""
+        with self._lock:
+            self._decrease()
+
+    def _decrease(self) -> None:
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        self.concurrency = max(1.0, self.concurrency * self.decrease_factor)
+
+    @property
+    def concurrency_limit(self) -> int:
+        """Whole number of requests allowed in flight"""
+        return max(1, int(self.concurrency))
+
+
+class APIScheduler:
+    """
+    Issues API requests inside the availability window at an adaptive rate
+    """
+
+    def __init__(
+        self,
+        window: Optional[AvailabilityWindow] = None,
+        controller: Optional[AIMDController] = None,
+        max_retries: int = 5,
+        max_window_wait: Optional[timedelta] = None
+    ):
+        """
+        Initialize the scheduler
+
+        Args:
+            window: API availability window
+            controller: AIMD rate/concurrency controller
+            max_retries: Retries per request on 429/5xx
+            max_window_wait: Longest the scheduler sleeps for the window to open
+                (default: PERMITIQ_API_MAX_WINDOW_WAIT_HOURS, else the window's
+                full closure, so a run resumes in the next window)
+        """
+        self.window = window or AvailabilityWindow()
+        self.controller = controller or AIMDController(
+            max_rate=float(os.getenv('PERMITIQ_API_MAX_RATE', '5')),
+            max_concurrency=int(os.getenv('PERMITIQ_API_MAX_CONCURRENCY', '4'))
+        )
+        self.bucket = TokenBucket(self.controller.rate)
+        self.max_retries = max_retries
+        # Runners with a job time limit (the 6-hour GitHub Actions limit is
+        # shorter than the overnight closure) set the env var below it, so the
+        # run fails with a clear error instead of being killed mid-sleep
+        max_wait_hours = os.getenv('PERMITIQ_API_MAX_WINDOW_WAIT_HOURS')
+        self.max_window_wait = max_window_wait or (
+            timedelta(hours=float(max_wait_hours)) if max_wait_hours else self.window.closed_duration
+        )
+
+        self._in_flight = 0
+        self._slots = threading.Condition()
+        self._outcomes = deque(maxlen=100)
+        self._stats_lock = threading.Lock()
+
+    def wait_for_window(self) -> None:
+        """
+        Sleep until the API window is open
+
+        Raises:
+            APIUnavailableError: If the wait would exceed max_window_wait
+        """
+        wait = self.window.seconds_until_open()
+        if wait <= 0:
+            return
+
+        if wait > self.max_window_wait.total_seconds():
+            raise APIUnavailableError(
+                f"API window opens in {wait / 3600:.1f} hours, longer than the "
+                f"{self.max_window_wait.total_seconds() / 3600:.1f} hour maximum wait "
+                f"(PERMITIQ_API_MAX_WINDOW_WAIT_HOURS); run the ETL during the API window"
+            )
+
+        logger.warning(f"API window closed ({self.window}); pausing {wait / 60:.0f} minutes")
+        time.sleep(wait)
+        logger.info("API window open again, resuming")
+
+    def _acquire_slot(self) -> None:
+        with self._slots:
+            while self._in_flight >= self.controller.concurrency_limit:
+                self._slots.wait()
+            self._in_flight += 1
+
+    def _release_slot(self) -> None:
+        with self._slots:
+            self._in_flight -= 1
+            self._slots.notify_all()
+
+    def _record(self, outcome: str) -> None:
+        with self._stats_lock:
+            self._outcomes.append(outcome)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Recent outcome rates and current limits
+
+        Returns:
+            Dictionary with 429/5xx rates, rate and concurrency
+        """
+        with self._stats_lock:
+            outcomes = list(self._outcomes)
+        total = len(outcomes) or 1
+        return {
+            'throttled_rate': outcomes.count('429') / total,
+            'server_error_rate': outcomes.count('5xx') / total,
+            'rate': self.controller.rate,
+            'concurrency': self.controller.concurrency_limit,
+        }
+
+    def request(self, send: Callable[[], requests.Response]) -> requests.Response:
+        """
+        Issue one request under the window, rate and concurrency limits
+
+        429 responses back off for Retry-After and halve the rate; 5xx
+        responses back off exponentially. Both are retried up to max_retries.
+
+        Args:
+            send: Callable that performs the HTTP request
+
+        Returns:
+            The final response (callers still call raise_for_status)
+        """
+        attempt = 0
+        while True:
+            self.wait_for_window()
+            self._acquire_slot()
+            try:
+                self.bucket.acquire()
+                started = time.monotonic()
+                response = send()
+                latency = time.monotonic() - started
+            finally:
+                self._release_slot()
+
+            if response.status_code == 429:
+                self._record('429')
+                self.controller.on_congestion()
+                delay = self._retry_after(response, default=2 ** attempt)
+                logger.warning(f"Rate limited by API (429); backing off {delay:.0f}s")
+            elif response.status_code >= 500:
+                self._record('5xx')
+                self.controller.on_congestion()
+                delay = 2 ** attempt
+                logger.warning(f"API server error ({response.status_code}); retrying in {delay:.0f}s")
+            else:
+                self._record('ok')
+                self.controller.on_success(latency)
+                self.bucket.set_rate(self.controller.rate)
+                return response
+
+            self.bucket.set_rate(self.controller.rate)
+            attempt += 1
+            if attempt > self.max_retries:
+                return response
+            # Release the connection of a streamed response before retrying
+            response.close()
+            time.sleep(delay)
+
+    @staticmethod
+    def _retry_after(response: requests.Response, default: float) -> float:
+        try:
+            return float(response.headers.get('Retry-After', default))
+        except ValueError:
+            return default
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any]) -> List[Any]:
+        """
+        Run fn over items concurrently; the scheduler limits what is in flight
+
+        Args:
+            fn: Function issuing its requests through request()
+            items: Inputs (e.g. page offsets)
+
+        Returns:
+            Results in input order
+        """
+        items = list(items)
+        results: List[Any] = [None] * len(items)
+
+        with ThreadPoolExecutor(max_workers=self.controller.max_concurrency) as executor:
+            futures = {executor.submit(fn, item): i for i, item in enumerate(items)}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+
+        self._log_stats()
+        return results
+
+    def imap(self, fn: Callable[[Any], Any], items: Iterable[Any]) -> Iterator[Any]:
+        """
+        Like map(), but yields results in input order as they become ready
+
+        At most two results per worker are held at once, so consumers that
+        process results as they arrive run in bounded memory.
+
+        Args:
+            fn: Function issuing its requests through request()
+            items: Inputs (e.g. page offsets)
+
+        Yields:
+            Results in input order
+        """
+        workers = self.controller.max_concurrency
+        pending: deque = deque()
+        items = iter(items)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for item in items:
+                pending.append(executor.submit(fn, item))
+                if len(pending) >= workers * 2:
+                    break
+
+            while pending:
+                result = pending.popleft().result()
+                next_item = next(items, _END)
+                if next_item is not _END:
+                    pending.append(executor.submit(fn, next_item))
+                yield result
+
+        self._log_stats()
+
+    def _log_stats(self) -> None:
+        stats = self.stats()
+        logger.info(
+            f"Scheduler: rate {stats['rate']:.2f} req/s, concurrency {stats['concurrency']}, "
+            f"429 rate {stats['throttled_rate']:.0%}, 5xx rate {stats['server_error_rate']:.0%}"
+        )
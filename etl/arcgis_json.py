@@ -0,0 +1,226 @@
+"""
+PermitIQ - Streaming ArcGIS JSON Decoder
+Decodes ArcGIS REST `f=json` query responses feature by feature as the body
+arrives, instead of buffering the whole body and building the full object
+tree first (response.json()).
+
+The envelope and each feature are decoded with json's C scanner
+(JSONDecoder.raw_decode) once their bytes have arrived; only the unparsed
+tail of the body is held as text, and features are yielded as soon as they
+are decoded.
+
+With orjson installed, features are decoded by orjson instead (about 1.6x
+faster on permit pages). orjson can't resume mid-buffer, so features are
+cut at the `,{"attributes":` that starts the next one. That sequence can't
+occur inside a JSON string (its quote would have to be escaped), and it is
+only relied on once the first feature of the response is followed by it,
+i.e. the server writes compact JSON with attributes first; a slice orjson
+rejects is decoded with the stdlib scanner. PERMITIQ_API_JSON_BACKEND
+(auto, orjson or stdlib) overrides the choice.
+"""
+
+import os
+import re
+import json
+import codecs
+import logging
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bytes per network read
+STREAM_CHUNK_SIZE = 256 * 1024
+
+# Separator between two features in compact ArcGIS JSON
+FEATURE_SEPARATOR = ',{"attributes":'
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_SCANNER = json.JSONDecoder()
+
+
+class ArcGISJSONError(ValueError):
+    """Malformed or truncated JSON response"""
+
+
+@lru_cache(maxsize=None)
+def fast_loads() -> Optional[Callable[[str], Any]]:
+    """
+    orjson.loads if installed and not disabled, else None (stdlib only)
+    """
+    backend = os.getenv('PERMITIQ_API_JSON_BACKEND', 'auto').lower()
+    if backend == 'stdlib':
+        return None
+    try:
+        import orjson
+    except ImportError:
+        if backend == 'orjson':
+            logger.warning("PERMITIQ_API_JSON_BACKEND=orjson but orjson is not installed; using stdlib")
+        return None
+    return orjson.loads
+
+
+def iter_features(chunks: Iterable[bytes]) -> Iterator[Dict[str, Any]]:
+    """
+    Decode the features of an ArcGIS JSON query response incrementally
+
+    Args:
+        chunks: Response body as byte chunks (e.g. response.iter_content())
+
+    Yields:
+        Features ({'attributes': {...}, 'geometry': {...}}) in response order
+
+    Raises:
+        ValueError: If the response is an ArcGIS error ("API Error: ...")
+        ArcGISJSONError: If the body is not a complete JSON object
+    """
+    stream = _TextStream(chunks)
+    stream.expect('{')
+    char = stream.next_char()
+    while char != '}':
+        if char != '"':
+            raise ArcGISJSONError(f"Expected a key, found {char or 'end of response'!r}")
+        stream.pos -= 1
+        key = stream.value()
+        stream.expect(':')
+
+        if key == 'features':
+            yield from _iter_array(stream)
+        else:
+            value = stream.value()
+            if key == 'error':
+                raise ValueError(f"API Error: {value}")
+
+        char = stream.next_char()
+        if char == ',':
+            char = stream.next_char()
+        elif char != '}':
+            raise ArcGISJSONError(f"Expected ',' or '}}', found {char or 'end of response'!r}")
+
+
+def _iter_array(stream: '_TextStream') -> Iterator[Dict[str, Any]]:
+    """Features of the `features` array; the stream is left after its ']'"""
+    stream.expect('[')
+    char = stream.next_char()
+    if char == ']':
+        return
+    stream.pos -= 1
+
+    loads = None
+    while True:
+        feature = loads and stream.value_before(FEATURE_SEPARATOR, loads)
+        if feature is None:
+            feature = stream.value()
+        yield feature
+
+        # Compact JSON: cut the following features at their separator
+        if loads is None and fast_loads() and stream.startswith(FEATURE_SEPARATOR):
+            loads = fast_loads()
+
+        char = stream.next_char()
+        if char == ']':
+            return
+        if char != ',':
+            raise ArcGISJSONError(f"Expected ',' or ']' in features, found {char or 'end of response'!r}")
+
+
+class _TextStream:
+    """
+    Decoded text of a byte stream, read as far as the parser needs
+
+    Only the unparsed tail is kept: text before `pos` is dropped when more
+    is read.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def read_more(self, min_chars: int = 1) -> bool:
+        """
+        Append at least min_chars of text (less at the end of the stream)
+
+        Returns:
+            False if the stream was already exhausted
+        """
+        if self.eof:
+            return False
+        parts = [self.text[self.pos:]]
+        added = 0
+        for chunk in self.chunks:
+            text = self.decoder.decode(chunk)
+            parts.append(text)
+            added += len(text)
+            if added >= min_chars:
+                break
+        else:
+            parts.append(self.decoder.decode(b'', final=True))
+            self.eof = True
+        self.text = ''.join(parts)
+        self.pos = 0
+        return True
+
+    def next_char(self) -> str:
+        """Consume and return the next non-whitespace character ('' at the end)"""
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                char = self.text[self.pos]
+                self.pos += 1
+                return char
+            if not self.read_more():
+                return ''
+
+    def expect(self, expected: str) -> None:
+        char = self.next_char()
+        if char != expected:
+            raise ArcGISJSONError(f"Expected {expected!r}, found {char or 'end of response'!r}")
+
+    def value(self) -> Any:
+        """Decode the next JSON value, reading until it is complete"""
+        self.pos = _WHITESPACE.match(self.text, self.pos).end()
+        while True:
+            try:
+                value, end = _SCANNER.raw_decode(self.text, self.pos)
+                # A number at the end of the text may continue in the next chunk
+                if end < len(self.text) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise ArcGISJSONError(f"Truncated or malformed response: {e}") from e
+            # Grow the pending text geometrically so a large feature is
+            # rescanned O(log n) times, not once per chunk
+            self.read_more(max(len(self.text) - self.pos, STREAM_CHUNK_SIZE))
+
+    def startswith(self, prefix: str) -> bool:
+        """Whether the unparsed text starts with prefix (no whitespace skipped)"""
+        while len(self.text) - self.pos < len(prefix) and self.read_more():
+            pass
+        return self.text.startswith(prefix, self.pos)
+
+    def value_before(self, separator: str, loads: Callable[[str], Any]) -> Optional[Any]:
+        """
+        Decode the text up to the next separator with loads
+
+        Returns:
+            The value (the stream is left at the separator), or None if no
+            separator follows (last value) or loads rejects the text
+        """
+        search_from = self.pos
+        while True:
+            end = self.text.find(separator, search_from)
+            if end >= 0:
+                try:
+                    value = loads(self.text[self.pos:end])
+                except ValueError:
+                    return None
+                self.pos = end
+                return value
+            # read_more() rebases the text at pos
+            search_from = max(len(self.text) - len(separator) + 1 - self.pos, 0)
+            if not self.read_more(max(len(self.text) - self.pos, STREAM_CHUNK_SIZE)):
+                return None
@@ -0,0 +1,359 @@
+"""
+PermitIQ - ArcGIS PBF Decoder
+Decodes ArcGIS REST `f=pbf` query responses (esriPBuffer.FeatureCollectionPBuffer)
+into the same feature dictionaries the JSON format returns:
+
+    {'attributes': {...}, 'geometry': {'rings': [[[x, y], ...], ...]}}
+
+Only the protobuf wire format is needed, so there is no dependency on
+generated protobuf classes. Coordinates arrive quantized (integers, delta
+and zigzag encoded per feature) and are restored with the response's
+transform (scale/translate).
+"""
+
+import struct
+from itertools import accumulate
+from typing import Any, Dict, List, Optional, Tuple
+
+# Wire types
+_VARINT = 0
+_FIXED64 = 1
+_LENGTH_DELIMITED = 2
+_FIXED32 = 5
+
+# FeatureCollectionPBuffer.GeometryType
+GEOMETRY_POINT = 0
+GEOMETRY_MULTIPOINT = 1
+GEOMETRY_POLYLINE = 2
+GEOMETRY_POLYGON = 3
+
+# FeatureCollectionPBuffer.QuantizeOriginPostion
+ORIGIN_UPPER_LEFT = 0
+
+_unpack_float = struct.Struct('<f').unpack_from
+_unpack_double = struct.Struct('<d').unpack_from
+
+
+class PBFDecodeError(ValueError):
+    """Raised when a response is not a decodable feature collection"""
+
+
+def _read_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    """
+    Read one base-128 varint
+
+    Args:
+        buf: Message bytes
+        pos: Offset of the varint
+
+    Returns:
+        (value, offset after the varint)
+    """
+    result = 0
+    shift = 0
+    while True:
+        try:
+            b = buf[pos]
+        except IndexError:
+            raise PBFDecodeError("Truncated varint")
+        pos += 1
+        result |= (b & 0x7f) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _iter_fields(buf: bytes, pos: int, end: int):
+    """
+    Iterate over the fields of a message
+
+    Yields:
+        (field_number, wire_type, value) where value is an int for varints,
+        a (start, end) tuple for length-delimited fields and the field offset
+        for fixed-width fields
+    """
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        field_number = key >> 3
+        wire_type = key & 0x7
+
+        if wire_type == _VARINT:
+            value, pos = _read_varint(buf, pos)
+            yield field_number, wire_type, value
+        elif wire_type == _LENGTH_DELIMITED:
+            length, pos = _read_varint(buf, pos)
+            if pos + length > end:
+                raise PBFDecodeError("Truncated length-delimited field")
+            yield field_number, wire_type, (pos, pos + length)
+            pos += length
+        elif wire_type == _FIXED64:
+            yield field_number, wire_type, pos
+            pos += 8
+        elif wire_type == _FIXED32:
+            yield field_number, wire_type, pos
+            pos += 4
+        else:
+            raise PBFDecodeError(f"Unsupported wire type {wire_type}")
+
+
+def _packed_varints(buf: bytes, pos: int, end: int) -> List[int]:
+    """
+    Decode a packed repeated varint field
+
+    Inlined single-byte fast path: quantized coordinate deltas are mostly
+    one or two bytes.
+    """
+    out = []
+    append = out.append
+    while pos < end:
+        b = buf[pos]
+        pos += 1
+        if b < 0x80:
+            append(b)
+            continue
+        result = b & 0x7f
+        shift = 7
+        while True:
+            b = buf[pos]
+            pos += 1
+            result |= (b & 0x7f) << shift
+            if b < 0x80:
+                break
+            shift += 7
+        append(result)
+    return out
+
+
+def _zigzag(n: int) -> int:
+    return (n >> 1) ^ -(n & 1)
+
+
+def _signed64(n: int) -> int:
+    return n - (1 << 64) if n >= (1 << 63) else n
+
+
+def _decode_value(buf: bytes, start: int, end: int) -> Any:
+    """Decode a FeatureCollectionPBuffer.Value (oneof)"""
+    for field_number, wire_type, value in _iter_fields(buf, start, end):
+        if field_number == 1:
+            return buf[value[0]:value[1]].decode('utf-8')
+        if field_number == 2:
+            return _unpack_float(buf, value)[0]
+        if field_number == 3:
+            return _unpack_double(buf, value)[0]
+        if field_number in (4, 8):
+            return _zigzag(value)
+        if field_number in (5, 7):
+            return value
+        if field_number == 6:
+            return _signed64(value)
+        if field_number == 9:
+            return bool(value)
+    return None
+
+
+def _decode_doubles(buf: bytes, start: int, end: int) -> Dict[int, float]:
+    """Decode a message made only of double fields (Scale, Translate)"""
+    return {
+        field_number: _unpack_double(buf, value)[0]
+        for field_number, wire_type, value in _iter_fields(buf, start, end)
+        if wire_type == _FIXED64
+    }
+
+
+def _decode_transform(buf: bytes, start: int, end: int) -> Dict[str, Any]:
+    """Decode a Transform into origin, scale and translate"""
+    transform = {
+        'origin': ORIGIN_UPPER_LEFT,
+        'scale': {},
+        'translate': {},
+    }
+    for field_number, wire_type, value in _iter_fields(buf, start, end):
+        if field_number == 1:
+            transform['origin'] = value
+        elif field_number == 2:
+            transform['scale'] = _decode_doubles(buf, *value)
+        elif field_number == 3:
+            transform['translate'] = _decode_doubles(buf, *value)
+    return transform
+
+
+def _decode_field(buf: bytes, start: int, end: int) -> str:
+    """Decode a Field, returning its name"""
+    for field_number, wire_type, value in _iter_fields(buf, start, end):
+        if field_number == 1:
+            return buf[value[0]:value[1]].decode('utf-8')
+    return ''
+
+
+def _decode_geometry(
+    buf: bytes,
+    start: int,
+    end: int,
+    geometry_type: int,
+    stride: int,
+    transform: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """
+    Decode a Geometry into ArcGIS JSON geometry
+
+    Args:
+        buf: Message bytes
+        start: Geometry message start
+        end: Geometry message end
+        geometry_type: FeatureResult geometry type
+        stride: Values per vertex (2 + hasZ + hasM)
+        transform: Quantization transform (None if coordinates are not quantized)
+
+    Returns:
+        Geometry dictionary or None if empty
+    """
+    lengths: List[int] = []
+    coords: List[int] = []
+    for field_number, wire_type, value in _iter_fields(buf, start, end):
+        if field_number == 2:
+            if wire_type == _LENGTH_DELIMITED:
+                lengths.extend(_packed_varints(buf, *value))
+            else:
+                lengths.append(value)
+        elif field_number == 3:
+            if wire_type == _LENGTH_DELIMITED:
+                coords.extend(_packed_varints(buf, *value))
+            else:
+                coords.append(value)
+
+    if not coords:
+        return None
+
+    if transform:
+        x_scale = transform['scale'].get(1, 1.0)
+        y_scale = transform['scale'].get(2, 1.0)
+        x_translate = transform['translate'].get(1, 0.0)
+        y_translate = transform['translate'].get(2, 0.0)
+        # upperLeft origin: y grows downward from the translate point
+        if transform['origin'] == ORIGIN_UPPER_LEFT:
+            y_scale = -y_scale
+    else:
+        x_scale, y_scale, x_translate, y_translate = 1.0, 1.0, 0.0, 0.0
+
+    # Deltas accumulate across all parts of a feature
+    xs = accumulate([(n >> 1) ^ -(n & 1) for n in coords[0::stride]])
+    ys = accumulate([(n >> 1) ^ -(n & 1) for n in coords[1::stride]])
+    points = [[x_translate + x * x_scale, y_translate + y * y_scale] for x, y in zip(xs, ys)]
+
+    if geometry_type == GEOMETRY_POINT:
+        return {'x': points[0][0], 'y': points[0][1]}
+    if geometry_type == GEOMETRY_MULTIPOINT:
+        return {'points': points}
+
+    parts = []
+    offset = 0
+    for length in lengths or [len(points)]:
+        parts.append(points[offset:offset + length])
+        offset += length
+
+    if geometry_type == GEOMETRY_POLYLINE:
+        return {'paths': parts}
+    return {'rings': parts}
+
+
+def _decode_feature(
+    buf: bytes,
+    start: int,
+    end: int,
+    field_names: List[str],
+    geometry_type: int,
+    stride: int,
+    transform: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Decode a Feature into {'attributes': ..., 'geometry': ...}"""
+    values = []
+    geometry = None
+    for field_number, wire_type, value in _iter_fields(buf, start, end):
+        if field_number == 1:
+            values.append(_decode_value(buf, *value))
+        elif field_number == 2:
+            geometry = _decode_geometry(buf, value[0], value[1], geometry_type, stride, transform)
+
+    feature: Dict[str, Any] = {'attributes': dict(zip(field_names, values))}
+    if geometry is not None:
+        feature['geometry'] = geometry
+    return feature
+
+
+def _decode_feature_result(buf: bytes, start: int, end: int) -> Dict[str, Any]:
+    """Decode a FeatureResult into an ArcGIS JSON-style query result"""
+    field_names: List[str] = []
+    feature_spans: List[Tuple[int, int]] = []
+    geometry_type = GEOMETRY_POLYGON
+    transform = None
+    has_z = has_m = False
+    exceeded = False
+
+    # Fields and transform may appear after features; collect spans first
+    for field_number, wire_type, value in _iter_fields(buf, start, end):
+        if field_number == 7:
+            geometry_type = value
+        elif field_number == 9:
+            exceeded = bool(value)
+        elif field_number == 10:
+            has_z = bool(value)
+        elif field_number == 11:
+            has_m = bool(value)
+        elif field_number == 12:
+            transform = _decode_transform(buf, *value)
+        elif field_number == 13:
+            field_names.append(_decode_field(buf, *value))
+        elif field_number == 15:
+            feature_spans.append(value)
+
+    stride = 2 + has_z + has_m
+    features = [
+        _decode_feature(buf, s, e, field_names, geometry_type, stride, transform)
+        for s, e in feature_spans
+    ]
+
+    return {
+        'features': features,
+        'exceededTransferLimit': exceeded,
+    }
+
+
+def decode_feature_collection(buf: bytes) -> Dict[str, Any]:
+    """
+    Decode an `f=pbf` query response
+
+    Args:
+        buf: Raw response body
+
+    Returns:
+        Dictionary shaped like the JSON response ('features', and 'count' or
+        'objectIds' for count / ID queries)
+
+    Raises:
+        PBFDecodeError: If the body is not a FeatureCollectionPBuffer
+    """
+    query_result = None
+    for field_number, wire_type, value in _iter_fields(buf, 0, len(buf)):
+        if field_number == 2 and wire_type == _LENGTH_DELIMITED:
+            query_result = value
+
+    if query_result is None:
+        raise PBFDecodeError("Response has no queryResult")
+
+    for field_number, wire_type, value in _iter_fields(buf, *query_result):
+        if field_number == 1:
+            return _decode_feature_result(buf, *value)
+        if field_number == 2:
+            for count_field, _, count in _iter_fields(buf, *value):
+                if count_field == 1:
+                    return {'count': count}
+            return {'count': 0}
+        if field_number == 3:
+            object_ids: List[int] = []
+            for ids_field, ids_wire_type, ids_value in _iter_fields(buf, *value):
+                if ids_field == 3 and ids_wire_type == _LENGTH_DELIMITED:
+                    object_ids.extend(_packed_varints(buf, *ids_value))
+            return {'objectIds': object_ids}
+
+    raise PBFDecodeError("Unrecognized queryResult")
@@ -0,0 +1,98 @@
+"""
+PermitIQ - Dashboard RPC Result Cache
+Invalidates and pre-warms the run-versioned dashboard cache after each ETL run
+
+The cache lives in Postgres (database/migrations/011_add_dashboard_rpc_cache.sql)
+and is keyed by (function, arguments, latest successful etl_run_id), so the
+web app picks up fresh results as soon as the ETL records a successful run.
+"""
+
+import logging
+from typing import Any, Dict, List, Tuple
+
+from supabase import Client
+
+logger = logging.getLogger(__name__)
+
+
+# Dashboard RPCs and the argument sets the web app calls them with
+# (must also be registered in dashboard_rpc_cache_functions, with their
+# argument names in arg_names)
+DASHBOARD_CACHE_PREWARM: List[Tuple[str, Dict[str, Any]]] = [
+    ('get_dashboard_county_stats', {}),
+    ('get_dashboard_permit_type_stats', {}),
+    ('get_permit_status_breakdown', {}),
+    ('get_dashboard_permits_over_time', {}),
+    ('get_year_over_year_comparison', {}),
+    ('get_acreage_leaderboard', {}),
+    ('get_expiring_permits_summary', {}),
+]
+
+
+class DashboardCache:
+    """
+    Thin wrapper around the dashboard cache RPCs
+    """
+
+    def __init__(self, supabase: Client):
+        """
+        Initialize the cache wrapper
+
+        Args:
+            supabase: Supabase client (service role)
+        """
+        self.supabase = supabase
+
+    def get(self, function_name: str, args: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """
+        Fetch a dashboard RPC result through the cache
+
+        Args:
+            function_name: Dashboard RPC name
+            args: Named arguments for the RPC
+
+        Returns:
+            RPC result rows
+        """
+        response = self.supabase.rpc('get_cached_dashboard_rpc', {
+            'p_function_name': function_name,
+            'p_args': args or {}
+        }).execute()
+        return response.data or []
+
+    def invalidate(self) -> int:
+        """
+        Remove entries cached against previous ETL runs
+
+        Returns:
+            Number of entries removed
+        """
+        response = self.supabase.rpc('invalidate_dashboard_rpc_cache').execute()
+        removed = response.data or 0
+        logger.info(f"Dashboard cache invalidated ({removed} stale entries removed)")
+        return removed
+
+    def prewarm(
+        self,
+        entries: List[Tuple[str, Dict[str, Any]]] = DASHBOARD_CACHE_PREWARM
+    ) -> int:
+        """
+        Compute and cache the common dashboard argument sets
+
+        Args:
+            entries: (function name, arguments) pairs to warm
+
+        Returns:
+            Number of entries warmed
+        """
+        warmed = 0
+
+        for function_name, args in entries:
+            try:
+                self.get(function_name, args)
+                warmed += 1
+            except Exception as e:
+                logger.warning(f"Could not pre-warm {function_name}({args}): {e}")
+
+        logger.info(f"Dashboard cache pre-warmed ({warmed}/{len(entries)} entries)")
+        return warmed
@@ -0,0 +1,198 @@
+"""
+PermitIQ - Static Dashboard Payload Publisher
+Evaluates all dashboard aggregates once per ETL run and writes them as
+versioned, gzip-compressed JSON into the web app's public assets
+
+Layout (under web/public/data/dashboard by default):
+    manifest.json                       # points at the current version
+    <etl_run_id>/<payload>.json.gz      # one file per dashboard aggregate
+
+The web app reads the manifest and payloads from the CDN and only falls back
+to live Supabase RPCs when a payload is missing.
+"""
+
+import os
+import json
+import gzip
+import shutil
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from supabase import Client
+
+from dashboard_cache import DashboardCache, DASHBOARD_CACHE_PREWARM
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DEFAULT_PUBLISH_DIR = PROJECT_ROOT / 'web' / 'public' / 'data' / 'dashboard'
+
+# Daily issue counts are published for this many days so the web app can
+# compute "last 30 days" against the current date between ETL runs
+RECENT_ISSUE_DAYS = 60
+
+
+class DashboardPublisher:
+    """
+    Writes precomputed dashboard payloads for the CDN
+    """
+
+    def __init__(self, supabase: Client, output_dir: Path = None):
+        """
+        Initialize the publisher
+
+        Args:
+            supabase: Supabase client (service role)
+            output_dir: Directory served as /data/dashboard by the web app
+        """
+        self.supabase = supabase
+        self.cache = DashboardCache(supabase)
+        self.output_dir = Path(
+            output_dir or os.getenv('PERMITIQ_DASHBOARD_PUBLISH_DIR') or DEFAULT_PUBLISH_DIR
+        )
+
+    def collect_payloads(self) -> Dict[str, Any]:
+        """
+        Evaluate every dashboard aggregate once
+
+        Returns:
+            Payload name -> JSON-serializable data
+        """
+        payloads: Dict[str, Any] = {}
+
+        # RPC-backed widgets (served from the freshly warmed cache)
+        for function_name, args in DASHBOARD_CACHE_PREWARM:
+            if args:
+                continue
+            payloads[function_name] = self.cache.get(function_name)
+
+        # Materialized views read directly by the dashboard
+        payloads['dashboard_monthly_trends'] = self.supabase.table('dashboard_monthly_trends')\
+            .select('month, permit_count')\
+            .order('month')\
+            .execute().data
+
+        payloads['dashboard_applicant_stats'] = self.supabase.table('dashboard_applicant_stats')\
+            .select('applicant_name, permit_count')\
+            .limit(10)\
+            .execute().data
+
+        payloads['recent_issue_counts'] = self._recent_issue_counts()
+
+        return payloads
+
+    def _recent_issue_counts(self) -> List[Dict[str, Any]]:
+        """
+        Count permits per issue date for the last RECENT_ISSUE_DAYS days
+
+        Returns:
+            List of {'issue_date', 'permit_count'} rows, oldest first
+        """
+        since = (datetime.now() - timedelta(days=RECENT_ISSUE_DAYS)).date().isoformat()
+        counts: Dict[str, int] = {}
+        page_size = 1000
+        last_id = 0
+
+        # Keyset pagination on id (PostgREST caps each response at 1,000 rows)
+        while True:
+            rows = self.supabase.table('erp_permits')\
+                .select('id,issue_date')\
+                .gte('issue_date', since)\
+                .is_('source_removed_at', 'null')\
+                .gt('id', last_id)\
+                .order('id')\
+                .limit(page_size)\
+                .execute().data
+
+            for row in rows:
+                day = (row.get('issue_date') or '')[:10]
+                if day:
+                    counts[day] = counts.get(day, 0) + 1
+
+            if len(rows) < page_size:
+                break
+            last_id = rows[-1]['id']
+
+        return [
+            {'issue_date': day, 'permit_count': count}
+            for day, count in sorted(counts.items())
+        ]
+
+    def publish(self, version: str) -> Path:
+        """
+        Write all payloads for a version and point the manifest at it
+
+        Args:
+            version: Payload version (the ETL run ID)
+
+        Returns:
+            Path to the written manifest
+        """
+        payloads = self.collect_payloads()
+        manifest_path = self.output_dir / 'manifest.json'
+        previous_version = self._current_version(manifest_path)
+
+        version_dir = self.output_dir / version
+        version_dir.mkdir(parents=True, exist_ok=True)
+
+        files = {}
+        total_bytes = 0
+        for name, data in payloads.items():
+            body = json.dumps(data, separators=(',', ':'), default=str).encode('utf-8')
+            path = version_dir / f"{name}.json.gz"
+            # mtime=0 keeps output byte-identical for identical data
+            with open(path, 'wb') as f:
+                f.write(gzip.compress(body, compresslevel=9, mtime=0))
+            files[name] = f"{version}/{path.name}"
+            total_bytes += path.stat().st_size
+
+        manifest = {
+            'version': version,
+            'generated_at': datetime.now().isoformat(),
+            'payloads': files
+        }
+
+        # Write-then-rename so readers never see a half-written manifest
+        tmp_path = manifest_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+        self._prune_old_versions(keep={version, previous_version})
+
+        logger.info(
+            f"Published {len(files)} dashboard payloads ({total_bytes:,} bytes compressed) "
+            f"to {self.output_dir}"
+        )
+        return manifest_path
+
+    def _current_version(self, manifest_path: Path) -> Optional[str]:
+        """
+        Read the version the existing manifest points at
+
+        Args:
+            manifest_path: Path to manifest.json
+
+        Returns:
+            Published version or None
+        """
+        try:
+            with open(manifest_path) as f:
+                return json.load(f).get('version')
+        except (OSError, ValueError):
+            return None
+
+    def _prune_old_versions(self, keep: Set[Optional[str]]) -> None:
+        """
+        Remove version directories other than the current and previous one
+        (kept so pages rendered from the old manifest still resolve)
+
+        Args:
+            keep: Versions that must not be removed
+        """
+        for path in self.output_dir.iterdir():
+            if path.is_dir() and path.name not in keep:
+                shutil.rmtree(path)
+                logger.debug(f"Removed old dashboard payload version: {path.name}")
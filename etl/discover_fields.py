@@ -1,9 +1,21 @@
 """
 PermitIQ - API Field Discovery Utility
-Fetches a sample of permits and documents actual field structure
+Profiles every permit of a district layer and documents its field structure
 
 This script helps understand the actual API response format since
-field names may differ from documentation.
+field names may differ from documentation. Rare fields and types (e.g. the
+acreage field that is null in most records, see ACREAGE_FIELD_FIX.md) only
+show up when the whole layer is profiled, so every page is read with the
+ETL client's pagination and summarized in bounded sketches (see
+field_sketches.py): memory stays flat however large the district is.
+
+Each run is compared with the previous report and schema drift (added or
+removed fields, type changes, null-rate and cardinality shifts) is flagged.
+
+Usage:
+    python etl/discover_fields.py                     # SWFWMD, attributes only
+    python etl/discover_fields.py --source SFWMD      # Another district
+    python etl/discover_fields.py --geometry          # Also profile polygons
 
 Author: Kevin Mazur
 Created: 2025-10-22
@@ -11,14 +23,16 @@ Created: 2025-10-22
 
 import os
 import json
+import argparse
 import logging
 from datetime import datetime
-from typing import Dict, Any, Set
-from collections import Counter
+from typing import Dict, Any, List, Optional
 
-import requests
 from dotenv import load_dotenv
 
+from field_sketches import FieldProfile, GeometryProfile
+from sources import PermitSource, all_sources
+
 # Load environment variables
 load_dotenv()
 
@@ -29,229 +43,277 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+REPORT_DIR = os.path.join(os.path.dirname(__file__), '..', 'docs', 'planning')
+
+# Drift thresholds against the previous report
+DRIFT_NULL_RATE_CHANGE = 0.10
+DRIFT_DISTINCT_RATIO = 2.0
 
-def fetch_sample_permits(api_url: str, sample_size: int = 10) -> list:
+
+class DatasetProfiler:
     """
-    Fetch a small sample of permits to analyze field structure
-    
-    Args:
-        api_url: SWFWMD API endpoint
-        sample_size: Number of records to fetch
-    
-    Returns:
-        List of sample permit records
+    One-pass profile of all features of a layer
     """
-    params = {
-        'where': '1=1',
-        'outFields': '*',
-        'returnGeometry': 'true',
-        'outSR': '4326',
-        'f': 'json',
-        'resultRecordCount': sample_size
-    }
-    
-    url = f"{api_url}/query"
-    
-    try:
-        logger.info(f"Fetching {sample_size} sample records from API...")
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        if 'error' in data:
-            raise ValueError(f"API Error: {data['error']}")
-        
-        features = data.get('features', [])
-        logger.info(f"Successfully fetched {len(features)} records")
-        
-        return features
-        
-    except Exception as e:
-        logger.error(f"Failed to fetch sample permits: {e}")
-        raise
 
+    def __init__(self, layer_fields: Dict[str, str], include_geometry: bool = False):
+        """
+        Initialize the profiler
+
+        Args:
+            layer_fields: Field name -> ArcGIS field type from the layer metadata
+            include_geometry: Profile feature geometry too
+        """
+        self.layer_fields = layer_fields
+        self.records = 0
+        self.fields: Dict[str, FieldProfile] = {}
+        self.geometry = GeometryProfile() if include_geometry else None
 
-def analyze_field_structure(features: list) -> Dict[str, Any]:
+    def add_feature(self, feature: Dict[str, Any]) -> None:
+        """Add one feature"""
+        self.records += 1
+        for field_name, field_value in feature.get('attributes', {}).items():
+            profile = self.fields.get(field_name)
+            if profile is None:
+                profile = self.fields[field_name] = FieldProfile(field_name, self.layer_fields.get(field_name))
+            profile.add(field_value)
+
+        if self.geometry is not None:
+            self.geometry.add(feature.get('geometry'))
+
+
+def profile_source(source: PermitSource, include_geometry: bool = False) -> Dict[str, Any]:
     """
-    Analyze the field structure of sample permits
-    
+    Profile every record of a district layer
+
     Args:
-        features: List of permit features from API
-    
+        source: District source
+        include_geometry: Download and profile polygons (much larger transfer)
+
     Returns:
-        Dictionary with field analysis
+        Report dictionary
     """
-    all_fields: Set[str] = set()
-    field_types: Dict[str, Counter] = {}
-    field_samples: Dict[str, list] = {}
-    
-    for feature in features:
-        attributes = feature.get('attributes', {})
-        
-        for field_name, field_value in attributes.items():
-            all_fields.add(field_name)
-            
-            # Track data types
-            if field_name not in field_types:
-                field_types[field_name] = Counter()
-            field_types[field_name][type(field_value).__name__] += 1
-            
-            # Collect sample values (first 3 non-null)
-            if field_name not in field_samples:
-                field_samples[field_name] = []
-            if field_value is not None and len(field_samples[field_name]) < 3:
-                field_samples[field_name].append(field_value)
-    
+    # Imported here: fetch_permits configures the ETL log on import
+    from fetch_permits import SWFWMDAPIClient
+
+    client = SWFWMDAPIClient(source.url, scheduler=source.create_scheduler())
+
+    layer = client.get_layer_info()
+    layer_fields = {field['name']: field.get('type') for field in layer.get('fields', [])}
+    logger.info(f"Layer '{layer.get('name', source.code)}' declares {len(layer_fields)} fields")
+
+    profiler = DatasetProfiler(layer_fields, include_geometry=include_geometry)
+    for page in client.iter_permit_pages(return_geometry=include_geometry):
+        for feature in page:
+            profiler.add_feature(feature)
+
+    mapped = {field: column for column, field in (source.field_map or {}).items()}
+    fields = {}
+    for field_name in sorted(set(profiler.fields) | set(layer_fields)):
+        profile = profiler.fields.get(field_name) or FieldProfile(field_name, layer_fields.get(field_name))
+        entry = profile.to_dict(profiler.records)
+        entry['declared'] = field_name in layer_fields
+        entry['mapped_to'] = mapped.get(field_name)
+        fields[field_name] = entry
+
+    geometry = profiler.geometry.to_dict() if profiler.geometry else None
     return {
-        'total_fields': len(all_fields),
-        'field_names': sorted(all_fields),
-        'field_types': field_types,
-        'field_samples': field_samples
+        'discovery_date': datetime.now().isoformat(),
+        'source': source.code,
+        'layer_url': source.url,
+        'summary': {
+            'total_fields': len(fields),
+            'records_analyzed': profiler.records,
+            'records_with_geometry': geometry['has_geometry'] if geometry else None,
+            'records_without_geometry': geometry['missing_geometry'] if geometry else None,
+            'bytes_received': client.bytes_received
+        },
+        'fields': fields,
+        'geometry': geometry
     }
 
 
-def analyze_geometry(features: list) -> Dict[str, Any]:
+def detect_drift(previous: Dict[str, Any], report: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Analyze geometry structure
-    
+    Compare a report with the previous one
+
+    Works with reports from the older sampling version of this script too;
+    checks whose statistics the previous report lacks are skipped.
+
     Args:
-        features: List of permit features from API
-    
+        previous: Previous report
+        report: New report
+
     Returns:
-        Dictionary with geometry analysis
+        Drift summary ('has_drift' plus per-check lists)
     """
-    geometry_info = {
-        'has_geometry': 0,
-        'missing_geometry': 0,
-        'geometry_type': None,
-        'sample_polygons': [],
-        'sample_centroids': []
+    previous_fields = previous.get('fields', {})
+    current_fields = report['fields']
+
+    drift = {
+        'previous_date': previous.get('discovery_date'),
+        'added_fields': sorted(set(current_fields) - set(previous_fields)),
+        'removed_fields': sorted(set(previous_fields) - set(current_fields)),
+        'type_changes': [],
+        'null_rate_changes': [],
+        'cardinality_changes': []
     }
-    
-    for feature in features:
-        geometry = feature.get('geometry')
-        
-        if geometry and 'rings' in geometry:
-            # Polygon geometry (project boundaries)
-            geometry_info['has_geometry'] += 1
-            geometry_info['geometry_type'] = 'polygon'
-            
-            if len(geometry_info['sample_polygons']) < 2:
-                rings = geometry['rings']
-                # Calculate centroid from first ring
-                if rings and len(rings[0]) > 0:
-                    first_ring = rings[0]
-                    avg_lon = sum(coord[0] for coord in first_ring) / len(first_ring)
-                    avg_lat = sum(coord[1] for coord in first_ring) / len(first_ring)
-                    
-                    geometry_info['sample_polygons'].append({
-                        'num_rings': len(rings),
-                        'num_points': len(first_ring),
-                        'first_point': first_ring[0] if first_ring else None
-                    })
-                    geometry_info['sample_centroids'].append({
-                        'longitude': avg_lon,
-                        'latitude': avg_lat
-                    })
-        else:
-            geometry_info['missing_geometry'] += 1
-    
-    return geometry_info
-
-
-def generate_report(
-    field_analysis: Dict[str, Any], 
-    geometry_analysis: Dict[str, Any],
-    output_file: str = 'api_field_discovery.json'
-) -> None:
+
+    for field_name in sorted(set(current_fields) & set(previous_fields)):
+        before = previous_fields[field_name]
+        after = current_fields[field_name]
+
+        new_types = sorted(set(after['data_types']) - set(before.get('data_types', {})) - {'NoneType'})
+        if before.get('primary_type') not in (None, 'unknown', 'NoneType') and before['primary_type'] != after['primary_type']:
+            drift['type_changes'].append({
+                'field': field_name,
+                'previous': before['primary_type'],
+                'current': after['primary_type']
+            })
+        elif new_types:
+            drift['type_changes'].append({'field': field_name, 'new_types': new_types})
+
+        if 'null_rate' in before and abs(after['null_rate'] - before['null_rate']) >= DRIFT_NULL_RATE_CHANGE:
+            drift['null_rate_changes'].append({
+                'field': field_name,
+                'previous': before['null_rate'],
+                'current': after['null_rate']
+            })
+
+        previous_distinct = before.get('distinct_estimate')
+        current_distinct = after['distinct_estimate']
+        if previous_distinct and current_distinct:
+            ratio = current_distinct / previous_distinct
+            if ratio >= DRIFT_DISTINCT_RATIO or ratio <= 1 / DRIFT_DISTINCT_RATIO:
+                drift['cardinality_changes'].append({
+                    'field': field_name,
+                    'previous': previous_distinct,
+                    'current': current_distinct
+                })
+
+    drift['has_drift'] = any(drift[key] for key in (
+        'added_fields', 'removed_fields', 'type_changes', 'null_rate_changes', 'cardinality_changes'
+    ))
+    return drift
+
+
+def load_previous_report(path: str) -> Optional[Dict[str, Any]]:
+    """Read the previous report, if there is one"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read previous report {path}: {e}")
+        return None
+
+
+def generate_report(report: Dict[str, Any], output_path: str) -> None:
     """
-    Generate a detailed report of API field structure
-    
+    Save the report and print a summary
+
     Args:
-        field_analysis: Field structure analysis
-        geometry_analysis: Geometry analysis
-        output_file: Output filename for JSON report
+        report: Report dictionary
+        output_path: Output JSON path
     """
-    report = {
-        'discovery_date': datetime.now().isoformat(),
-        'summary': {
-            'total_fields': field_analysis['total_fields'],
-            'records_with_geometry': geometry_analysis['has_geometry'],
-            'records_without_geometry': geometry_analysis['missing_geometry']
-        },
-        'fields': {},
-        'geometry': geometry_analysis
-    }
-    
-    # Detailed field information
-    for field_name in field_analysis['field_names']:
-        types = field_analysis['field_types'][field_name]
-        samples = field_analysis['field_samples'][field_name]
-        
-        report['fields'][field_name] = {
-            'data_types': dict(types),
-            'primary_type': types.most_common(1)[0][0] if types else 'unknown',
-            'sample_values': samples[:3]
-        }
-    
-    # Save to file
-    output_path = os.path.join(os.path.dirname(__file__), '..', 'docs', 'planning', output_file)
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    
+
     with open(output_path, 'w') as f:
         json.dump(report, f, indent=2, default=str)
-    
+
     logger.info(f"Report saved to: {output_path}")
-    
+
+    summary = report['summary']
+
     # Print summary to console
     print("\n" + "=" * 80)
-    print("API FIELD DISCOVERY REPORT")
+    print(f"API FIELD DISCOVERY REPORT - {report['source']}")
     print("=" * 80)
-    print(f"\nTotal Fields: {field_analysis['total_fields']}")
-    print(f"Records Analyzed: {geometry_analysis['has_geometry'] + geometry_analysis['missing_geometry']}")
-    print(f"Records with Geometry: {geometry_analysis['has_geometry']}")
-    print("\nField Names:")
-    for field_name in sorted(field_analysis['field_names']):
-        primary_type = report['fields'][field_name]['primary_type']
-        sample = report['fields'][field_name]['sample_values'][:1]
+    print(f"\nTotal Fields: {summary['total_fields']}")
+    print(f"Records Analyzed: {summary['records_analyzed']:,}")
+    if summary['records_with_geometry'] is not None:
+        print(f"Records with Geometry: {summary['records_with_geometry']:,}")
+    print("\nFields:")
+    for field_name, field in report['fields'].items():
+        sample = field['sample_values'][:1]
         sample_str = f" (e.g., {sample[0]})" if sample else ""
-        print(f"  - {field_name} [{primary_type}]{sample_str}")
-    
-    print(f"\nGeometry Type: {geometry_analysis.get('geometry_type', 'none')}")
-    print("\nSample Centroids:")
-    for coord in geometry_analysis.get('sample_centroids', [])[:3]:
-        print(f"  - Lat: {coord['latitude']:.6f}, Lon: {coord['longitude']:.6f}")
-    
+        mapped_str = f" -> {field['mapped_to']}" if field['mapped_to'] else ""
+        print(
+            f"  - {field_name} [{field['primary_type']}] "
+            f"null {field['null_rate']:.1%}, ~{field['distinct_estimate']:,} distinct{mapped_str}{sample_str}"
+        )
+
+    geometry = report.get('geometry')
+    if geometry:
+        print(f"\nGeometry Type: {geometry.get('geometry_type') or 'none'}")
+        print(f"Vertices per feature: {geometry['vertices_per_feature']}")
+        print("\nSample Centroids:")
+        for coord in geometry.get('sample_centroids', [])[:3]:
+            print(f"  - Lat: {coord['latitude']:.6f}, Lon: {coord['longitude']:.6f}")
+
+    drift = report.get('drift')
+    if drift:
+        print(f"\nSchema drift since {drift['previous_date']}:")
+        if not drift['has_drift']:
+            print("  none")
+        for field_name in drift['added_fields']:
+            print(f"  + {field_name} (new field)")
+        for field_name in drift['removed_fields']:
+            print(f"  - {field_name} (field removed)")
+        for change in drift['type_changes']:
+            if 'new_types' in change:
+                print(f"  ~ {change['field']}: new value types {', '.join(change['new_types'])}")
+            else:
+                print(f"  ~ {change['field']}: type {change['previous']} -> {change['current']}")
+        for change in drift['null_rate_changes']:
+            print(f"  ~ {change['field']}: null rate {change['previous']:.1%} -> {change['current']:.1%}")
+        for change in drift['cardinality_changes']:
+            print(f"  ~ {change['field']}: distinct values ~{change['previous']:,} -> ~{change['current']:,}")
+
     print("\n" + "=" * 80)
-    print(f"Full report saved to: {output_file}")
+    print(f"Full report saved to: {output_path}")
     print("=" * 80 + "\n")
 
 
-def main():
+def main(argv: Optional[List[str]] = None):
     """
     Main entry point for field discovery script
+
+    Args:
+        argv: Command line arguments (defaults to sys.argv)
     """
-    api_url = os.getenv('PERMITIQ_SWFWMD_API_URL')
-    
-    if not api_url:
-        logger.error("PERMITIQ_SWFWMD_API_URL not set in environment")
+    codes = [source.code for source in all_sources()]
+    parser = argparse.ArgumentParser(description='Profile a district ArcGIS permit layer')
+    parser.add_argument('--source', default='SWFWMD', choices=codes, help='District to profile (default: SWFWMD)')
+    parser.add_argument('--geometry', action='store_true', help='Also download and profile polygons')
+    parser.add_argument('--output', help='Report path (default: docs/planning/api_field_discovery[_<district>].json)')
+    parser.add_argument('--previous', help='Report to compare against (default: the existing output file)')
+    args = parser.parse_args(argv)
+
+    source = next(source for source in all_sources() if source.code == args.source)
+
+    if not source.url:
+        logger.error(f"PERMITIQ_{source.code}_API_URL not set in environment")
         logger.error("Please create a .env file based on .env.example")
         return
-    
+
+    file_name = 'api_field_discovery.json' if source.code == 'SWFWMD' else f"api_field_discovery_{source.code.lower()}.json"
+    output_path = args.output or os.path.join(REPORT_DIR, file_name)
+    previous = load_previous_report(args.previous or output_path)
+
     try:
-        # Fetch sample permits
-        sample_permits = fetch_sample_permits(api_url, sample_size=100)
-        
-        # Analyze structure
-        field_analysis = analyze_field_structure(sample_permits)
-        geometry_analysis = analyze_geometry(sample_permits)
-        
+        report = profile_source(source, include_geometry=args.geometry)
+
+        if previous:
+            report['drift'] = detect_drift(previous, report)
+            if report['drift']['has_drift']:
+                logger.warning(f"{source.code} schema drift detected since {report['drift']['previous_date']}")
+
         # Generate report
-        generate_report(field_analysis, geometry_analysis)
-        
+        generate_report(report, output_path)
+
         logger.info("Field discovery complete!")
-        
+
     except Exception as e:
         logger.error(f"Field discovery failed: {e}")
         raise
@@ -0,0 +1,515 @@
+"""
+PermitIQ - Bulk Permit Export
+Streams erp_permits out of Supabase into CSV, GeoJSON text sequences or
+GeoParquet
+
+Pages are read with export_permits_page() (migration 021), a keyset on id,
+so every page costs the same however deep the export is, and no request
+hits the PostgREST row cap. The id range is split into shards that are read
+in parallel. Pages go through a bounded queue to a single writer, which
+appends them to the output file as they arrive: memory stays flat whatever
+the table size. Rows are written in page order, which is id order within a
+shard but not across shards.
+
+Usage:
+    python etl/export_permits.py permits.csv
+    python etl/export_permits.py permits.geojsonseq --county Hillsborough --issued-from 2024-01-01
+    python etl/export_permits.py permits.parquet --bbox -82.6 27.8 -82.3 28.1 --shards 8
+
+GeoParquet output needs pyarrow (`pip install pyarrow`).
+"""
+
+import os
+import csv
+import json
+import time
+import queue
+import argparse
+import logging
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Columns returned by export_permits_page(), besides geometry
+EXPORT_COLUMNS = (
+    'id',
+    'permit_number',
+    'objectid',
+    'applicant_name',
+    'company_name',
+    'permit_type',
+    'permit_status',
+    'activity_description',
+    'application_date',
+    'issue_date',
+    'expiration_date',
+    'last_modified_date',
+    'county',
+    'city',
+    'address',
+    'project_name',
+    'project_type',
+    'acreage',
+    'latitude',
+    'longitude',
+    'data_source',
+    'updated_at',
+    'source_removed_at',
+)
+
+# Typed columns in GeoParquet output (the rest are strings)
+INTEGER_COLUMNS = ('id', 'objectid')
+FLOAT_COLUMNS = ('acreage', 'latitude', 'longitude')
+DATE_COLUMNS = ('application_date', 'issue_date', 'expiration_date')
+TIMESTAMP_COLUMNS = ('last_modified_date', 'updated_at', 'source_removed_at')
+
+# PostgREST max-rows on Supabase; export_permits_page() caps pages at 5,000.
+# Larger pages would come back truncated, so they are rejected.
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 1000
+DEFAULT_SHARDS = 4
+
+# Pages buffered between the shard readers and the writer, per shard
+QUEUE_PAGES_PER_SHARD = 2
+
+PAGE_RETRIES = 3
+PROGRESS_INTERVAL_SECONDS = 10
+
+
+class ExportFilters:
+    """
+    Row filters passed to export_permits_page()
+    """
+
+    def __init__(
+        self,
+        county: Optional[str] = None,
+        issued_from: Optional[date] = None,
+        issued_to: Optional[date] = None,
+        permit_status: Optional[str] = None,
+        bbox: Optional[Sequence[float]] = None,
+        include_removed: bool = False
+    ):
+        """
+        Initialize the filters
+
+        Args:
+            county: County name (exact match)
+            issued_from: First issue date (inclusive)
+            issued_to: Last issue date (inclusive)
+            permit_status: Permit status (exact match)
+            bbox: (min_lon, min_lat, max_lon, max_lat) the permit's bounding box must overlap
+            include_removed: Also export permits removed from their source layer
+        """
+        self.county = county
+        self.issued_from = issued_from
+        self.issued_to = issued_to
+        self.permit_status = permit_status
+        self.bbox = tuple(bbox) if bbox else None
+        self.include_removed = include_removed
+
+    def rpc_args(self) -> Dict[str, Any]:
+        """
+        Filter arguments for export_permits_page()
+
+        Returns:
+            RPC parameters (unset filters omitted)
+        """
+        args: Dict[str, Any] = {'p_include_removed': self.include_removed}
+        if self.county:
+            args['p_county'] = self.county
+        if self.issued_from:
+            args['p_issued_from'] = self.issued_from.isoformat()
+        if self.issued_to:
+            args['p_issued_to'] = self.issued_to.isoformat()
+        if self.permit_status:
+            args['p_permit_status'] = self.permit_status
+        if self.bbox:
+            args['p_min_lon'], args['p_min_lat'], args['p_max_lon'], args['p_max_lat'] = self.bbox
+        return args
+
+
+class CsvExportWriter:
+    """
+    CSV with the geometry as WKT
+    """
+
+    geometry_format = 'wkt'
+
+    def __init__(self, path: str):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=EXPORT_COLUMNS + ('geometry',))
+        self.writer.writeheader()
+
+    def write_page(self, rows: List[Dict[str, Any]]):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class GeoJSONSeqExportWriter:
+    """
+    GeoJSON text sequence (RFC 8142): one Feature per line, each prefixed
+    with the record separator
+    """
+
+    geometry_format = 'geojson'
+
+    def __init__(self, path: str):
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write_page(self, rows: List[Dict[str, Any]]):
+        lines = []
+        for row in rows:
+            geometry = row.pop('geometry', None)
+            feature = {
+                'type': 'Feature',
+                'id': row['id'],
+                'geometry': json.loads(geometry) if geometry else None,
+                'properties': row,
+            }
+            lines.append('\x1e' + json.dumps(feature, separators=(',', ':'), default=str) + '\n')
+        self.file.writelines(lines)
+
+    def close(self):
+        self.file.close()
+
+
+class GeoParquetExportWriter:
+    """
+    GeoParquet 1.0 with WKB geometry; one row group per page
+    """
+
+    geometry_format = 'wkb'
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("GeoParquet export requires pyarrow (pip install pyarrow)") from e
+
+        self.pa = pa
+        types = {column: pa.string() for column in EXPORT_COLUMNS}
+        types.update({column: pa.int64() for column in INTEGER_COLUMNS})
+        types.update({column: pa.float64() for column in FLOAT_COLUMNS})
+        types.update({column: pa.date32() for column in DATE_COLUMNS})
+        types.update({column: pa.timestamp('us', tz='UTC') for column in TIMESTAMP_COLUMNS})
+
+        # JSON values that pyarrow won't convert on its own
+        self.converters = {column: float for column in FLOAT_COLUMNS}
+        self.converters.update({column: date.fromisoformat for column in DATE_COLUMNS})
+        self.converters.update({column: datetime.fromisoformat for column in TIMESTAMP_COLUMNS})
+
+        geo_metadata = {
+            'version': '1.0.0',
+            'primary_column': 'geometry',
+            # No crs: coordinates are lon/lat WGS84 (OGC:CRS84, the default)
+            'columns': {'geometry': {'encoding': 'WKB', 'geometry_types': ['MultiPolygon']}},
+        }
+        self.schema = pa.schema(
+            [pa.field(column, types[column]) for column in EXPORT_COLUMNS]
+            + [pa.field('geometry', pa.binary())],
+            metadata={'geo': json.dumps(geo_metadata)},
+        )
+        self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write_page(self, rows: List[Dict[str, Any]]):
+        columns = {}
+        for column in EXPORT_COLUMNS:
+            convert = self.converters.get(column)
+            values = [row.get(column) for row in rows]
+            columns[column] = [convert(v) if v is not None else None for v in values] if convert else values
+        columns['geometry'] = [bytes.fromhex(row['geometry']) if row.get('geometry') else None for row in rows]
+        self.writer.write_table(self.pa.Table.from_pydict(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+EXPORT_WRITERS = {
+    'csv': CsvExportWriter,
+    'geojsonseq': GeoJSONSeqExportWriter,
+    'geoparquet': GeoParquetExportWriter,
+}
+
+# Output file extension -> format
+FORMAT_EXTENSIONS = {
+    '.csv': 'csv',
+    '.geojsonseq': 'geojsonseq',
+    '.geojsons': 'geojsonseq',
+    '.geojsonl': 'geojsonseq',
+    '.parquet': 'geoparquet',
+    '.geoparquet': 'geoparquet',
+}
+
+
+def shard_ranges(min_id: int, max_id: int, shards: int) -> List[Tuple[int, int]]:
+    """
+    Split an id range into contiguous keyset ranges
+
+    Args:
+        min_id: Smallest id
+        max_id: Largest id
+        shards: Number of ranges
+
+    Returns:
+        (after_id, max_id) per shard: rows with after_id < id <= max_id
+    """
+    span = max_id - min_id + 1
+    shards = max(1, min(shards, span))
+    bounds = [min_id - 1 + span * i // shards for i in range(shards + 1)]
+    return list(zip(bounds, bounds[1:]))
+
+
+class PermitExporter:
+    """
+    Parallel keyset export of erp_permits to a file
+    """
+
+    def __init__(
+        self,
+        supabase: Client,
+        filters: Optional[ExportFilters] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        shards: int = DEFAULT_SHARDS
+    ):
+        """
+        Initialize the exporter
+
+        Args:
+            supabase: Supabase client (service role)
+            filters: Row filters (export everything if None)
+            page_size: Rows per RPC call (1 to MAX_PAGE_SIZE)
+            shards: Id ranges read in parallel
+
+        Raises:
+            ValueError: If page_size is outside 1 to MAX_PAGE_SIZE
+        """
+        if not 1 <= page_size <= MAX_PAGE_SIZE:
+            raise ValueError(f"page_size must be between 1 and {MAX_PAGE_SIZE:,} (got {page_size:,})")
+        self.supabase = supabase
+        self.filters = filters or ExportFilters()
+        self.page_size = page_size
+        self.shards = shards
+
+    def id_range(self) -> Optional[Tuple[int, int]]:
+        """
+        Smallest and largest permit id (primary key lookups)
+
+        Returns:
+            (min_id, max_id) or None if the table is empty
+        """
+        first = self.supabase.table('erp_permits').select('id').order('id').limit(1).execute().data
+        if not first:
+            return None
+        last = self.supabase.table('erp_permits').select('id').order('id', desc=True).limit(1).execute().data
+        return first[0]['id'], last[0]['id']
+
+    def fetch_page(self, after_id: int, max_id: int, geometry_format: str) -> List[Dict[str, Any]]:
+        """
+        One page of permits after an id, retried on transient errors
+
+        Args:
+            after_id: Last id already read
+            max_id: Upper id bound of the shard
+            geometry_format: 'geojson', 'wkt', 'wkb' or 'none'
+
+        Returns:
+            Up to page_size rows ordered by id
+        """
+        params = {
+            'p_after_id': after_id,
+            'p_max_id': max_id,
+            'p_limit': self.page_size,
+            'p_geometry_format': geometry_format,
+            **self.filters.rpc_args(),
+        }
+        for attempt in range(1, PAGE_RETRIES + 1):
+            try:
+                return self.supabase.rpc('export_permits_page', params).execute().data
+            except Exception as e:
+                if attempt == PAGE_RETRIES:
+                    raise
+                logger.warning(f"Export page after id {after_id} failed (attempt {attempt}): {e}")
+                time.sleep(2 ** attempt)
+
+    def read_shard(
+        self,
+        after_id: int,
+        max_id: int,
+        geometry_format: str,
+        pages: 'queue.Queue',
+        stop: threading.Event
+    ):
+        """
+        Read one id range page by page into the queue
+
+        A short page doesn't end the shard (the server may cap pages below
+        page_size); only an empty page does. Puts None when the shard is
+        done, or the exception if it failed.
+        """
+        try:
+            while not stop.is_set():
+                rows = self.fetch_page(after_id, max_id, geometry_format)
+                if not rows:
+                    break
+                pages.put(rows)
+                after_id = rows[-1]['id']
+            pages.put(None)
+        except Exception as e:
+            pages.put(e)
+
+    def export(self, path: str, output_format: str) -> Dict[str, Any]:
+        """
+        Export the filtered permits to a file
+
+        Args:
+            path: Output file
+            output_format: 'csv', 'geojsonseq' or 'geoparquet'
+
+        Returns:
+            Export statistics (rows, seconds, rows_per_second, bytes)
+        """
+        writer = EXPORT_WRITERS[output_format](path)
+        started = time.perf_counter()
+        rows_written = 0
+
+        id_range = self.id_range()
+        ranges = shard_ranges(*id_range, self.shards) if id_range else []
+        logger.info(
+            f"Exporting permits to {path} ({output_format}, {len(ranges)} shards, "
+            f"{self.page_size} rows per page)"
+        )
+
+        pages: 'queue.Queue' = queue.Queue(maxsize=max(1, len(ranges)) * QUEUE_PAGES_PER_SHARD)
+        stop = threading.Event()
+        readers = [
+            threading.Thread(
+                target=self.read_shard,
+                args=(after_id, max_id, writer.geometry_format, pages, stop),
+                name=f"export-shard-{i}",
+                daemon=True,
+            )
+            for i, (after_id, max_id) in enumerate(ranges)
+        ]
+        for reader in readers:
+            reader.start()
+
+        try:
+            remaining = len(readers)
+            last_report = started
+            while remaining:
+                item = pages.get()
+                if item is None:
+                    remaining -= 1
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                writer.write_page(item)
+                rows_written += len(item)
+
+                now = time.perf_counter()
+                if now - last_report >= PROGRESS_INTERVAL_SECONDS:
+                    last_report = now
+                    logger.info(
+                        f"Exported {rows_written:,} permits "
+                        f"({rows_written / (now - started):,.0f}/s, {os.path.getsize(path) / 1e6:,.1f} MB)"
+                    )
+        finally:
+            stop.set()
+            # Unblock readers waiting on a full queue
+            while any(reader.is_alive() for reader in readers):
+                try:
+                    pages.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            writer.close()
+
+        seconds = time.perf_counter() - started
+        stats = {
+            'rows': rows_written,
+            'seconds': round(seconds, 2),
+            'rows_per_second': round(rows_written / seconds) if seconds else 0,
+            'bytes': os.path.getsize(path),
+        }
+        logger.info(
+            f"Exported {stats['rows']:,} permits in {stats['seconds']}s "
+            f"({stats['rows_per_second']:,}/s, {stats['bytes'] / 1e6:,.1f} MB)"
+        )
+        return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Main entry point for the export command
+
+    Args:
+        argv: Command line arguments (defaults to sys.argv)
+    """
+    parser = argparse.ArgumentParser(description='Export ERP permits to CSV, GeoJSON-seq or GeoParquet')
+    parser.add_argument('output', help='Output file (.csv, .geojsonseq or .parquet)')
+    parser.add_argument('--format', choices=sorted(EXPORT_WRITERS), help='Output format (default: from the file extension)')
+    parser.add_argument('--county', help='Only permits in this county')
+    parser.add_argument('--issued-from', type=date.fromisoformat, help='Only permits issued on or after (YYYY-MM-DD)')
+    parser.add_argument('--issued-to', type=date.fromisoformat, help='Only permits issued on or before (YYYY-MM-DD)')
+    parser.add_argument('--status', help='Only permits with this status')
+    parser.add_argument(
+        '--bbox', type=float, nargs=4, metavar=('MIN_LON', 'MIN_LAT', 'MAX_LON', 'MAX_LAT'),
+        help='Only permits overlapping this bounding box'
+    )
+    parser.add_argument('--include-removed', action='store_true', help='Include permits removed from their source layer')
+    parser.add_argument('--shards', type=int, default=DEFAULT_SHARDS, help=f"Parallel id ranges (default: {DEFAULT_SHARDS})")
+    parser.add_argument(
+        '--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+        help=f"Rows per request, at most {MAX_PAGE_SIZE:,} (default: {DEFAULT_PAGE_SIZE})"
+    )
+    args = parser.parse_args(argv)
+
+    if not 1 <= args.page_size <= MAX_PAGE_SIZE:
+        parser.error(f"--page-size must be between 1 and {MAX_PAGE_SIZE:,}")
+
+    output_format = args.format or FORMAT_EXTENSIONS.get(os.path.splitext(args.output)[1].lower())
+    if not output_format:
+        parser.error('cannot infer the format from the file extension; pass --format')
+
+    supabase_url = os.getenv("PERMITIQ_SUPABASE_URL")
+    supabase_key = os.getenv("PERMITIQ_SUPABASE_SERVICE_KEY")
+    if not supabase_url or not supabase_key:
+        logger.error("Missing required environment variables")
+        logger.error("Please set PERMITIQ_SUPABASE_URL and PERMITIQ_SUPABASE_SERVICE_KEY")
+        raise SystemExit(1)
+
+    filters = ExportFilters(
+        county=args.county,
+        issued_from=args.issued_from,
+        issued_to=args.issued_to,
+        permit_status=args.status,
+        bbox=args.bbox,
+        include_removed=args.include_removed,
+    )
+    exporter = PermitExporter(
+        create_client(supabase_url, supabase_key),
+        filters=filters,
+        page_size=args.page_size,
+        shards=args.shards,
+    )
+    exporter.export(args.output, output_format)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,11 +8,16 @@ Created: 2025-10-22
 
 import os
 import sys
+import argparse
 import json
 import logging
 import uuid
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
 
 import requests
@@ -21,6 +26,16 @@ from supabase import create_client, Client
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from api_scheduler import APIScheduler
+from arcgis_json import STREAM_CHUNK_SIZE, iter_features
+from arcgis_pbf import decode_feature_collection, PBFDecodeError
+from dashboard_cache import DashboardCache
+from dashboard_publish import DashboardPublisher
+from geometry import polygons_to_wkt, repair_polygons, ring_centroid
+from post_load import PostLoadExecutor, PostLoadTask
+from profiling import StageProfiler
+from sources import PermitSource, enabled_sources
+
 # Load environment variables
 load_dotenv()
 
@@ -35,27 +50,318 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Features per process-pool transform task, and the smallest source worth
+# the pool's start-up and transfer cost
+TRANSFORM_PAGE_SIZE = 1000
+PARALLEL_TRANSFORM_MIN_RECORDS = 5000
+
+# Reconcile refuses to tombstone more than this share of stored permits at once
+RECONCILE_MAX_MISSING_FRACTION = 0.05
+
+# Exit status of a run where some sources failed and the others loaded; the
+# workflow still publishes the dashboard payloads of such a run
+PARTIAL_RUN_EXIT_CODE = 3
+
+# Attributes ArcGIS derives from the polygon itself; if they are unchanged the
+# boundary is (for our purposes) unchanged and need not be downloaded again.
+# SWFWMD names; other sources map their own (PermitSource.fingerprint_fields)
+GEOMETRY_FINGERPRINT_FIELDS = ('SHAPE.AREA', 'SHAPE.LEN')
+
+# Transformed permit fields tracked in erp_permit_history; each revision is
+# stored as the subset that changed since the previous one (migration 015)
+HISTORY_FIELDS = (
+    'objectid',
+    'applicant_name',
+    'permit_type',
+    'permit_status',
+    'activity_description',
+    'application_date',
+    'issue_date',
+    'expiration_date',
+    'last_modified_date',
+    'project_name',
+    'acreage',
+    'geometry_fingerprint',
+)
+
+
+def missing_from_source(stored_ids: List[int], source_ids: List[int]) -> List[int]:
+    """
+    Diff two sorted ID arrays with a single merge walk
+    
+    Args:
+        stored_ids: Sorted objectids stored in the database
+        source_ids: Sorted OBJECTIDs currently served by the API
+    
+    Returns:
+        Stored IDs that are absent from the source (sorted)
+    """
+    missing = []
+    j = 0
+    source_count = len(source_ids)
+    
+    for stored_id in stored_ids:
+        while j < source_count and source_ids[j] < stored_id:
+            j += 1
+        if j == source_count or source_ids[j] != stored_id:
+            missing.append(stored_id)
+    
+    return missing
+
+
+def history_state(permit: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+    """
+    Full history state of a transformed permit revision and its hash
+    
+    Args:
+        permit: Transformed permit
+    
+    Returns:
+        (state with every HISTORY_FIELDS key, nulls included; MD5 of the state)
+    """
+    state = {field: permit.get(field) for field in HISTORY_FIELDS}
+    state_hash = hashlib.md5(json.dumps(state, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return state, state_hash
+
+
+def geometry_fingerprint(
+    attributes: Dict[str, Any],
+    fields: Tuple[str, ...] = GEOMETRY_FINGERPRINT_FIELDS
+) -> Optional[str]:
+    """
+    Fingerprint a permit's boundary from its attributes alone
+    
+    Args:
+        attributes: Feature attributes from ArcGIS API
+        fields: Shape area/length fields of the source layer
+    
+    Returns:
+        Short hash of the shape area/length, or None if the layer lacks them
+    """
+    values = [attributes.get(field) for field in fields]
+    if all(value is None for value in values):
+        return None
+    
+    # Round so float formatting noise doesn't look like a boundary change
+    key = '|'.join('' if value is None else f"{float(value):.6f}" for value in values)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def raw_payload(attributes: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+    """
+    Raw API attributes and their content hash
+    
+    The payload keeps every attribute under its ArcGIS name, including the
+    mapped ones: the columns hold converted values (dates, permit number as
+    text), so the original record can't be rebuilt from them.
+    
+    Args:
+        attributes: Feature attributes from ArcGIS API
+    
+    Returns:
+        (payload for erp_permit_raw, MD5 of its canonical JSON)
+    """
+    payload = dict(attributes)
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return payload, hashlib.md5(canonical.encode('utf-8')).hexdigest()
+
+
+def parse_timestamp(timestamp: Optional[Any]) -> Optional[str]:
+    """
+    Parse ArcGIS timestamp (milliseconds since epoch) to ISO format
+    
+    Args:
+        timestamp: Milliseconds since epoch or None
+    
+    Returns:
+        ISO formatted datetime string or None
+    """
+    if timestamp is None:
+        return None
+    
+    try:
+        # ArcGIS uses milliseconds since epoch
+        dt = datetime.fromtimestamp(int(timestamp) / 1000)
+        return dt.isoformat()
+    except (ValueError, TypeError):
+        logger.warning(f"Could not parse timestamp: {timestamp}")
+        return None
+
+
+def transform_feature(feature: Dict[str, Any], source: PermitSource) -> Dict[str, Any]:
+    """
+    Transform raw API response into database-ready format
+    
+    Module-level (no ETL state) so pages can be transformed in worker
+    processes (see transform_page).
+    
+    Args:
+        feature: Raw feature from ArcGIS API
+        source: District source (field mapping and data_source)
+    
+    Returns:
+        Transformed permit dictionary
+    """
+    attributes = feature.get('attributes', {})
+    geometry = feature.get('geometry', {})
+    
+    # Handle polygon geometry from SWFWMD API
+    # Permits have project boundaries (polygons), not just points
+    polygon_wkt = None
+    centroid_wkt = None
+    latitude = None
+    longitude = None
+    
+    if geometry and 'rings' in geometry:
+        # Unclosed/degenerate rings are fixed and rings grouped into parts by
+        # their ArcGIS orientation here; the database makes self-intersecting
+        # polygons valid on write
+        polygons = repair_polygons(geometry['rings'])
+        polygon_wkt = polygons_to_wkt(polygons)
+        
+        # Centroid for point-based queries (average of first outer ring coordinates)
+        centroid = ring_centroid(polygons[0][0]) if polygons else None
+        if centroid:
+            longitude, latitude = centroid
+            centroid_wkt = f"POINT({longitude} {latitude})"
+    
+    # Transform to database schema using the source's field mapping
+    # (SWFWMD: see docs/planning/api_field_discovery.json)
+    value = source.value
+    permit_nbr = value(attributes, 'permit_number')
+    payload, payload_hash = raw_payload(attributes)
+    permit = {
+        'objectid': value(attributes, 'objectid'),
+        'permit_number': str(permit_nbr) if permit_nbr else None,
+        'applicant_name': value(attributes, 'applicant_name'),
+        'company_name': value(attributes, 'applicant_name'),  # API doesn't separate company name
+        'permit_type': value(attributes, 'permit_type'),
+        'permit_status': value(attributes, 'permit_status'),
+        'activity_description': value(attributes, 'activity_description'),
+        'application_date': parse_timestamp(value(attributes, 'application_date')),
+        'issue_date': parse_timestamp(value(attributes, 'issue_date')),
+        'expiration_date': parse_timestamp(value(attributes, 'expiration_date')),
+        'last_modified_date': parse_timestamp(value(attributes, 'last_modified_date')),
+        'county': None,  # Not available in API
+        'city': None,  # Not available in API
+        'address': None,  # Not available in API
+        'latitude': latitude,
+        'longitude': longitude,
+        'geometry': polygon_wkt,  # Full project boundary polygon
+        'location': centroid_wkt,  # Centroid point for markers/clustering
+        'project_name': value(attributes, 'project_name'),
+        'project_type': None,  # Not available in API
+        'acreage': value(attributes, 'acreage'),
+        'raw_data': payload,  # All attributes; written to erp_permit_raw by upsert_permits
+        'raw_hash': payload_hash,
+        'geometry_fingerprint': geometry_fingerprint(attributes, source.fingerprint_fields),
+        'data_source': source.data_source
+    }
+    
+    # Remove None values
+    permit = {k: v for k, v in permit.items() if v is not None}
+    if feature.get('geometry_pending'):
+        permit['geometry_pending'] = True
+    
+    return permit
+
+
+def transform_page(page: Tuple[List[Dict[str, Any]], PermitSource]) -> List[Dict[str, Any]]:
+    """
+    Transform one page of features (process pool task)
+    
+    A task is a whole page so the features and results cross the process
+    boundary in one pickle each way, not one per record.
+    
+    Args:
+        page: (features, source)
+    
+    Returns:
+        Transformed permits in feature order
+    """
+    features, source = page
+    return [transform_feature(feature, source) for feature in features]
+
+
+def pbf_error_document(response: requests.Response) -> Optional[Dict[str, Any]]:
+    """
+    The ArcGIS error of a JSON response to an f=pbf query
+    
+    Args:
+        response: Response with a JSON content type
+    
+    Returns:
+        The `error` object, or None if the body has none (the server
+        answered in JSON instead of PBF)
+    """
+    try:
+        data = response.json()
+    except ValueError:
+        return None
+    error = data.get('error') if isinstance(data, dict) else None
+    return error if isinstance(error, dict) else None
+
+
+def transform_worker_count() -> int:
+    """
+    Transform processes to use: PERMITIQ_TRANSFORM_WORKERS, or the cores
+    available to this process
+    """
+    configured = os.getenv("PERMITIQ_TRANSFORM_WORKERS")
+    if configured:
+        return max(int(configured), 1)
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class PartialRunError(RuntimeError):
+    """Raised after a run in which some source pipelines failed and the others loaded"""
+
 
 class SWFWMDAPIClient:
     """
     Client for interacting with Southwest Florida Water Management District ArcGIS API
     
+    The other districts' ERP layers are ArcGIS MapServer layers too and use
+    this client with their own endpoint and scheduler (see sources.py).
+    
     API Constraints:
     - Available 6 AM - 10 PM EST only
     - Max 1,000 records per request (requires pagination)
-    - Returns GeoJSON format
+    - Returns JSON or PBF (protobuf) feature collections
+    
+    Feature queries use `f=pbf` with quantized coordinates when the server
+    supports it and fall back to `f=json` otherwise. JSON responses are
+    decoded feature by feature as the body streams in (arcgis_json.py).
+    
+    All requests go through an APIScheduler, which enforces the availability
+    window and adapts request rate/concurrency to 429s, 5xx and latency.
     """
     
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, scheduler: Optional[APIScheduler] = None):
         """
         Initialize the API client
         
         Args:
             base_url: Base URL for the SWFWMD ArcGIS REST API endpoint
+            scheduler: Request scheduler (defaults to the SWFWMD window)
         """
         self.base_url = base_url.rstrip('/')
+        self.scheduler = scheduler or APIScheduler()
         self.session = self._create_session()
         
+        # Wire format for feature queries (switches to json if pbf is refused)
+        self.wire_format = os.getenv('PERMITIQ_API_FORMAT', 'pbf').lower()
+        # Decimal places kept for WGS84 coordinates (6 ~= 0.1 m)
+        self.geometry_precision = int(os.getenv('PERMITIQ_API_GEOMETRY_PRECISION', '6'))
+        # Optional server-side generalization in degrees (unset = exact polygons)
+        max_offset = os.getenv('PERMITIQ_API_MAX_ALLOWABLE_OFFSET')
+        self.max_allowable_offset = float(max_offset) if max_offset else None
+        
+        self.bytes_received = 0
+        self._bytes_lock = threading.Lock()
+        
     def _create_session(self) -> requests.Session:
         """
         Create a requests session with retry logic
@@ -65,20 +371,124 @@ class SWFWMDAPIClient:
         """
         session = requests.Session()
         
-        # Retry strategy for transient failures
+        # Connection-level retries only; 429/5xx are handled by the scheduler,
+        # which backs off and slows down instead of retrying blindly
         retry_strategy = Retry(
             total=3,
             backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
+            status_forcelist=[],
             allowed_methods=["GET"]
         )
         
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        adapter = HTTPAdapter(
+            max_retries=retry_strategy,
+            pool_maxsize=self.scheduler.controller.max_concurrency
+        )
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         
         return session
     
+    def _get(self, url: str, params: Dict[str, Any], timeout: int, stream: bool = False) -> requests.Response:
+        """
+        Issue a GET request through the scheduler
+        
+        Args:
+            url: Request URL
+            params: Query parameters
+            timeout: Request timeout in seconds
+            stream: Return once the headers arrive; the body is read by the caller
+        
+        Returns:
+            Response (raise_for_status not yet called)
+        """
+        return self.scheduler.request(
+            lambda: self.session.get(url, params=params, timeout=timeout, stream=stream)
+        )
+    
+    def _iter_query_features(self, params: Dict[str, Any], timeout: int = 60) -> Iterator[Dict[str, Any]]:
+        """
+        Run a feature query in the compact wire format
+        
+        Adds the precision/generalization parameters, requests `f=pbf` and
+        decodes it, and falls back to `f=json` (for this and all later
+        queries) if the server refuses PBF: HTTP 400, an ArcGIS error with
+        code 400, or a JSON/HTML body. Throttling and server errors that
+        outlast the scheduler's retries are raised instead. JSON features are
+        yielded as they are decoded from the response stream.
+        
+        Args:
+            params: Query parameters without `f`
+            timeout: Request timeout in seconds
+        
+        Yields:
+            Features shaped like the JSON response's
+        """
+        url = f"{self.base_url}/query"
+        params = dict(params)
+        if self.max_allowable_offset is not None:
+            params['maxAllowableOffset'] = self.max_allowable_offset
+        
+        if self.wire_format == 'pbf':
+            pbf_params = {
+                **params,
+                'f': 'pbf',
+                'quantizationParameters': json.dumps({
+                    'mode': 'edit',
+                    'originPosition': 'upperLeft',
+                    'tolerance': 10 ** -self.geometry_precision
+                })
+            }
+            response = self._get(url, pbf_params, timeout=timeout)
+            if not response.ok and response.status_code != 400:
+                # Throttling, outage or auth error that outlasted the retries,
+                # not a format refusal; don't give up on PBF
+                response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '')
+            if response.ok and 'json' in content_type:
+                error = pbf_error_document(response)
+                if error is not None and error.get('code') != 400:
+                    # ArcGIS reports throttling and outages as HTTP 200 too
+                    raise ValueError(f"API Error: {error}")
+            
+            if response.ok and 'json' not in content_type and 'html' not in content_type:
+                try:
+                    data = decode_feature_collection(response.content)
+                    self._count_bytes(len(response.content))
+                except PBFDecodeError as e:
+                    logger.warning(f"Could not decode PBF response ({e}); falling back to JSON")
+                else:
+                    yield from data.get('features', [])
+                    return
+            else:
+                # HTTP 400, or JSON/HTML instead of PBF
+                logger.warning(
+                    f"Server refused f=pbf (HTTP {response.status_code}, {content_type or 'no content type'}); "
+                    f"falling back to JSON"
+                )
+            self.wire_format = 'json'
+        
+        json_params = {
+            **params,
+            'f': 'json',
+            'geometryPrecision': self.geometry_precision
+        }
+        # The scheduler's slot covers the request up to the headers; the body
+        # is decoded while it downloads
+        with self._get(url, json_params, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            yield from iter_features(self._counted(response.iter_content(STREAM_CHUNK_SIZE)))
+    
+    def _count_bytes(self, size: int) -> None:
+        with self._bytes_lock:
+            self.bytes_received += size
+    
+    def _counted(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """Pass body chunks through, adding their size to bytes_received"""
+        for chunk in chunks:
+            self._count_bytes(len(chunk))
+            yield chunk
+    
     def get_record_count(self) -> int:
         """
         Get total count of records available in the API
@@ -95,7 +505,7 @@ class SWFWMDAPIClient:
         url = f"{self.base_url}/query"
         
         try:
-            response = self.session.get(url, params=params, timeout=30)
+            response = self._get(url, params, timeout=30)
             response.raise_for_status()
             data = response.json()
             count = data.get('count', 0)
@@ -105,12 +515,61 @@ class SWFWMDAPIClient:
             logger.error(f"Failed to get record count: {e}")
             raise
     
+    def get_layer_info(self) -> Dict[str, Any]:
+        """
+        Get the layer metadata (fields with their ArcGIS types, geometry type)
+        
+        Returns:
+            Layer description (`{base_url}?f=json`)
+        """
+        response = self._get(self.base_url, {'f': 'json'}, timeout=30)
+        response.raise_for_status()
+        data = response.json()
+        
+        if 'error' in data:
+            raise ValueError(f"API Error: {data['error']}")
+        return data
+    
+    def get_object_ids(self) -> List[int]:
+        """
+        Get the OBJECTID of every record in the layer (returnIdsOnly)
+        
+        A few KB on the wire, versus a full download for the records themselves.
+        
+        Returns:
+            Sorted list of OBJECTIDs
+        """
+        params = {
+            'where': '1=1',
+            'returnIdsOnly': 'true',
+            'f': 'json'
+        }
+        
+        url = f"{self.base_url}/query"
+        
+        try:
+            response = self._get(url, params, timeout=60)
+            response.raise_for_status()
+            data = response.json()
+            
+            if 'error' in data:
+                raise ValueError(f"API Error: {data['error']}")
+            
+            object_ids = sorted(data.get('objectIds') or [])
+            logger.info(f"Object IDs available: {len(object_ids):,}")
+            return object_ids
+        except Exception as e:
+            logger.error(f"Failed to get object IDs: {e}")
+            raise
+    
     def fetch_permits(
         self, 
         offset: int = 0, 
         limit: int = 1000,
-        where_clause: str = "1=1"
-    ) -> List[Dict[str, Any]]:
+        where_clause: str = "1=1",
+        return_geometry: bool = True,
+        transform: Optional[Callable[[Dict[str, Any]], Any]] = None
+    ) -> List[Any]:
         """
         Fetch permit records from the API with pagination
         
@@ -118,33 +577,29 @@ class SWFWMDAPIClient:
             offset: Record offset for pagination
             limit: Maximum records per request (API max is 1000)
             where_clause: SQL WHERE clause for filtering
+            return_geometry: Include polygon rings (most of the response size)
+            transform: Applied to each record as soon as it is decoded, while
+                the rest of a JSON response is still downloading
         
         Returns:
-            List of permit records as dictionaries
+            List of permit records as dictionaries (or their transform results)
         """
         params = {
             'where': where_clause,
             'outFields': '*',  # Get all fields
-            'returnGeometry': 'true',
+            'returnGeometry': 'true' if return_geometry else 'false',
             'outSR': '4326',  # WGS84 coordinate system (lat/lng)
-            'f': 'json',
             'resultOffset': offset,
             'resultRecordCount': min(limit, 1000)  # API max
         }
         
-        url = f"{self.base_url}/query"
-        
         try:
             logger.debug(f"Fetching records at offset {offset}")
-            response = self.session.get(url, params=params, timeout=60)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if 'error' in data:
-                raise ValueError(f"API Error: {data['error']}")
-            
-            features = data.get('features', [])
+            features = self._iter_query_features(params)
+            if transform is None:
+                features = list(features)
+            else:
+                features = [transform(feature) for feature in features]
             logger.info(f"Fetched {len(features)} records (offset: {offset})")
             
             return features
@@ -153,38 +608,127 @@ class SWFWMDAPIClient:
             logger.error(f"Failed to fetch permits at offset {offset}: {e}")
             raise
     
-    def fetch_all_permits(self, batch_size: int = 1000) -> List[Dict[str, Any]]:
+    def fetch_all_permits(
+        self,
+        batch_size: int = 1000,
+        return_geometry: bool = True
+    ) -> List[Dict[str, Any]]:
         """
         Fetch all permit records using pagination
         
+        Pages are fetched concurrently; the scheduler decides how many are in
+        flight and pauses remaining pages across the nightly API cutoff.
+        
         Args:
             batch_size: Records per batch (max 1000 due to API limit)
+            return_geometry: Include polygon rings
         
         Returns:
             List of all permit records
         """
         all_permits = []
-        offset = 0
-        total_count = self.get_record_count()
+        for batch in self.iter_permit_pages(batch_size, return_geometry):
+            all_permits.extend(batch)
+        
+        logger.info(
+            f"Fetch complete: {len(all_permits):,} records retrieved "
+            f"({self.bytes_received / 1_000_000:.1f} MB received as {self.wire_format})"
+        )
+        return all_permits
+    
+    def iter_permit_pages(
+        self,
+        batch_size: int = 1000,
+        return_geometry: bool = True,
+        transform: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        total_count: Optional[int] = None
+    ) -> Iterator[List[Any]]:
+        """
+        Fetch all permit records page by page
+        
+        Pages are fetched concurrently and yielded in order; only a few pages
+        are held at a time, so callers that consume pages as they arrive
+        (e.g. discover_fields.py) run in bounded memory.
         
-        logger.info(f"Starting full data fetch ({total_count:,} total records)")
+        Args:
+            batch_size: Records per batch (max 1000 due to API limit)
+            return_geometry: Include polygon rings
+            transform: Applied to each record in the fetch thread as it is
+                decoded (see fetch_permits)
+            total_count: Layer record count, if the caller already has it
+        
+        Yields:
+            Lists of permit records (or their transform results)
+        """
+        if total_count is None:
+            total_count = self.get_record_count()
+        page_size = min(batch_size, 1000)
+        offsets = range(0, total_count, page_size)
+        
+        logger.info(f"Starting full data fetch ({total_count:,} total records, {len(offsets)} pages)")
+        
+        progress_lock = threading.Lock()
+        fetched = [0]
         
-        while offset < total_count:
-            batch = self.fetch_permits(offset=offset, limit=batch_size)
+        def fetch_page(offset: int) -> List[Any]:
+            batch = self.fetch_permits(
+                offset=offset,
+                limit=page_size,
+                return_geometry=return_geometry,
+                transform=transform
+            )
             
             if not batch:
-                logger.warning(f"No records returned at offset {offset}, stopping")
-                break
-            
-            all_permits.extend(batch)
-            offset += len(batch)
+                logger.warning(f"No records returned at offset {offset}")
             
             # Progress indicator
-            progress = (len(all_permits) / total_count) * 100
-            logger.info(f"Progress: {len(all_permits):,}/{total_count:,} ({progress:.1f}%)")
+            with progress_lock:
+                fetched[0] += len(batch)
+                progress = (fetched[0] / total_count) * 100
+                logger.info(f"Progress: {fetched[0]:,}/{total_count:,} ({progress:.1f}%)")
+            return batch
         
-        logger.info(f"Fetch complete: {len(all_permits):,} records retrieved")
-        return all_permits
+        yield from self.scheduler.imap(fetch_page, offsets)
+    
+    def fetch_geometries(
+        self,
+        object_ids: List[int],
+        batch_size: int = 200,
+        out_fields: str = 'OBJECTID,ERP_PERMIT_NBR'
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch geometries for specific records by OBJECTID
+        
+        Args:
+            object_ids: OBJECTIDs to fetch
+            batch_size: OBJECTIDs per request (keeps the GET URL short)
+            out_fields: Key fields returned with each geometry
+        
+        Returns:
+            Features with OBJECTID/ERP_PERMIT_NBR attributes and geometry
+        """
+        def fetch_chunk(chunk: List[int]) -> List[Dict[str, Any]]:
+            params = {
+                'objectIds': ','.join(str(oid) for oid in chunk),
+                'outFields': out_fields,
+                'returnGeometry': 'true',
+                'outSR': '4326'
+            }
+            
+            try:
+                return list(self._iter_query_features(params))
+                
+            except Exception as e:
+                logger.error(f"Failed to fetch geometries for {len(chunk)} OBJECTIDs: {e}")
+                raise
+        
+        chunks = [object_ids[i:i + batch_size] for i in range(0, len(object_ids), batch_size)]
+        features = []
+        for chunk_features in self.scheduler.map(fetch_chunk, chunks):
+            features.extend(chunk_features)
+        
+        logger.info(f"Fetched {len(features):,} geometries for {len(object_ids):,} OBJECTIDs")
+        return features
 
 
 class PermitIQETL:
@@ -192,124 +736,337 @@ class PermitIQETL:
     Main ETL pipeline for PermitIQ
     
     Responsibilities:
-    - Fetch data from SWFWMD API
+    - Fetch data from each enabled district API (concurrent pipelines)
     - Transform and normalize data
     - Detect changes vs existing database
     - Load data into Supabase
     - Calculate statistics and hotspots
     """
     
-    def __init__(self, supabase_url: str, supabase_key: str, api_url: str):
+    def __init__(
+        self,
+        supabase_url: str,
+        supabase_key: str,
+        sources: List[PermitSource],
+        profiler: Optional[StageProfiler] = None
+    ):
         """
         Initialize the ETL pipeline
         
         Args:
             supabase_url: Supabase project URL
             supabase_key: Supabase service role key
-            api_url: SWFWMD API endpoint URL
+            sources: District sources to ingest
+            profiler: Stage profiler (disabled if None)
         """
         self.supabase: Client = create_client(supabase_url, supabase_key)
-        self.api_client = SWFWMDAPIClient(api_url)
+        self.sources = sources
+        self.profiler = profiler or StageProfiler(enabled=False)
+        self.api_clients: Dict[str, SWFWMDAPIClient] = {
+            source.code: SWFWMDAPIClient(source.url, scheduler=source.create_scheduler())
+            for source in sources
+        }
         self.etl_run_id = uuid.uuid4()
         self.dry_run = os.getenv("PERMITIQ_DRY_RUN", "false").lower() == "true"
+        # 'full' downloads every polygon; 'incremental' fetches attributes only
+        # and downloads geometry just for new or changed permits
+        self.fetch_mode = os.getenv("PERMITIQ_FETCH_MODE", "full").lower()
+        # Every Nth history revision of a permit stores its full state
+        self.history_keyframe_interval = int(os.getenv("PERMITIQ_HISTORY_KEYFRAME_INTERVAL", "10"))
+        # Monthly change/history partitions older than these are dropped
+        self.change_retention_months = int(os.getenv("PERMITIQ_CHANGE_RETENTION_MONTHS", "24"))
+        self.history_retention_months = int(os.getenv("PERMITIQ_HISTORY_RETENTION_MONTHS", "60"))
+        # Transform process pool, shared by the source pipelines (see transform_permits)
+        self.transform_workers = transform_worker_count()
+        self._transform_pool: Optional[ProcessPoolExecutor] = None
+        self._transform_pool_lock = threading.Lock()
         
         logger.info(f"ETL Run ID: {self.etl_run_id}")
+        logger.info(f"Fetch mode: {self.fetch_mode}")
+        logger.info(f"Sources: {', '.join(source.code for source in sources)}")
         if self.dry_run:
             logger.warning("DRY RUN MODE - No data will be written to database")
     
-    def transform_permit(self, feature: Dict[str, Any]) -> Dict[str, Any]:
+    def transform_permit(self, feature: Dict[str, Any], source: PermitSource) -> Dict[str, Any]:
+        """Transform one raw feature (see transform_feature)"""
+        return transform_feature(feature, source)
+    
+    def _parse_timestamp(self, timestamp: Optional[Any]) -> Optional[str]:
+        """Parse an ArcGIS timestamp (see parse_timestamp)"""
+        return parse_timestamp(timestamp)
+    
+    def transform_permits(self, features: List[Dict[str, Any]], source: PermitSource) -> List[Dict[str, Any]]:
         """
-        Transform raw API response into database-ready format
+        Transform all features of a source
+        
+        Large sources are split into pages transformed in a process pool
+        (polygon WKT building is pure-Python and CPU-bound, so threads don't
+        help); the result is the same list, in the same order, as the serial
+        path.
         
         Args:
-            feature: Raw feature from ArcGIS API
+            features: Raw features
+            source: District source
         
         Returns:
-            Transformed permit dictionary
-        """
-        attributes = feature.get('attributes', {})
-        geometry = feature.get('geometry', {})
-        
-        # Handle polygon geometry from SWFWMD API
-        # Permits have project boundaries (polygons), not just points
-        polygon_wkt = None
-        centroid_wkt = None
-        latitude = None
-        longitude = None
-        
-        if geometry and 'rings' in geometry:
-            rings = geometry['rings']
-            if rings and len(rings) > 0:
-                # Build WKT POLYGON from rings
-                # Format: POLYGON((x1 y1, x2 y2, x3 y3, x1 y1))
-                ring_strs = []
-                for ring in rings:
-                    coords = [f"{lon} {lat}" for lon, lat in ring]
-                    ring_strs.append(f"({', '.join(coords)})")
-                polygon_wkt = f"POLYGON({', '.join(ring_strs)})"
-                
-                # Calculate centroid for point-based queries (average of first ring coordinates)
-                first_ring = rings[0]
-                if first_ring:
-                    avg_lon = sum(coord[0] for coord in first_ring) / len(first_ring)
-                    avg_lat = sum(coord[1] for coord in first_ring) / len(first_ring)
-                    longitude = avg_lon
-                    latitude = avg_lat
-                    centroid_wkt = f"POINT({avg_lon} {avg_lat})"
-        
-        # Transform to database schema
-        # Field names based on actual API discovery (see docs/planning/api_field_discovery.json)
-        permit = {
-            'objectid': attributes.get('OBJECTID'),
-            'permit_number': str(attributes.get('ERP_PERMIT_NBR')) if attributes.get('ERP_PERMIT_NBR') else None,
-            'applicant_name': attributes.get('PERMITTEE_NAME'),
-            'company_name': attributes.get('PERMITTEE_NAME'),  # API doesn't separate company name
-            'permit_type': attributes.get('ERP_PERMIT_TYPE_DESC'),
-            'permit_status': attributes.get('ERP_STATUS_DESC'),
-            'activity_description': attributes.get('ERP_ACTIVITY_DESC'),
-            'application_date': self._parse_timestamp(attributes.get('APPLICATION_RECEIVED_DT')),
-            'issue_date': self._parse_timestamp(attributes.get('PERMIT_ISSUE_DT')),
-            'expiration_date': self._parse_timestamp(attributes.get('EXPIRATION_DT')),
-            'last_modified_date': self._parse_timestamp(attributes.get('LAST_UPDATE_DT')),
-            'county': None,  # Not available in API
-            'city': None,  # Not available in API
-            'address': None,  # Not available in API
-            'latitude': latitude,
-            'longitude': longitude,
-            'geometry': polygon_wkt,  # Full project boundary polygon
-            'location': centroid_wkt,  # Centroid point for markers/clustering
-            'project_name': attributes.get('PROJECT_NAME'),
-            'project_type': None,  # Not available in API
-            'acreage': attributes.get('PROJECT_ACRES_MS'),
-            'raw_data': json.dumps(attributes),  # Store full API response
-            'data_source': 'SWFWMD_API'
-        }
+            Transformed permits in feature order
+        """
+        if self.transform_workers <= 1 or len(features) < PARALLEL_TRANSFORM_MIN_RECORDS:
+            return [transform_feature(feature, source) for feature in features]
+        
+        pages = [
+            (features[i:i + TRANSFORM_PAGE_SIZE], source)
+            for i in range(0, len(features), TRANSFORM_PAGE_SIZE)
+        ]
+        permits = []
+        for page_permits in self.transform_pool().map(transform_page, pages):
+            permits.extend(page_permits)
+        return permits
+    
+    def fetch_and_transform(self, source: PermitSource) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Full fetch with transform overlapping the download
+        
+        Sources below PARALLEL_TRANSFORM_MIN_RECORDS (or without a process
+        pool) transform each feature in the fetch thread as soon as it is
+        decoded, while the rest of its page downloads. Larger sources send
+        each page to the process pool as it arrives (see transform_permits),
+        while the scheduler keeps downloading the next pages.
+        
+        Args:
+            source: District source
+        
+        Returns:
+            (raw features, transformed permits in feature order)
+        """
+        api_client = self.api_clients[source.code]
+        total_count = api_client.get_record_count()
+        raw_permits: List[Dict[str, Any]] = []
+        permits: List[Dict[str, Any]] = []
+        
+        if self.transform_workers <= 1 or total_count < PARALLEL_TRANSFORM_MIN_RECORDS:
+            def transform(feature: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+                return feature, transform_feature(feature, source)
+            
+            for page in api_client.iter_permit_pages(transform=transform, total_count=total_count):
+                for feature, permit in page:
+                    raw_permits.append(feature)
+                    permits.append(permit)
+            return raw_permits, permits
         
-        # Remove None values
-        permit = {k: v for k, v in permit.items() if v is not None}
+        # Pool futures of the transformed pages, in page order
+        futures: List[Future] = []
+        for page in api_client.iter_permit_pages(total_count=total_count):
+            raw_permits.extend(page)
+            futures.append(self.transform_pool().submit(transform_page, (page, source)))
         
-        return permit
+        for future in futures:
+            permits.extend(future.result())
+        return raw_permits, permits
     
-    def _parse_timestamp(self, timestamp: Optional[Any]) -> Optional[str]:
+    def transform_pool(self) -> ProcessPoolExecutor:
+        """Start the transform process pool on first use"""
+        with self._transform_pool_lock:
+            if self._transform_pool is None:
+                logger.info(f"Starting {self.transform_workers} transform worker processes")
+                # spawn, not fork: the fetch and scheduler threads may hold locks
+                self._transform_pool = ProcessPoolExecutor(
+                    max_workers=self.transform_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._transform_pool
+    
+    def shutdown_transform_pool(self):
+        """Stop the transform worker processes"""
+        with self._transform_pool_lock:
+            if self._transform_pool is not None:
+                self._transform_pool.shutdown()
+                self._transform_pool = None
+    
+    def load_stored_permit_state(self, source: PermitSource) -> Dict[str, Dict[str, Any]]:
         """
-        Parse ArcGIS timestamp (milliseconds since epoch) to ISO format
+        Load objectid, geometry fingerprint and tombstone of every stored permit
+        of a source
         
         Args:
-            timestamp: Milliseconds since epoch or None
+            source: District source
         
         Returns:
-            ISO formatted datetime string or None
+            permit_number -> {'id', 'objectid', 'geometry_fingerprint', 'source_removed_at'}
         """
-        if timestamp is None:
-            return None
+        stored = {}
+        page_size = 1000
+        last_id = 0
         
-        try:
-            # ArcGIS uses milliseconds since epoch
-            dt = datetime.fromtimestamp(int(timestamp) / 1000)
-            return dt.isoformat()
-        except (ValueError, TypeError):
-            logger.warning(f"Could not parse timestamp: {timestamp}")
-            return None
+        # Keyset pagination on id (PostgREST caps each response at 1,000 rows)
+        while True:
+            rows = self.supabase.table('erp_permits')\
+                .select('id,permit_number,objectid,geometry_fingerprint,source_removed_at')\
+                .eq('data_source', source.data_source)\
+                .gt('id', last_id)\
+                .order('id')\
+                .limit(page_size)\
+                .execute().data
+            
+            for row in rows:
+                stored[row['permit_number']] = row
+            
+            if len(rows) < page_size:
+                break
+            last_id = rows[-1]['id']
+        
+        logger.info(f"Loaded state for {len(stored):,} stored {source.code} permits")
+        return stored
+    
+    def fetch_incremental(self, source: PermitSource) -> List[Dict[str, Any]]:
+        """
+        Fetch attributes for all permits, then geometry only where needed
+        
+        Geometry is requested by OBJECTID for permits that are new, whose
+        latest revision (OBJECTID) changed, or whose geometry fingerprint
+        differs from the stored one. Features that keep their stored boundary
+        are returned without geometry. Features whose geometry was needed but
+        not returned are marked `geometry_pending`.
+        
+        Args:
+            source: District source
+        
+        Returns:
+            List of raw features (geometry attached where fetched)
+        """
+        api_client = self.api_clients[source.code]
+        objectid_field = source.field('objectid')
+        permit_field = source.field('permit_number')
+        
+        features = api_client.fetch_all_permits(return_geometry=False)
+        stored = self.load_stored_permit_state(source)
+        
+        # Only the latest revision per permit is loaded (see deduplicate_permits)
+        latest: Dict[str, Dict[str, Any]] = {}
+        for feature in features:
+            attributes = feature.get('attributes', {})
+            permit_nbr = attributes.get(permit_field)
+            if not permit_nbr:
+                continue
+            permit_num = str(permit_nbr)
+            current = latest.get(permit_num)
+            if current is None or (attributes.get(objectid_field) or 0) > (current['attributes'].get(objectid_field) or 0):
+                latest[permit_num] = feature
+        
+        needs_geometry = set()
+        for permit_num, feature in latest.items():
+            attributes = feature['attributes']
+            previous = stored.get(permit_num)
+            fingerprint = geometry_fingerprint(attributes, source.fingerprint_fields)
+            
+            if (
+                previous is None
+                or previous.get('objectid') != attributes.get(objectid_field)
+                or fingerprint is None
+                or previous.get('geometry_fingerprint') != fingerprint
+            ):
+                needs_geometry.add((attributes.get(objectid_field), permit_num))
+        
+        logger.info(
+            f"{source.code}: geometry needed for {len(needs_geometry):,} of {len(latest):,} permits "
+            f"(new or changed boundary/revision)"
+        )
+        
+        object_ids = sorted({oid for oid, _ in needs_geometry if oid is not None})
+        geometries = {}
+        out_fields = f"{objectid_field},{permit_field}"
+        for geometry_feature in api_client.fetch_geometries(object_ids, out_fields=out_fields):
+            attributes = geometry_feature.get('attributes', {})
+            key = (attributes.get(objectid_field), str(attributes.get(permit_field)))
+            geometries[key] = geometry_feature.get('geometry')
+        
+        pending = 0
+        for feature in latest.values():
+            attributes = feature['attributes']
+            key = (attributes.get(objectid_field), str(attributes.get(permit_field)))
+            if key in geometries:
+                feature['geometry'] = geometries[key]
+            elif key in needs_geometry:
+                # Keeps the stored fingerprint (see upsert_permits), so the
+                # next run asks for this geometry again
+                feature['geometry_pending'] = True
+                pending += 1
+        
+        if pending:
+            logger.warning(f"{source.code}: no geometry returned for {pending:,} permits; retrying next run")
+        
+        return features
+    
+    def reconcile_deletions(
+        self,
+        source: PermitSource,
+        source_ids: Optional[List[int]] = None
+    ) -> int:
+        """
+        Tombstone stored permits whose OBJECTID is no longer served by the API
+        
+        Permits that reappear in the source have their tombstone cleared.
+        
+        Args:
+            source: District source
+            source_ids: Sorted OBJECTIDs in the source (fetched via returnIdsOnly if None)
+        
+        Returns:
+            Number of permits newly tombstoned
+        """
+        if source_ids is None:
+            source_ids = self.api_clients[source.code].get_object_ids()
+        
+        if not source_ids:
+            logger.warning(f"{source.code} API returned no object IDs, skipping deletion reconcile")
+            return 0
+        
+        stored = self.load_stored_permit_state(source)
+        stored_ids = sorted({
+            row['objectid'] for row in stored.values()
+            if row.get('objectid') is not None
+        })
+        missing = missing_from_source(stored_ids, source_ids)
+        
+        logger.info(f"{source.code} reconcile: {len(missing):,} of {len(stored_ids):,} stored permits missing from source")
+        
+        # A partial or broken API response must not tombstone half the table
+        if stored_ids and len(missing) / len(stored_ids) > RECONCILE_MAX_MISSING_FRACTION:
+            logger.warning(
+                f"Reconcile aborted: {len(missing):,} missing permits exceeds "
+                f"{RECONCILE_MAX_MISSING_FRACTION:.0%} of stored permits"
+            )
+            return 0
+        
+        if self.dry_run:
+            logger.info(f"DRY RUN: Would tombstone {len(missing):,} permits")
+            return len(missing)
+        
+        # Rows currently tombstoned but served again by the source
+        tombstoned_ids = sorted(
+            row['objectid'] for row in stored.values()
+            if row.get('source_removed_at') and row.get('objectid') is not None
+        )
+        still_missing = set(missing_from_source(tombstoned_ids, source_ids))
+        restored_ids = [oid for oid in tombstoned_ids if oid not in still_missing]
+        
+        tombstoned = 0
+        restored = 0
+        batch_size = 5000
+        for i in range(0, max(len(missing), len(restored_ids)), batch_size):
+            response = self.supabase.rpc('reconcile_source_permits', {
+                'p_missing_objectids': missing[i:i + batch_size],
+                'p_restored_objectids': restored_ids[i:i + batch_size],
+                'p_etl_run_id': str(self.etl_run_id),
+                'p_data_source': source.data_source
+            }).execute()
+            
+            result = (response.data or [{}])[0]
+            tombstoned += result.get('tombstoned_count', 0)
+            restored += result.get('restored_count', 0)
+        
+        logger.info(f"{source.code} reconcile complete: {tombstoned:,} permits tombstoned, {restored:,} restored")
+        return tombstoned
     
     def upsert_permits(self, permits: List[Dict[str, Any]]) -> int:
         """
@@ -325,18 +1082,43 @@ class PermitIQETL:
             logger.info(f"DRY RUN: Would upsert {len(permits)} permits")
             return len(permits)
         
+        # Payloads first, so every stored raw_hash resolves
+        self.store_raw_payloads(permits)
+        # A changed boundary that couldn't be fetched keeps its stored
+        # fingerprint, which still describes the stored polygon
+        permits = [
+            {
+                key: value for key, value in permit.items()
+                if key not in ('raw_data', 'geometry_pending')
+                and not (key == 'geometry_fingerprint' and permit.get('geometry_pending'))
+            }
+            for permit in permits
+        ]
+        
+        # A bulk upsert writes the union of its rows' keys and sets missing
+        # ones to NULL, so rows are batched by the columns they carry: rows
+        # without geometry keep the stored polygon/centroid, and pending rows
+        # also keep the stored fingerprint
+        with_geometry = [p for p in permits if 'geometry' in p]
+        attributes_only = [p for p in permits if 'geometry' not in p and 'geometry_fingerprint' in p]
+        without_fingerprint = [p for p in permits if 'geometry' not in p and 'geometry_fingerprint' not in p]
+        
         try:
             # Upsert in batches to avoid timeouts
             batch_size = 100
             total_processed = 0
+            batches = [
+                group[i:i + batch_size]
+                for group in (with_geometry, attributes_only, without_fingerprint)
+                for i in range(0, len(group), batch_size)
+            ]
             
-            for i in range(0, len(permits), batch_size):
-                batch = permits[i:i + batch_size]
+            for batch in batches:
                 
                 # Supabase upsert (insert or update based on unique constraint)
                 response = self.supabase.table('erp_permits').upsert(
                     batch,
-                    on_conflict='permit_number'
+                    on_conflict='data_source,permit_number'
                 ).execute()
                 
                 total_processed += len(batch)
@@ -349,92 +1131,553 @@ class PermitIQETL:
             logger.error(f"Failed to upsert permits: {e}")
             raise
     
+    def store_raw_payloads(self, permits: List[Dict[str, Any]]) -> int:
+        """
+        Write the raw payloads of permits to erp_permit_raw
+        
+        Payloads are content-addressed: a hash that is already stored (the
+        permit's attributes didn't change, or another permit has the same
+        payload) is not sent again.
+        
+        Args:
+            permits: Transformed permits with raw_data and raw_hash
+        
+        Returns:
+            Number of payloads written
+        """
+        payloads = {
+            permit['raw_hash']: permit['raw_data']
+            for permit in permits
+            if 'raw_hash' in permit and 'raw_data' in permit
+        }
+        hashes = list(payloads)
+        
+        # Hashes go in the query string; 200 x 32 characters stays well under URL limits
+        for i in range(0, len(hashes), 200):
+            rows = self.supabase.table('erp_permit_raw')\
+                .select('content_hash')\
+                .in_('content_hash', hashes[i:i + 200])\
+                .execute().data
+            for row in rows:
+                payloads.pop(row['content_hash'], None)
+        
+        missing = [
+            {'content_hash': content_hash, 'raw_data': payload}
+            for content_hash, payload in payloads.items()
+        ]
+        for i in range(0, len(missing), 500):
+            self.supabase.table('erp_permit_raw').upsert(
+                missing[i:i + 500],
+                on_conflict='content_hash',
+                ignore_duplicates=True
+            ).execute()
+        
+        logger.info(f"Stored {len(missing):,} new raw payloads ({len(hashes) - len(missing):,} already stored)")
+        return len(missing)
+    
+    def post_load_tasks(self) -> List[PostLoadTask]:
+        """
+        Post-load task graph
+        
+        Counties are backfilled first because statistics and rollups group
+        by county, but those still run if the backfill fails. Hotspot scores
+        need the day's statistics. Competitor matching runs alongside.
+        
+        Returns:
+            Tasks for PostLoadExecutor
+        """
+        def rpc(function_name: str) -> Callable[[], Any]:
+            return lambda: self.supabase.rpc(function_name).execute().data
+        
+        return [
+            PostLoadTask('backfill_counties', rpc('backfill_permit_counties')),
+            PostLoadTask('match_competitors', rpc('match_watchlist_competitors')),
+            PostLoadTask('statistics', rpc('calculate_daily_statistics'), after=('backfill_counties',)),
+            PostLoadTask('hotspots', rpc('calculate_hotspot_scores'), depends_on=('statistics',)),
+            PostLoadTask('refresh_cube', rpc('refresh_permit_cube'), after=('backfill_counties',)),
+            PostLoadTask('refresh_views', rpc('refresh_dashboard_stats'), after=('backfill_counties',)),
+        ]
+    
+    def prune_raw_payloads(self):
+        """
+        Delete raw payloads no permit references any more (a day after they
+        were superseded)
+        """
+        if self.dry_run:
+            logger.info("DRY RUN: Would prune unreferenced raw payloads")
+            return
+        
+        try:
+            deleted = self.supabase.rpc('prune_permit_raw').execute().data or 0
+            if deleted:
+                logger.info(f"Pruned {deleted:,} unreferenced raw payloads")
+        except Exception as e:
+            logger.warning(f"Raw payload pruning failed: {e}")
+    
+    def record_etl_run(
+        self,
+        status: str,
+        records_fetched: int,
+        records_updated: int,
+        duration_seconds: float,
+        error_message: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Record this run in etl_runs (admin dashboard and dashboard cache version)
+        
+        Args:
+            status: 'success', 'partial' (some sources failed) or 'failed'
+            records_fetched: Raw records fetched from the API
+            records_updated: Permits upserted
+            duration_seconds: Run duration
+            error_message: Failure reason, if any
+            metadata: Per-source counts and errors
+        """
+        if self.dry_run:
+            logger.info(f"DRY RUN: Would record ETL run as '{status}'")
+            return
+        
+        try:
+            self.supabase.table('etl_runs').insert({
+                'etl_run_id': str(self.etl_run_id),
+                'status': status,
+                'records_fetched': records_fetched,
+                'records_updated': records_updated,
+                'duration_seconds': int(duration_seconds),
+                'error_message': error_message,
+                'metadata': metadata
+            }).execute()
+        except Exception as e:
+            logger.warning(f"Failed to record ETL run: {e}")
+    
+    def maintain_partitions(self):
+        """
+        Create upcoming monthly partitions of erp_permit_changes and
+        erp_permit_history, and drop the ones past retention
+        """
+        if self.dry_run:
+            logger.info("DRY RUN: Would maintain change/history partitions")
+            return
+        
+        try:
+            rows = self.supabase.rpc('maintain_change_partitions', {
+                'p_changes_retention_months': self.change_retention_months,
+                'p_history_retention_months': self.history_retention_months
+            }).execute().data or []
+            for row in rows:
+                if row['partitions_created'] or row['partitions_dropped']:
+                    logger.info(
+                        f"{row['table_name']}: {row['partitions_created']} partitions created, "
+                        f"{row['partitions_dropped']} dropped"
+                    )
+        except Exception as e:
+            # Inserts still land in the default partition
+            logger.warning(f"Partition maintenance failed: {e}")
+    
+    def run_reconcile(self):
+        """
+        Detect permits removed from the sources without downloading any records
+        (PERMITIQ_FETCH_MODE=reconcile)
+        """
+        logger.info("=" * 80)
+        logger.info("PERMITIQ RECONCILE STARTED")
+        logger.info("=" * 80)
+        
+        start_time = datetime.now()
+        self.maintain_partitions()
+        self.prune_raw_payloads()
+        tombstoned = sum(self.reconcile_deletions(source) for source in self.sources)
+        duration = (datetime.now() - start_time).total_seconds()
+        
+        logger.info("=" * 80)
+        logger.info("RECONCILE COMPLETED SUCCESSFULLY")
+        logger.info(f"Duration: {duration:.1f} seconds")
+        logger.info(f"Permits tombstoned: {tombstoned:,}")
+        logger.info("=" * 80)
+    
+    def load_history_heads(self, source: PermitSource) -> Dict[str, Dict[str, Any]]:
+        """
+        Load the latest history revision of every permit of a source
+        
+        Args:
+            source: District source
+        
+        Returns:
+            permit_number -> {'objectid', 'revision_number', 'state_hash'}
+        """
+        heads = {}
+        page_size = 1000
+        last_permit = ''
+        
+        # Keyset pagination on permit_number (PostgREST caps each response at 1,000 rows)
+        while True:
+            rows = self.supabase.rpc('get_permit_history_heads', {
+                'p_data_source': source.data_source,
+                'p_after_permit_number': last_permit,
+                'p_limit': page_size
+            }).execute().data or []
+            
+            for row in rows:
+                heads[row['permit_number']] = row
+            
+            if len(rows) < page_size:
+                break
+            last_permit = rows[-1]['permit_number']
+        
+        logger.info(f"Loaded history heads for {len(heads):,} {source.code} permits")
+        return heads
+    
+    def select_history_revisions(
+        self,
+        source: PermitSource,
+        permits: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Pick the revisions not yet in erp_permit_history
+        
+        All revisions of a permit (one per objectid) are compared with the
+        permit's latest history row: older objectids are already behind it,
+        newer ones are appended, and the latest objectid is appended again
+        when its attributes changed.
+        
+        The polygon is sent only with revisions that will be keyframes and
+        revisions whose geometry fingerprint changed; the others are rebuilt
+        from the nearest stored polygon.
+        
+        Args:
+            source: District source
+            permits: Transformed permits of one source, before deduplication
+        
+        Returns:
+            Revisions for append_permit_history(), ordered by permit and objectid
+        """
+        heads = self.load_history_heads(source)
+        
+        by_permit: Dict[str, List[Dict[str, Any]]] = {}
+        for permit in permits:
+            permit_num = permit.get('permit_number')
+            if permit_num:
+                by_permit.setdefault(permit_num, []).append(permit)
+        
+        revisions = []
+        for permit_num in sorted(by_permit):
+            head = heads.get(permit_num) or {}
+            last_objectid = head.get('objectid')
+            last_hash = head.get('state_hash')
+            last_fingerprint = head.get('geometry_fingerprint')
+            revision_number = head.get('revision_number') or 0
+            
+            for permit in sorted(by_permit[permit_num], key=lambda p: p.get('objectid') or 0):
+                objectid = permit.get('objectid')
+                if last_objectid is not None and (objectid or 0) < last_objectid:
+                    continue
+                
+                state, state_hash = history_state(permit)
+                if state_hash == last_hash:
+                    continue
+                
+                # Numbered as append_permit_history() will number it
+                revision_number += 1
+                keyframe = (revision_number - 1) % max(self.history_keyframe_interval, 1) == 0
+                fingerprint = state['geometry_fingerprint']
+                
+                revisions.append({
+                    'data_source': source.data_source,
+                    'permit_number': permit_num,
+                    'objectid': objectid,
+                    'state_hash': state_hash,
+                    'state': state,
+                    'geometry': permit.get('geometry') if keyframe or fingerprint != last_fingerprint else None
+                })
+                last_objectid = objectid
+                last_hash = state_hash
+                last_fingerprint = fingerprint
+        
+        logger.info(
+            f"{source.code}: {len(revisions):,} new or changed revisions across "
+            f"{len(by_permit):,} permits for history"
+        )
+        return revisions
+    
+    def append_history(self, revisions: List[Dict[str, Any]]) -> int:
+        """
+        Append revisions to erp_permit_history as deltas (computed server-side)
+        
+        Args:
+            revisions: Output of select_history_revisions
+        
+        Returns:
+            Number of history rows appended
+        """
+        if self.dry_run:
+            logger.info(f"DRY RUN: Would append {len(revisions):,} history revisions")
+            return len(revisions)
+        
+        # Batches split on order only; a permit's revisions may straddle two
+        # batches because each batch deltas against what is already stored
+        batch_size = 500
+        appended = 0
+        for i in range(0, len(revisions), batch_size):
+            response = self.supabase.rpc('append_permit_history', {
+                'p_revisions': revisions[i:i + batch_size],
+                'p_keyframe_interval': self.history_keyframe_interval
+            }).execute()
+            appended += response.data or 0
+        
+        logger.info(f"Appended {appended:,} history revisions")
+        return appended
+    
+    def deduplicate_permits(self, permits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Keep the latest revision (highest objectid) of each permit_number
+        
+        Args:
+            permits: Transformed permits of one source
+        
+        Returns:
+            One permit per permit_number
+        """
+        seen_permits = {}
+        for permit in permits:
+            permit_num = permit.get('permit_number')
+            if permit_num:
+                # Keep the one with higher objectid (more recent)
+                if permit_num not in seen_permits or permit.get('objectid', 0) > seen_permits[permit_num].get('objectid', 0):
+                    seen_permits[permit_num] = permit
+        
+        return list(seen_permits.values())
+    
+    def run_source_pipeline(
+        self,
+        source: PermitSource
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Fetch and transform one source (runs concurrently with other sources)
+        
+        Args:
+            source: District source
+        
+        Returns:
+            (raw features, deduplicated transformed permits, history revisions)
+        """
+        # Step 1: Fetch data from API
+        logger.info(f"Step 1: Fetching data from {source.name} ({source.code}) API")
+        if self.fetch_mode == 'incremental':
+            with self.profiler.stage(f"{source.code}.fetch"):
+                raw_permits = self.fetch_incremental(source)
+            logger.info(f"{source.code}: fetched {len(raw_permits):,} raw permit records")
+            
+            # Step 2: Transform data
+            logger.info(f"Step 2: Transforming {source.code} permit data")
+            with self.profiler.stage(f"{source.code}.transform"):
+                transformed_permits = self.transform_permits(raw_permits, source)
+        else:
+            # Step 2 (transform) runs page by page behind the fetch
+            with self.profiler.stage(f"{source.code}.fetch"):
+                raw_permits, transformed_permits = self.fetch_and_transform(source)
+            logger.info(f"{source.code}: fetched and transformed {len(raw_permits):,} raw permit records")
+        
+        # Superseded and changed revisions go to erp_permit_history before
+        # deduplication discards them
+        history_revisions = []
+        try:
+            with self.profiler.stage(f"{source.code}.history"):
+                history_revisions = self.select_history_revisions(source, transformed_permits)
+        except Exception as e:
+            logger.warning(f"{source.code}: revision history capture skipped: {e}")
+        
+        # Deduplicate by permit_number (keep latest revision based on objectid)
+        with self.profiler.stage(f"{source.code}.dedup"):
+            transformed_permits = self.deduplicate_permits(transformed_permits)
+        logger.info(f"{source.code}: {len(transformed_permits):,} unique permits after deduplication")
+        
+        return raw_permits, transformed_permits, history_revisions
+    
     def run(self):
         """
         Execute the full ETL pipeline
+        
+        Each source is fetched and transformed in its own pipeline; finished
+        sources are handed to the shared loader as they complete, so a run
+        takes about as long as the slowest district.
         """
+        if self.fetch_mode == 'reconcile':
+            return self.run_reconcile()
+        
         logger.info("=" * 80)
         logger.info("PERMITIQ ETL PIPELINE STARTED")
         logger.info("=" * 80)
         
         start_time = datetime.now()
+        records_fetched = 0
+        processed_count = 0
+        source_results: Dict[str, Dict[str, Any]] = {}
+        
+        # Partitions for this month's changes must exist before the load
+        self.maintain_partitions()
+        self.prune_raw_payloads()
         
         try:
-            # Step 1: Fetch data from API
-            logger.info("Step 1: Fetching data from SWFWMD API")
-            raw_permits = self.api_client.fetch_all_permits()
-            logger.info(f"Fetched {len(raw_permits):,} raw permit records")
-            
-            # Step 2: Transform data
-            logger.info("Step 2: Transforming permit data")
-            transformed_permits = [
-                self.transform_permit(feature) 
-                for feature in raw_permits
-            ]
-            logger.info(f"Transformed {len(transformed_permits):,} permits")
+            with ThreadPoolExecutor(max_workers=len(self.sources)) as executor:
+                futures = {
+                    executor.submit(self.run_source_pipeline, source): source
+                    for source in self.sources
+                }
+                
+                for future in as_completed(futures):
+                    source = futures[future]
+                    try:
+                        raw_permits, transformed_permits, history_revisions = future.result()
+                    except Exception as e:
+                        # One district failing must not block the others
+                        logger.error(f"{source.code} pipeline failed: {e}")
+                        source_results[source.code] = {'status': 'failed', 'error': str(e)}
+                        continue
+                    
+                    # Step 3: Load into database (shared loader, one source at a time)
+                    logger.info(f"Step 3: Loading {source.code} data into Supabase")
+                    with self.profiler.stage(f"{source.code}.load"):
+                        loaded = self.upsert_permits(transformed_permits)
+                    
+                    # History rows link to the permit rows, so they follow the upsert
+                    history_appended = 0
+                    if history_revisions:
+                        logger.info(f"Step 3a: Appending {source.code} revision history")
+                        try:
+                            with self.profiler.stage(f"{source.code}.history_load"):
+                                history_appended = self.append_history(history_revisions)
+                        except Exception as e:
+                            logger.warning(f"{source.code} revision history append failed: {e}")
+                    
+                    # Tombstone permits that disappeared from the source; the fetched
+                    # pages already hold the full ID set, so no extra request is needed
+                    logger.info(f"Step 3b: Reconciling removed {source.code} permits")
+                    objectid_field = source.field('objectid')
+                    source_ids = sorted({
+                        feature['attributes'][objectid_field]
+                        for feature in raw_permits
+                        if feature.get('attributes', {}).get(objectid_field) is not None
+                    })
+                    with self.profiler.stage(f"{source.code}.reconcile"):
+                        tombstoned = self.reconcile_deletions(source, source_ids)
+                    
+                    records_fetched += len(raw_permits)
+                    processed_count += loaded
+                    source_results[source.code] = {
+                        'status': 'success',
+                        'records_fetched': len(raw_permits),
+                        'records_updated': loaded,
+                        'history_revisions': history_appended,
+                        'tombstoned': tombstoned
+                    }
             
-            # Deduplicate by permit_number (keep latest revision based on objectid)
-            seen_permits = {}
-            for permit in transformed_permits:
-                permit_num = permit.get('permit_number')
-                if permit_num:
-                    # Keep the one with higher objectid (more recent)
-                    if permit_num not in seen_permits or permit.get('objectid', 0) > seen_permits[permit_num].get('objectid', 0):
-                        seen_permits[permit_num] = permit
+            failed_sources = [code for code, result in source_results.items() if result['status'] == 'failed']
+            if len(failed_sources) == len(self.sources):
+                raise RuntimeError(f"All source pipelines failed: {', '.join(failed_sources)}")
             
-            transformed_permits = list(seen_permits.values())
-            logger.info(f"After deduplication: {len(transformed_permits):,} unique permits")
+            # Step 4: Statistics, dashboard rollups and competitor matching,
+            # run as a dependency graph (see post_load_tasks)
+            post_load_results: Dict[str, Dict[str, Any]] = {}
+            if not self.dry_run:
+                logger.info("Step 4: Running post-load tasks")
+                with self.profiler.stage('post_load'):
+                    post_load_results = PostLoadExecutor(
+                        self.post_load_tasks(),
+                        profiler=self.profiler
+                    ).run()
             
-            # Step 3: Load into database
-            logger.info("Step 3: Loading data into Supabase")
-            processed_count = self.upsert_permits(transformed_permits)
+            # Step 5: Record the run and roll the dashboard cache over to it
+            duration = (datetime.now() - start_time).total_seconds()
+            error_message = None
+            if failed_sources:
+                error_message = '; '.join(
+                    f"{code}: {source_results[code]['error']}" for code in failed_sources
+                )
+            self.record_etl_run(
+                'partial' if failed_sources else 'success',
+                records_fetched,
+                processed_count,
+                duration,
+                error_message,
+                metadata={'sources': source_results, 'post_load': post_load_results}
+            )
             
-            # Step 4: Calculate statistics (if not dry run)
             if not self.dry_run:
-                logger.info("Step 4: Calculating daily statistics")
-                # Note: This requires the database functions to be installed
+                logger.info("Step 5: Invalidating and pre-warming dashboard cache")
                 try:
-                    self.supabase.rpc('calculate_daily_statistics').execute()
-                    self.supabase.rpc('calculate_hotspot_scores').execute()
-                    logger.info("Statistics calculated successfully")
+                    with self.profiler.stage('dashboard_cache'):
+                        dashboard_cache = DashboardCache(self.supabase)
+                        dashboard_cache.invalidate()
+                        dashboard_cache.prewarm()
                 except Exception as e:
-                    logger.warning(f"Statistics calculation failed: {e}")
+                    logger.warning(f"Dashboard cache refresh failed: {e}")
                 
-                # Step 5: Refresh dashboard materialized views
-                logger.info("Step 5: Refreshing dashboard materialized views")
+                # Step 6: Publish static dashboard payloads for the CDN
+                logger.info("Step 6: Publishing static dashboard payloads")
                 try:
-                    self.supabase.rpc('refresh_dashboard_stats').execute()
-                    logger.info("Dashboard materialized views refreshed successfully")
+                    with self.profiler.stage('dashboard_publish'):
+                        DashboardPublisher(self.supabase).publish(str(self.etl_run_id))
                 except Exception as e:
-                    logger.warning(f"Dashboard materialized view refresh failed: {e}")
-                    logger.warning("Dashboard stats may show stale data until views are manually refreshed")
+                    logger.warning(f"Dashboard payload publish failed: {e}")
+                    logger.warning("Dashboard will fall back to live RPCs until the next run")
             
             # Summary
-            duration = (datetime.now() - start_time).total_seconds()
             logger.info("=" * 80)
-            logger.info("ETL PIPELINE COMPLETED SUCCESSFULLY")
+            if failed_sources:
+                logger.warning(f"ETL PIPELINE COMPLETED WITH FAILED SOURCES: {', '.join(failed_sources)}")
+            else:
+                logger.info("ETL PIPELINE COMPLETED SUCCESSFULLY")
             logger.info(f"Duration: {duration:.1f} seconds")
             logger.info(f"Records processed: {processed_count:,}")
+            for code, result in sorted(source_results.items()):
+                logger.info(f"  {code}: {result['status']} ({result.get('records_updated', 0):,} permits)")
             logger.info(f"ETL Run ID: {self.etl_run_id}")
             logger.info("=" * 80)
             
         except Exception as e:
+            duration = (datetime.now() - start_time).total_seconds()
+            self.record_etl_run(
+                'failed',
+                records_fetched,
+                processed_count,
+                duration,
+                str(e),
+                metadata={'sources': source_results}
+            )
+            
             logger.error("=" * 80)
             logger.error("ETL PIPELINE FAILED")
             logger.error(f"Error: {e}")
             logger.error("=" * 80)
             raise
+        finally:
+            self.shutdown_transform_pool()
+        
+        if failed_sources:
+            # Loaded sources are kept; fail the job so the workflow opens an issue
+            raise PartialRunError(f"Source pipelines failed: {error_message}")
 
 
-def main():
+def main(argv: Optional[List[str]] = None):
     """
     Main entry point for ETL script
+    
+    Args:
+        argv: Command-line arguments (defaults to sys.argv[1:])
     """
+    parser = argparse.ArgumentParser(description='PermitIQ ERP permit ETL')
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Profile each stage and write flamegraph/allocation reports next to etl.log'
+    )
+    args = parser.parse_args(argv)
+    
     # Validate environment variables
     required_env_vars = [
         'PERMITIQ_SUPABASE_URL',
-        'PERMITIQ_SUPABASE_SERVICE_KEY',
-        'PERMITIQ_SWFWMD_API_URL'
+        'PERMITIQ_SUPABASE_SERVICE_KEY'
     ]
     
     missing_vars = [var for var in required_env_vars if not os.getenv(var)]
@@ -444,14 +1687,31 @@ def main():
         logger.error("Please create a .env file based on .env.example")
         sys.exit(1)
     
+    sources = enabled_sources()
+    if not sources:
+        logger.error("No permit sources configured (set PERMITIQ_SWFWMD_API_URL or another district's URL)")
+        sys.exit(1)
+    
+    profiler = StageProfiler(
+        enabled=args.profile or os.getenv('PERMITIQ_PROFILE', 'false').lower() == 'true'
+    )
+    
     # Initialize and run ETL
     etl = PermitIQETL(
         supabase_url=os.getenv('PERMITIQ_SUPABASE_URL'),
         supabase_key=os.getenv('PERMITIQ_SUPABASE_SERVICE_KEY'),
-        api_url=os.getenv('PERMITIQ_SWFWMD_API_URL')
+        sources=sources,
+        profiler=profiler
     )
     
-    etl.run()
+    try:
+        etl.run()
+    except PartialRunError as e:
+        logger.error(f"{e}; exiting with status {PARTIAL_RUN_EXIT_CODE}")
+        sys.exit(PARTIAL_RUN_EXIT_CODE)
+    finally:
+        # Failed runs are often the ones worth profiling
+        profiler.write_reports()
 
 
 if __name__ == '__main__':
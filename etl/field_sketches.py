@@ -0,0 +1,325 @@
+"""
+PermitIQ - Streaming Field Sketches
+Bounded-memory summaries used by discover_fields.py to profile every record
+of a district layer in one pass
+
+- HyperLogLog: distinct-count estimate (~1.6% error at the default precision)
+- Reservoir: uniform sample of values
+- QuantileSketch: KLL quantile sketch for numeric and date fields
+- FieldProfile: per-field type histogram, null rate, min/max and the above
+- GeometryProfile: ring/vertex counts, extent and sample centroids
+
+Every sketch has a fixed size independent of the number of records added.
+"""
+
+import math
+import random
+import hashlib
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from geometry import ring_centroid
+
+# ArcGIS field type of epoch-millisecond date fields
+ESRI_DATE_TYPE = 'esriFieldTypeDate'
+
+# Quantiles reported for numeric and date fields
+REPORT_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+class HyperLogLog:
+    """
+    Distinct-count estimator in 2^precision bytes
+    """
+
+    def __init__(self, precision: int = 12):
+        """
+        Initialize the sketch
+
+        Args:
+            precision: Register index bits (12 = 4,096 registers, ~1.6% error)
+        """
+        self.precision = precision
+        self.num_registers = 1 << precision
+        self.registers = bytearray(self.num_registers)
+        self._alpha = 0.7213 / (1 + 1.079 / self.num_registers)
+
+    def add(self, value: Any) -> None:
+        """Add a value (hashed by its repr, so 1 and '1' are distinct)"""
+        digest = hashlib.blake2b(repr(value).encode('utf-8'), digest_size=8).digest()
+        h = int.from_bytes(digest, 'big')
+        index = h >> (64 - self.precision)
+        remainder = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> int:
+        """Estimated number of distinct values added"""
+        m = self.num_registers
+        estimate = self._alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        # Small-range correction (linear counting)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class Reservoir:
+    """
+    Uniform random sample of a stream (Algorithm R)
+    """
+
+    def __init__(self, size: int = 10, seed: Optional[int] = 0):
+        self.size = size
+        self.seen = 0
+        self.items: List[Any] = []
+        self._random = random.Random(seed)
+
+    def add(self, value: Any) -> None:
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(value)
+        else:
+            slot = self._random.randrange(self.seen)
+            if slot < self.size:
+                self.items[slot] = value
+
+
+class QuantileSketch:
+    """
+    KLL quantile sketch
+
+    Keeps a hierarchy of compactors; a full compactor sorts its items and
+    promotes every other one to the next level with doubled weight. Rank
+    error is about 1.7% at k=200, with O(k) items stored.
+    """
+
+    def __init__(self, k: int = 200, seed: Optional[int] = 0):
+        self.k = k
+        self.count = 0
+        self.compactors: List[List[float]] = [[]]
+        self._size = 0
+        self._max_size = 0
+        self._random = random.Random(seed)
+        self._update_max_size()
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _update_max_size(self) -> None:
+        self._max_size = sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def add(self, value: float) -> None:
+        self.compactors[0].append(value)
+        self._size += 1
+        self.count += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def _compress(self) -> None:
+        for level in range(len(self.compactors)):
+            if len(self.compactors[level]) >= self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append([])
+                    self._update_max_size()
+                items = sorted(self.compactors[level])
+                # Odd leftover stays at this level
+                keep = [items.pop()] if len(items) % 2 else []
+                offset = self._random.randint(0, 1)
+                self.compactors[level + 1].extend(items[offset::2])
+                self.compactors[level] = keep
+                self._size = sum(len(c) for c in self.compactors)
+                if self._size < self._max_size:
+                    break
+
+    def quantiles(self, qs=REPORT_QUANTILES) -> Dict[str, float]:
+        """
+        Estimate quantiles
+
+        Args:
+            qs: Quantiles in [0, 1]
+
+        Returns:
+            {'p50': value, ...} (empty if nothing was added)
+        """
+        weighted = sorted(
+            (value, 1 << level)
+            for level, compactor in enumerate(self.compactors)
+            for value in compactor
+        )
+        if not weighted:
+            return {}
+
+        total = sum(weight for _, weight in weighted)
+        result = {}
+        for q in qs:
+            target = q * total
+            cumulative = 0
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    break
+            result[f"p{round(q * 100):d}"] = value
+        return result
+
+
+def _format_date(milliseconds: Optional[float]) -> Optional[str]:
+    """ArcGIS epoch milliseconds -> ISO 8601 (UTC)"""
+    if milliseconds is None:
+        return None
+    try:
+        return datetime.fromtimestamp(milliseconds / 1000, tz=timezone.utc).isoformat()
+    except (OverflowError, OSError, ValueError):
+        return str(milliseconds)
+
+
+class FieldProfile:
+    """
+    Streaming profile of one attribute field
+    """
+
+    def __init__(self, name: str, esri_type: Optional[str] = None, sample_size: int = 10):
+        """
+        Initialize the profile
+
+        Args:
+            name: Field name
+            esri_type: ArcGIS field type from the layer metadata, if known
+            sample_size: Sample values kept
+        """
+        self.name = name
+        self.esri_type = esri_type
+        self.count = 0
+        self.nulls = 0
+        self.types: Counter = Counter()
+        self.distinct = HyperLogLog()
+        self.samples = Reservoir(sample_size)
+        self.quantiles = QuantileSketch()
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.min_length: Optional[int] = None
+        self.max_length: Optional[int] = None
+
+    @property
+    def is_date(self) -> bool:
+        return self.esri_type == ESRI_DATE_TYPE
+
+    def add(self, value: Any) -> None:
+        """Add one record's value"""
+        self.count += 1
+        self.types[type(value).__name__] += 1
+
+        if value is None or value == '':
+            self.nulls += 1
+            return
+
+        self.distinct.add(value)
+        self.samples.add(value)
+
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            self.quantiles.add(value)
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+        elif isinstance(value, str):
+            length = len(value)
+            if self.min_length is None or length < self.min_length:
+                self.min_length = length
+            if self.max_length is None or length > self.max_length:
+                self.max_length = length
+
+    def to_dict(self, total_records: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Report entry for this field
+
+        Args:
+            total_records: Records profiled overall; records that lacked the
+                field count as null
+        """
+        total = max(total_records or 0, self.count)
+        nulls = self.nulls + (total - self.count)
+        non_null_types = Counter({t: n for t, n in self.types.items() if t != 'NoneType'})
+        primary = non_null_types or self.types
+        entry: Dict[str, Any] = {
+            'data_types': dict(self.types),
+            'primary_type': primary.most_common(1)[0][0] if primary else 'unknown',
+            'esri_type': self.esri_type,
+            'records': total,
+            'missing_count': total - self.count,
+            'null_count': nulls,
+            'null_rate': round(nulls / total, 4) if total else 0.0,
+            'distinct_estimate': self.distinct.count(),
+            'sample_values': [_format_date(v) for v in self.samples.items] if self.is_date else self.samples.items,
+        }
+
+        if self.min is not None:
+            quantiles = self.quantiles.quantiles()
+            if self.is_date:
+                entry['min'] = _format_date(self.min)
+                entry['max'] = _format_date(self.max)
+                entry['quantiles'] = {q: _format_date(v) for q, v in quantiles.items()}
+            else:
+                entry['min'] = self.min
+                entry['max'] = self.max
+                entry['quantiles'] = quantiles
+        if self.min_length is not None:
+            entry['length'] = {'min': self.min_length, 'max': self.max_length}
+        return entry
+
+
+class GeometryProfile:
+    """
+    Streaming profile of feature geometries
+    """
+
+    def __init__(self, sample_size: int = 3):
+        self.has_geometry = 0
+        self.missing_geometry = 0
+        self.geometry_types: Counter = Counter()
+        self.rings = QuantileSketch()
+        self.vertices = QuantileSketch()
+        self.extent: Optional[List[float]] = None
+        self.centroids = Reservoir(sample_size)
+
+    def add(self, geometry: Optional[Dict[str, Any]]) -> None:
+        if not geometry or not geometry.get('rings'):
+            self.missing_geometry += 1
+            return
+
+        rings = geometry['rings']
+        self.has_geometry += 1
+        self.geometry_types['polygon'] += 1
+        self.rings.add(len(rings))
+        self.vertices.add(sum(len(ring) for ring in rings))
+
+        first_ring = rings[0]
+        if not first_ring:
+            return
+        xs = [coord[0] for coord in first_ring]
+        ys = [coord[1] for coord in first_ring]
+        longitude, latitude = ring_centroid(first_ring)
+        if self.extent is None:
+            self.extent = [min(xs), min(ys), max(xs), max(ys)]
+        else:
+            self.extent = [
+                min(self.extent[0], min(xs)),
+                min(self.extent[1], min(ys)),
+                max(self.extent[2], max(xs)),
+                max(self.extent[3], max(ys)),
+            ]
+        self.centroids.add({'longitude': longitude, 'latitude': latitude})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'has_geometry': self.has_geometry,
+            'missing_geometry': self.missing_geometry,
+            'geometry_type': self.geometry_types.most_common(1)[0][0] if self.geometry_types else None,
+            'rings_per_feature': self.rings.quantiles((0.5, 0.95, 0.99)),
+            'vertices_per_feature': self.vertices.quantiles((0.5, 0.95, 0.99)),
+            'extent': self.extent,
+            'sample_centroids': self.centroids.items,
+        }
@@ -0,0 +1,145 @@
+"""
+PermitIQ - ArcGIS Polygon Helpers
+Ring handling shared by the ETL transform (fetch_permits.py) and the layer
+profiler (field_sketches.py)
+
+ArcGIS polygons arrive as {'rings': [[[x, y], ...], ...]} in WGS84. Ring
+orientation says what a ring is: clockwise rings are outer boundaries,
+counter-clockwise rings are holes. A multipart permit has several clockwise
+rings.
+
+repair_polygons() fixes what is cheap to fix per feature before the rings are
+sent to PostGIS (unclosed rings, repeated vertices, degenerate rings) and
+groups them into polygons: each outer ring with the holes that follow it. The
+ETL stores them as a MULTIPOLYGON. Self-intersections and holes outside their
+shell are made valid by the database on write (ST_MakeValid, migration 018),
+which also keeps the bounding-box columns.
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+Ring = Sequence[Sequence[float]]
+
+# A closed ring needs 3 distinct vertices plus the closing one
+MIN_RING_POSITIONS = 4
+
+
+def polygons_to_wkt(polygons: List[List[Ring]]) -> Optional[str]:
+    """
+    Build a WKT MULTIPOLYGON from polygons
+
+    Args:
+        polygons: Polygons as [outer ring, *holes] (see repair_polygons)
+
+    Returns:
+        MULTIPOLYGON(((x1 y1, ..., x1 y1), ...), ...) or None if there are no polygons
+    """
+    if not polygons:
+        return None
+    polygon_strs = []
+    for rings in polygons:
+        ring_strs = []
+        for ring in rings:
+            coords = [f"{lon} {lat}" for lon, lat in ring]
+            ring_strs.append(f"({', '.join(coords)})")
+        polygon_strs.append(f"({', '.join(ring_strs)})")
+    return f"MULTIPOLYGON({', '.join(polygon_strs)})"
+
+
+def ring_centroid(ring: Ring) -> Optional[Tuple[float, float]]:
+    """
+    Centroid of a ring as the average of its vertices
+
+    Not the area centroid: good enough for map markers and point queries on
+    permit parcels, and cheap for rings with thousands of vertices.
+
+    Args:
+        ring: Ring coordinates (usually the outer ring)
+
+    Returns:
+        (longitude, latitude) or None for an empty ring
+    """
+    if not ring:
+        return None
+    avg_lon = sum(coord[0] for coord in ring) / len(ring)
+    avg_lat = sum(coord[1] for coord in ring) / len(ring)
+    return avg_lon, avg_lat
+
+
+def ring_signed_area(ring: Ring) -> float:
+    """
+    Shoelace area of a closed ring in squared degrees
+
+    Args:
+        ring: Closed ring
+
+    Returns:
+        Positive for counter-clockwise rings, negative for clockwise
+    """
+    area = sum(
+        x0 * y1 - x1 * y0
+        for (x0, y0), (x1, y1) in zip(ring, ring[1:])
+    )
+    return area / 2
+
+
+def repair_ring(ring: Ring) -> Optional[List[List[float]]]:
+    """
+    Drop repeated vertices and close the ring
+
+    Args:
+        ring: Ring coordinates ([x, y] pairs; vertices are not copied)
+
+    Returns:
+        Closed ring, or None if fewer than 3 distinct vertices remain
+    """
+    cleaned: List[List[float]] = []
+    previous = None
+    for point in ring:
+        if point != previous:
+            cleaned.append(point)
+            previous = point
+    if cleaned and cleaned[0] != cleaned[-1]:
+        cleaned.append(cleaned[0])
+    if len(cleaned) < MIN_RING_POSITIONS:
+        return None
+    return cleaned
+
+
+def repair_polygons(rings: List[Ring]) -> List[List[List[List[float]]]]:
+    """
+    Structural repair of ArcGIS polygon rings, grouped into polygons
+
+    - Closes unclosed rings and drops repeated consecutive vertices
+    - Drops rings with fewer than 3 distinct vertices or no area
+    - Clockwise rings start a new polygon; counter-clockwise rings are holes
+      of the preceding one (a hole before any outer ring is taken as an
+      outer ring, as some layers don't follow the convention)
+    - Orients outer rings counter-clockwise and holes clockwise (OGC /
+      RFC 7946); ArcGIS uses the opposite convention
+
+    Args:
+        rings: ArcGIS polygon rings
+
+    Returns:
+        Polygons as [outer ring, *holes] in source order (empty if no ring
+        is usable)
+    """
+    polygons: List[List[List[List[float]]]] = []
+    for ring in rings or []:
+        fixed = repair_ring(ring)
+        if fixed is None:
+            continue
+        area = ring_signed_area(fixed)
+        if area == 0:
+            continue
+        if area < 0 or not polygons:
+            # Outer ring: counter-clockwise
+            if area < 0:
+                fixed.reverse()
+            polygons.append([fixed])
+        else:
+            # Hole: clockwise
+            fixed.reverse()
+            polygons[-1].append(fixed)
+    return polygons
@@ -0,0 +1,260 @@
+"""
+PermitIQ - Post-Load Task Graph
+Runs the database work that follows a load (county backfill, statistics,
+hotspot scores, dashboard rollups, competitor matching) as a dependency graph
+
+Each task declares what it waits for: `depends_on` tasks must succeed (the
+task is skipped otherwise), `after` tasks only have to finish, so a failed
+county backfill still lets statistics run on the counties already known.
+Ready tasks run concurrently on a thread pool, each with a timeout and
+retries, so the time from load to fresh data is the critical path of the
+graph instead of the sum of every step.
+
+A task that exceeds its timeout, counted from when a worker starts it, is
+reported as 'timeout' and its dependents are skipped. Its RPC can't be cancelled from the client and may still finish
+on the server, and its worker stays busy until it does.
+"""
+
+import os
+import time
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from profiling import StageProfiler
+
+logger = logging.getLogger(__name__)
+
+# Seconds between attempts of a failed task, doubled on each retry
+RETRY_DELAY = 5.0
+
+# Longest wait for a result while a submitted task hasn't started yet
+START_POLL_INTERVAL = 1.0
+
+
+class PostLoadTask:
+    """
+    One post-load step and the steps it waits for
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[], Any],
+        depends_on: Sequence[str] = (),
+        after: Sequence[str] = (),
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None
+    ):
+        """
+        Initialize the task
+
+        Args:
+            name: Task name (logs, profiler stage, run metadata)
+            run: Does the work; the return value is logged and recorded
+            depends_on: Tasks that must succeed first (skipped otherwise)
+            after: Tasks that must finish first, successfully or not
+            timeout: Seconds for all attempts (default: the executor's)
+            retries: Extra attempts after a failure (default: the executor's)
+        """
+        self.name = name
+        self.run = run
+        self.depends_on = tuple(depends_on)
+        self.after = tuple(after)
+        self.timeout = timeout
+        self.retries = retries
+
+    @property
+    def waits_for(self) -> Tuple[str, ...]:
+        return self.depends_on + self.after
+
+
+class PostLoadExecutor:
+    """
+    Runs a graph of PostLoadTasks, independent tasks concurrently
+    """
+
+    def __init__(
+        self,
+        tasks: List[PostLoadTask],
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+        profiler: Optional[StageProfiler] = None
+    ):
+        """
+        Initialize the executor
+
+        Args:
+            tasks: Tasks of the graph
+            max_workers: Tasks run at once (default: PERMITIQ_POST_LOAD_WORKERS, 4)
+            timeout: Default seconds per task (default: PERMITIQ_POST_LOAD_TIMEOUT, 900)
+            retries: Default retries per task (default: PERMITIQ_POST_LOAD_RETRIES, 1)
+            profiler: Stage profiler (disabled if None)
+
+        Raises:
+            ValueError: If a task waits for an unknown task or the graph has a cycle
+        """
+        self.tasks = {task.name: task for task in tasks}
+        self.max_workers = max_workers or int(os.getenv('PERMITIQ_POST_LOAD_WORKERS', '4'))
+        self.timeout = timeout or float(os.getenv('PERMITIQ_POST_LOAD_TIMEOUT', '900'))
+        self.retries = retries if retries is not None else int(os.getenv('PERMITIQ_POST_LOAD_RETRIES', '1'))
+        self.profiler = profiler or StageProfiler(enabled=False)
+        # Task name -> monotonic time a worker started it (set by _attempt)
+        self._started: Dict[str, float] = {}
+        self._validate()
+
+    def _validate(self):
+        for task in self.tasks.values():
+            unknown = [name for name in task.waits_for if name not in self.tasks]
+            if unknown:
+                raise ValueError(f"Post-load task {task.name} waits for unknown tasks: {', '.join(unknown)}")
+
+        # Kahn's algorithm: every task must become ready eventually
+        remaining = {name: set(task.waits_for) for name, task in self.tasks.items()}
+        while remaining:
+            ready = [name for name, waits in remaining.items() if not waits]
+            if not ready:
+                raise ValueError(f"Post-load tasks form a cycle: {', '.join(sorted(remaining))}")
+            for name in ready:
+                del remaining[name]
+            for waits in remaining.values():
+                waits.difference_update(ready)
+
+    def run(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Run every task once its dependencies allow it
+
+        Returns:
+            Task name -> {'status': 'success'|'failed'|'timeout'|'skipped',
+            'duration_seconds', 'attempts', 'result' or 'error'}, in
+            completion order
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        pending = dict(self.tasks)
+        running: Dict[Future, PostLoadTask] = {}
+        started = time.monotonic()
+        self._started = {}
+
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='post-load')
+        try:
+            while pending or running:
+                self._start_ready(pool, pending, running, results)
+                if not running:
+                    continue
+
+                # A task's clock starts in its worker, so queued tasks get
+                # their full timeout. Poll while a submitted task may be
+                # starting; a queued one starts only once a result ends the wait
+                deadlines = self._deadlines(running)
+                timeout = min(deadlines.values()) - time.monotonic() if deadlines else None
+                if len(deadlines) < len(running):
+                    timeout = min(timeout, START_POLL_INTERVAL) if timeout is not None else START_POLL_INTERVAL
+                done, _ = wait(running, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    task = running.pop(future)
+                    results[task.name] = future.result()
+                    self._log_result(task.name, results[task.name])
+
+                now = time.monotonic()
+                for future, deadline in self._deadlines(running).items():
+                    if now >= deadline:
+                        task = running[future]
+                        del running[future]
+                        results[task.name] = {
+                            'status': 'timeout',
+                            'duration_seconds': round(self._timeout(task), 1),
+                            'error': f"no result after {self._timeout(task):g}s",
+                        }
+                        self._log_result(task.name, results[task.name])
+        finally:
+            # Timed-out tasks can't be interrupted; don't wait for them
+            pool.shutdown(wait=False)
+
+        elapsed = time.monotonic() - started
+        total = sum(result.get('duration_seconds', 0) for result in results.values())
+        failed = [name for name, result in results.items() if result['status'] != 'success']
+        logger.info(
+            f"Post-load finished in {elapsed:.1f}s ({total:.1f}s of task time)"
+            + (f"; not successful: {', '.join(failed)}" if failed else "")
+        )
+        return results
+
+    def _start_ready(
+        self,
+        pool: ThreadPoolExecutor,
+        pending: Dict[str, PostLoadTask],
+        running: Dict[Future, PostLoadTask],
+        results: Dict[str, Dict[str, Any]]
+    ):
+        """Submit tasks whose waits are over; skip those with a failed dependency"""
+        progress = True
+        while progress:
+            progress = False
+            for name, task in list(pending.items()):
+                if any(wait_for not in results for wait_for in task.waits_for):
+                    continue
+                del pending[name]
+                progress = True
+
+                failed = [dep for dep in task.depends_on if results[dep]['status'] != 'success']
+                if failed:
+                    results[name] = {'status': 'skipped', 'error': f"dependency not successful: {', '.join(failed)}"}
+                    self._log_result(name, results[name])
+                    continue
+
+                logger.info(f"Post-load: starting {name}")
+                future = pool.submit(self._attempt, task)
+                running[future] = task
+
+    def _deadlines(self, running: Dict[Future, PostLoadTask]) -> Dict[Future, float]:
+        """Deadline of each running task a worker has started"""
+        return {
+            future: self._started[task.name] + self._timeout(task)
+            for future, task in running.items()
+            if task.name in self._started
+        }
+
+    def _attempt(self, task: PostLoadTask) -> Dict[str, Any]:
+        """Run a task with retries (worker thread); never raises"""
+        retries = self.retries if task.retries is None else task.retries
+        started = time.monotonic()
+        self._started[task.name] = started
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                with self.profiler.stage(f"post_load.{task.name}"):
+                    result = task.run()
+                return {
+                    'status': 'success',
+                    'duration_seconds': round(time.monotonic() - started, 1),
+                    'attempts': attempt,
+                    'result': result,
+                }
+            except Exception as e:
+                delay = RETRY_DELAY * 2 ** (attempt - 1)
+                out_of_time = time.monotonic() + delay - started >= self._timeout(task)
+                if attempt > retries or out_of_time:
+                    return {
+                        'status': 'failed',
+                        'duration_seconds': round(time.monotonic() - started, 1),
+                        'attempts': attempt,
+                        'error': str(e),
+                    }
+                logger.warning(f"Post-load: {task.name} failed (attempt {attempt}), retrying in {delay:.0f}s: {e}")
+                time.sleep(delay)
+
+    def _timeout(self, task: PostLoadTask) -> float:
+        return task.timeout or self.timeout
+
+    @staticmethod
+    def _log_result(name: str, result: Dict[str, Any]):
+        if result['status'] == 'success':
+            logger.info(
+                f"Post-load: {name} succeeded in {result['duration_seconds']:.1f}s"
+                + (f" ({result['result']})" if result.get('result') is not None else "")
+            )
+        else:
+            logger.warning(f"Post-load: {name} {result['status']}: {result.get('error')}")
@@ -0,0 +1,272 @@
+"""
+PermitIQ - ETL Profiling Mode
+Per-stage CPU and memory profiling for fetch_permits.py
+
+Enabled with `python etl/fetch_permits.py --profile` or PERMITIQ_PROFILE=true.
+Each ETL stage is wrapped in `StageProfiler.stage(name)`, which records:
+
+- Deterministic profile (cProfile) of the stage
+- Wall-clock stack samples of every thread, as folded stacks for
+  flamegraph.pl / speedscope / inferno
+- tracemalloc snapshots at the stage boundaries (PERMITIQ_PROFILE_MEMORY=false
+  skips them; allocation tracing slows allocation-heavy stages considerably)
+
+tracemalloc is process-wide: a stage's allocation diff includes whatever
+concurrent stages allocated meanwhile. Its peak is process-wide too and can
+only be reset for the whole process, so a peak is reported only for a stage
+that ran with no stage active in another thread (nested stages in its own
+thread are part of it).
+
+Reports are written next to etl.log:
+
+    etl_profile.folded      # flamegraph input: "stage;frame;frame count"
+    etl_profile.pstats      # merged cProfile stats (snakeviz, pstats)
+    etl_profile.txt         # per-stage timings and top functions
+    etl_allocations.txt     # per-stage top allocations and peak memory
+"""
+
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Stack sampling interval (seconds)
+SAMPLE_INTERVAL = 0.005
+
+# Frames kept per tracemalloc allocation; reports group by allocating line,
+# and every extra frame makes traced allocations noticeably slower
+TRACEMALLOC_FRAMES = 1
+
+# Rows per section in the text reports
+REPORT_TOP_N = 25
+
+
+class StageProfiler:
+    """
+    Profiles named ETL stages; a no-op when disabled
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        output_dir: Optional[Path] = None,
+        trace_memory: Optional[bool] = None
+    ):
+        """
+        Initialize the profiler
+
+        Args:
+            enabled: Profile stages (otherwise stage() does nothing)
+            output_dir: Where reports are written (defaults to the working
+                directory, next to etl.log)
+            trace_memory: Take tracemalloc snapshots (default: PERMITIQ_PROFILE_MEMORY, true)
+        """
+        self.enabled = enabled
+        self.output_dir = Path(output_dir or os.getenv('PERMITIQ_PROFILE_DIR') or '.')
+        if trace_memory is None:
+            trace_memory = os.getenv('PERMITIQ_PROFILE_MEMORY', 'true').lower() == 'true'
+        self.trace_memory = enabled and trace_memory
+
+        self._lock = threading.Lock()
+        self._thread_stages: Dict[int, List[str]] = {}
+        self._samples: Counter = Counter()
+        self._stage_profiles: Dict[str, cProfile.Profile] = {}
+        self._stage_times: Dict[str, float] = {}
+        self._allocations: Dict[str, Dict] = {}
+        # Only one deterministic profiler can be active at a time; concurrent
+        # stages (district pipelines) are covered by the sampler
+        self._cprofile_owner: Optional[int] = None
+        # Thread of the stage that reset the tracemalloc peak, and whether a
+        # stage in another thread has run since (its peak is then shared)
+        self._peak_owner: Optional[int] = None
+        self._peak_shared = False
+
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        if self.enabled:
+            if self.trace_memory:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._sampler = threading.Thread(target=self._sample_loop, name='profiler-sampler', daemon=True)
+            self._sampler.start()
+            logger.info(f"Profiling enabled; reports will be written to {self.output_dir.resolve()}")
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Profile a block as a named stage
+
+        Args:
+            name: Stage name (e.g. 'SWFWMD.fetch', 'load')
+        """
+        if not self.enabled:
+            yield
+            return
+
+        thread_id = threading.get_ident()
+        with self._lock:
+            active = any(self._thread_stages.values())
+            self._thread_stages.setdefault(thread_id, []).append(name)
+            use_cprofile = self._cprofile_owner is None
+            if use_cprofile:
+                self._cprofile_owner = thread_id
+            # Only a stage that starts alone owns the peak; reset_peak()
+            # would clobber the peak of a stage running in another thread
+            owns_peak = self.trace_memory and not active
+            if owns_peak:
+                self._peak_owner = thread_id
+                self._peak_shared = False
+                tracemalloc.reset_peak()
+            elif self._peak_owner is not None and self._peak_owner != thread_id:
+                self._peak_shared = True
+
+        profile = cProfile.Profile() if use_cprofile else None
+        before = None
+        if self.trace_memory:
+            before = tracemalloc.take_snapshot()
+        started = time.perf_counter()
+        if profile:
+            profile.enable()
+
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+            elapsed = time.perf_counter() - started
+            allocations = None
+            if before is not None:
+                allocations = {
+                    'peak_bytes': None,
+                    'diff': tracemalloc.take_snapshot().compare_to(before, 'lineno')[:REPORT_TOP_N],
+                }
+
+            with self._lock:
+                if owns_peak:
+                    if allocations and not self._peak_shared:
+                        allocations['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+                    self._peak_owner = None
+                self._thread_stages[thread_id].pop()
+                if profile:
+                    self._cprofile_owner = None
+                    self._stage_profiles[name] = profile
+                self._stage_times[name] = self._stage_times.get(name, 0.0) + elapsed
+                if allocations:
+                    self._allocations[name] = allocations
+
+            message = f"Profile: stage '{name}' took {elapsed:.2f}s"
+            if allocations and allocations['peak_bytes'] is not None:
+                message += f", peak traced memory {allocations['peak_bytes'] / 1_000_000:.1f} MB"
+            logger.info(message)
+
+    def _sample_loop(self) -> None:
+        """Sample every thread's stack until stopped"""
+        own_id = threading.get_ident()
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            frames = sys._current_frames()
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    stages = self._thread_stages.get(thread_id)
+                    root = stages[-1] if stages else thread_names.get(thread_id, 'unknown')
+                    self._samples[self._fold(root, frame)] += 1
+
+    @staticmethod
+    def _fold(root: str, frame) -> str:
+        """Fold a stack into 'root;outer;...;inner'"""
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        names.append(root)
+        return ';'.join(reversed(names))
+
+    def write_reports(self) -> List[Path]:
+        """
+        Stop profiling and write all reports
+
+        Returns:
+            Paths of the written files
+        """
+        if not self.enabled:
+            return []
+
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join()
+        if self.trace_memory:
+            tracemalloc.stop()
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        paths = [
+            self._write_folded(),
+            self._write_pstats(),
+            self._write_stage_report(),
+            self._write_allocation_report() if self.trace_memory else None,
+        ]
+        paths = [path for path in paths if path]
+        logger.info(f"Profiling reports written: {', '.join(str(path) for path in paths)}")
+        return paths
+
+    def _write_folded(self) -> Path:
+        path = self.output_dir / 'etl_profile.folded'
+        with open(path, 'w') as f:
+            for stack, count in sorted(self._samples.items()):
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def _write_pstats(self) -> Optional[Path]:
+        if not self._stage_profiles:
+            return None
+        path = self.output_dir / 'etl_profile.pstats'
+        pstats.Stats(*self._stage_profiles.values()).dump_stats(str(path))
+        return path
+
+    def _write_stage_report(self) -> Path:
+        path = self.output_dir / 'etl_profile.txt'
+        with open(path, 'w') as f:
+            f.write("Stage timings (wall clock)\n")
+            f.write("=" * 80 + "\n")
+            for name, elapsed in sorted(self._stage_times.items(), key=lambda item: -item[1]):
+                f.write(f"{elapsed:10.2f}s  {name}\n")
+
+            for name, profile in self._stage_profiles.items():
+                f.write(f"\n\nStage: {name} (top {REPORT_TOP_N} by cumulative time)\n")
+                f.write("=" * 80 + "\n")
+                buffer = io.StringIO()
+                pstats.Stats(profile, stream=buffer).sort_stats('cumulative').print_stats(REPORT_TOP_N)
+                f.write(buffer.getvalue())
+        return path
+
+    def _write_allocation_report(self) -> Path:
+        path = self.output_dir / 'etl_allocations.txt'
+        with open(path, 'w') as f:
+            for name, allocations in self._allocations.items():
+                if allocations['peak_bytes'] is None:
+                    f.write(f"Stage: {name} - peak not measured (overlapped stages in other threads)\n")
+                else:
+                    f.write(f"Stage: {name} - peak traced memory {allocations['peak_bytes'] / 1_000_000:.1f} MB\n")
+                f.write("=" * 80 + "\n")
+                for stat in allocations['diff']:
+                    frame = stat.traceback[0]
+                    f.write(
+                        f"{stat.size_diff / 1024:+12.1f} KiB {stat.count_diff:+9d} blocks  "
+                        f"{frame.filename}:{frame.lineno}\n"
+                    )
+                f.write("\n")
+        return path
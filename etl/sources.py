@@ -0,0 +1,218 @@
+"""
+PermitIQ - Permit Source Adapters
+Per-district ArcGIS ERP permit layers: endpoint, field mapping and rate limits
+
+Each Florida water management district publishes its ERP permits through its
+own ArcGIS layer with its own field names. A PermitSource describes one
+layer; the ETL runs one pipeline per enabled source and loads every source
+into erp_permits with its `data_source` as discriminator.
+
+Only SWFWMD's layer has a verified built-in field mapping. The other
+districts are enabled by setting both their endpoint and field mapping
+(discovered with `discover_fields.py`):
+
+    PERMITIQ_SFWMD_API_URL=https://.../MapServer/0
+    PERMITIQ_SFWMD_FIELD_MAP={"objectid": "OBJECTID", "permit_number": "PERMIT_NO", ...}
+"""
+
+import os
+import json
+import logging
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from api_scheduler import AIMDController, APIScheduler, AvailabilityWindow
+
+logger = logging.getLogger(__name__)
+
+# Canonical erp_permits columns a field mapping may provide. Dates are
+# ArcGIS epoch-millisecond fields; the shape fields feed geometry_fingerprint.
+MAPPED_FIELDS = (
+    'objectid',
+    'permit_number',
+    'applicant_name',
+    'permit_type',
+    'permit_status',
+    'activity_description',
+    'application_date',
+    'issue_date',
+    'expiration_date',
+    'last_modified_date',
+    'project_name',
+    'acreage',
+    'shape_area',
+    'shape_length',
+)
+
+# Field names based on actual API discovery (see docs/planning/api_field_discovery.json)
+SWFWMD_FIELD_MAP = {
+    'objectid': 'OBJECTID',
+    'permit_number': 'ERP_PERMIT_NBR',
+    'applicant_name': 'PERMITTEE_NAME',
+    'permit_type': 'ERP_PERMIT_TYPE_DESC',
+    'permit_status': 'ERP_STATUS_DESC',
+    'activity_description': 'ERP_ACTIVITY_DESC',
+    'application_date': 'APPLICATION_RECEIVED_DT',
+    'issue_date': 'PERMIT_ISSUE_DT',
+    'expiration_date': 'EXPIRATION_DT',
+    'last_modified_date': 'LAST_UPDATE_DT',
+    'project_name': 'PROJECT_NAME',
+    'acreage': 'PROJECT_ACRES_MS',
+    'shape_area': 'SHAPE.AREA',
+    'shape_length': 'SHAPE.LEN',
+}
+
+
+class PermitSource:
+    """
+    One district's ArcGIS permit layer
+    """
+
+    def __init__(
+        self,
+        code: str,
+        name: str,
+        field_map: Optional[Dict[str, str]] = None,
+        api_hours: Optional[Tuple[int, int]] = None,
+        max_rate: float = 2.0,
+        max_concurrency: int = 2
+    ):
+        """
+        Initialize the source
+
+        Args:
+            code: District code (SWFWMD, SFWMD, ...); also the env var prefix
+            name: District name for logs
+            field_map: Built-in canonical column -> layer field mapping
+            api_hours: (open_hour, close_hour) Eastern if the API has a service window
+            max_rate: Default upper bound on requests per second
+            max_concurrency: Default upper bound on concurrent requests
+        """
+        self.code = code
+        self.name = name
+        self.data_source = f"{code}_API"
+        self.url = os.getenv(f'PERMITIQ_{code}_API_URL')
+        self.field_map = self._load_field_map(field_map)
+        self.api_hours = api_hours
+        self.max_rate = float(os.getenv(f'PERMITIQ_{code}_MAX_RATE', max_rate))
+        self.max_concurrency = int(os.getenv(f'PERMITIQ_{code}_MAX_CONCURRENCY', max_concurrency))
+
+    def _load_field_map(self, default: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+        """
+        Read the field mapping override from PERMITIQ_<CODE>_FIELD_MAP
+
+        Args:
+            default: Built-in mapping
+
+        Returns:
+            Field mapping or None if the source has none
+        """
+        raw = os.getenv(f'PERMITIQ_{self.code}_FIELD_MAP')
+        if not raw:
+            return default
+
+        try:
+            field_map = json.loads(raw)
+        except ValueError as e:
+            logger.error(f"Invalid PERMITIQ_{self.code}_FIELD_MAP: {e}")
+            return None
+
+        unknown = set(field_map) - set(MAPPED_FIELDS)
+        if unknown:
+            logger.warning(f"{self.code} field map has unknown columns: {', '.join(sorted(unknown))}")
+        return {**(default or {}), **field_map}
+
+    @property
+    def enabled(self) -> bool:
+        """A source runs when it has an endpoint and a field mapping with the key fields"""
+        return bool(
+            self.url
+            and self.field_map
+            and self.field_map.get('objectid')
+            and self.field_map.get('permit_number')
+        )
+
+    def field(self, column: str) -> Optional[str]:
+        """Layer field name for a canonical column"""
+        return self.field_map.get(column)
+
+    def value(self, attributes: Dict[str, Any], column: str) -> Any:
+        """
+        Read a canonical column from a feature's attributes
+
+        Args:
+            attributes: Feature attributes
+            column: Canonical column name
+
+        Returns:
+            Attribute value or None if unmapped/missing
+        """
+        field = self.field_map.get(column)
+        return attributes.get(field) if field else None
+
+    @property
+    def fingerprint_fields(self) -> Tuple[str, ...]:
+        """Layer fields hashed into geometry_fingerprint"""
+        return tuple(
+            self.field_map[column]
+            for column in ('shape_area', 'shape_length')
+            if self.field_map.get(column)
+        )
+
+    def create_scheduler(self) -> APIScheduler:
+        """
+        Build this district's request scheduler
+
+        Returns:
+            Scheduler with the district's window and rate limits
+        """
+        if self.api_hours:
+            window = AvailabilityWindow(open_hour=self.api_hours[0], close_hour=self.api_hours[1])
+        else:
+            window = AvailabilityWindow(open_hour=0, close_hour=24, cutoff_margin=timedelta(0))
+
+        return APIScheduler(
+            window=window,
+            controller=AIMDController(max_rate=self.max_rate, max_concurrency=self.max_concurrency)
+        )
+
+
+def all_sources() -> List[PermitSource]:
+    """
+    Every known district source, enabled or not
+
+    Returns:
+        List of PermitSource
+    """
+    return [
+        PermitSource(
+            'SWFWMD', 'Southwest Florida WMD',
+            field_map=SWFWMD_FIELD_MAP,
+            api_hours=(6, 22),
+            max_rate=float(os.getenv('PERMITIQ_API_MAX_RATE', '5')),
+            max_concurrency=int(os.getenv('PERMITIQ_API_MAX_CONCURRENCY', '4'))
+        ),
+        PermitSource('SFWMD', 'South Florida WMD'),
+        PermitSource('SJRWMD', 'St. Johns River WMD'),
+        PermitSource('SRWMD', 'Suwannee River WMD'),
+        PermitSource('NWFWMD', 'Northwest Florida WMD'),
+    ]
+
+
+def enabled_sources() -> List[PermitSource]:
+    """
+    Sources configured for this run
+
+    Returns:
+        List of enabled PermitSource
+    """
+    sources = []
+    for source in all_sources():
+        if source.enabled:
+            sources.append(source)
+        elif source.url:
+            logger.warning(
+                f"{source.code} has an API URL but no usable field map "
+                f"(set PERMITIQ_{source.code}_FIELD_MAP); skipping"
+            )
+    return sources
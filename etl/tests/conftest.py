@@ -0,0 +1,104 @@
+"""
+PermitIQ - ETL Unit Tests: shared fixtures
+
+The ETL modules import each other as top-level modules (`from sources import
+...`), as when run from etl/, so the directory is put on sys.path here.
+
+Tests that need a database run only when PERMITIQ_TEST_DATABASE_URL points at
+a disposable database with the migrations applied; each runs in a
+transaction that is rolled back.
+
+Usage:
+    pytest etl/
+"""
+
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+
+ETL_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ETL_DIR))
+
+
+class FakeResponse:
+    def __init__(self, data: Any = None):
+        self.data = data
+
+
+class FakeQuery:
+    """Records a table write and returns no rows"""
+
+    def __init__(self, client: 'FakeSupabase', table: str):
+        self.client = client
+        self.table = table
+
+    def insert(self, row: Any, **_kwargs) -> 'FakeQuery':
+        self.client.calls.append(('insert', self.table, row))
+        return self
+
+    def upsert(self, rows: Any, **_kwargs) -> 'FakeQuery':
+        self.client.calls.append(('upsert', self.table, rows))
+        return self
+
+    def execute(self) -> FakeResponse:
+        return FakeResponse([])
+
+
+class FakeRPC:
+    def __init__(self, data: Any):
+        self.data = data
+
+    def execute(self) -> FakeResponse:
+        return FakeResponse(self.data)
+
+
+class FakeSupabase:
+    """
+    Stand-in for the supabase-py client that records calls in order
+
+    RPCs return `rpc_results[name]` (None if unset).
+    """
+
+    def __init__(self):
+        self.calls: List[Tuple[str, str, Any]] = []
+        self.rpc_results: Dict[str, Any] = {}
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> FakeRPC:
+        self.calls.append(('rpc', name, params))
+        return FakeRPC(self.rpc_results.get(name))
+
+    def rpc_names(self) -> List[str]:
+        return [name for kind, name, _ in self.calls if kind == 'rpc']
+
+
+@pytest.fixture
+def fake_supabase(monkeypatch) -> FakeSupabase:
+    """FakeSupabase returned by fetch_permits.create_client"""
+    import fetch_permits
+
+    client = FakeSupabase()
+    monkeypatch.setattr(fetch_permits, 'create_client', lambda *_args: client)
+    return client
+
+
+@pytest.fixture
+def db_cursor():
+    """Cursor on PERMITIQ_TEST_DATABASE_URL inside a rolled-back transaction"""
+    database_url = os.getenv('PERMITIQ_TEST_DATABASE_URL')
+    if not database_url:
+        pytest.skip('PERMITIQ_TEST_DATABASE_URL not set')
+    psycopg2 = pytest.importorskip('psycopg2')
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cursor:
+            yield cursor
+    finally:
+        conn.rollback()
+        conn.close()
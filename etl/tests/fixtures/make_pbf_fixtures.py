@@ -0,0 +1,268 @@
+"""
+PermitIQ - ArcGIS PBF Test Fixtures
+
+Writes `f=pbf` query responses and the matching `f=json` responses to this
+directory, for tests/test_arcgis_pbf.py. The PBF bodies are encoded here,
+independently of etl/arcgis_pbf.py, from esri's FeatureCollection.proto
+(esriPBuffer.FeatureCollectionPBuffer): quantized coordinates are delta and
+zigzag encoded per feature, with the y axis flipped for an upperLeft origin.
+
+Captured responses can be dropped in next to them as <name>.pbf/<name>.json
+pairs; the tests pick up every pair.
+
+Usage:
+    python etl/tests/fixtures/make_pbf_fixtures.py
+"""
+
+import json
+import struct
+from pathlib import Path
+
+FIXTURE_DIR = Path(__file__).resolve().parent
+
+UPPER_LEFT = 0
+LOWER_LEFT = 1
+
+# FeatureCollectionPBuffer.GeometryType / FieldType
+GEOMETRY_POLYGON = 3
+FIELD_TYPES = {
+    'esriFieldTypeSmallInteger': 0,
+    'esriFieldTypeInteger': 1,
+    'esriFieldTypeSingle': 2,
+    'esriFieldTypeDouble': 3,
+    'esriFieldTypeString': 4,
+    'esriFieldTypeDate': 5,
+    'esriFieldTypeOID': 6,
+}
+
+
+def varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = n & 0x7f
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def zigzag(n: int) -> int:
+    return (n << 1) ^ (n >> 63)
+
+
+def key(field_number: int, wire_type: int) -> bytes:
+    return varint(field_number << 3 | wire_type)
+
+
+def uint_field(field_number: int, n: int) -> bytes:
+    return key(field_number, 0) + varint(n)
+
+
+def double_field(field_number: int, x: float) -> bytes:
+    return key(field_number, 1) + struct.pack('<d', x)
+
+
+def message_field(field_number: int, body: bytes) -> bytes:
+    return key(field_number, 2) + varint(len(body)) + body
+
+
+def string_field(field_number: int, text: str) -> bytes:
+    return message_field(field_number, text.encode('utf-8'))
+
+
+def packed_field(field_number: int, values) -> bytes:
+    return message_field(field_number, b''.join(varint(v) for v in values))
+
+
+def value(kind: str, x) -> bytes:
+    """FeatureCollectionPBuffer.Value with the given oneof member"""
+    if x is None:
+        return b''
+    if kind == 'string':
+        return string_field(1, x)
+    if kind == 'float':
+        return key(2, 5) + struct.pack('<f', x)
+    if kind == 'double':
+        return double_field(3, x)
+    if kind == 'sint':
+        return uint_field(4, zigzag(x))
+    if kind == 'uint':
+        return uint_field(5, x)
+    if kind == 'int64':
+        return uint_field(6, x & (1 << 64) - 1)
+    if kind == 'uint64':
+        return uint_field(7, x)
+    if kind == 'sint64':
+        return uint_field(8, zigzag(x))
+    if kind == 'bool':
+        return uint_field(9, int(x))
+    raise ValueError(kind)
+
+
+def geometry(rings, origin: int, scale: float, translate) -> bytes:
+    """Geometry message: ring lengths and quantized, delta/zigzag coords"""
+    coords = []
+    previous = (0, 0)
+    for ring in rings:
+        for x, y in ring:
+            qx = round((x - translate[0]) / scale)
+            if origin == UPPER_LEFT:
+                qy = round((translate[1] - y) / scale)
+            else:
+                qy = round((y - translate[1]) / scale)
+            coords += [zigzag(qx - previous[0]), zigzag(qy - previous[1])]
+            previous = (qx, qy)
+    return packed_field(2, [len(ring) for ring in rings]) + packed_field(3, coords)
+
+
+def feature_collection(fields, features, origin, scale, translate, exceeded=False) -> bytes:
+    """FeatureCollectionPBuffer with a FeatureResult of polygon features"""
+    transform = (
+        uint_field(1, origin)
+        + message_field(2, double_field(1, scale) + double_field(2, scale))
+        + message_field(3, double_field(1, translate[0]) + double_field(2, translate[1]))
+    )
+    result = (
+        string_field(1, 'OBJECTID')
+        + uint_field(7, GEOMETRY_POLYGON)
+        + message_field(8, uint_field(1, 4326))
+        + (uint_field(9, 1) if exceeded else b'')
+        + message_field(12, transform)
+    )
+    # Features before fields, as the decoder must not rely on field order
+    for feature in features:
+        attributes = b''.join(
+            message_field(1, value(kind, feature['attributes'][name]))
+            for name, field_type, kind in fields
+        )
+        result += message_field(15, attributes + message_field(
+            2, geometry(feature['geometry']['rings'], origin, scale, translate)
+        ))
+    for name, field_type, kind in fields:
+        result += message_field(13, string_field(1, name) + uint_field(2, FIELD_TYPES[field_type]))
+    return string_field(1, '2.0') + message_field(2, message_field(1, result))
+
+
+def json_response(fields, features, exceeded=False):
+    """The f=json response for the same query"""
+    response = {
+        'objectIdFieldName': 'OBJECTID',
+        'geometryType': 'esriGeometryPolygon',
+        'spatialReference': {'wkid': 4326, 'latestWkid': 4326},
+        'fields': [{'name': name, 'type': field_type, 'alias': name} for name, field_type, _ in fields],
+        'features': features,
+    }
+    if exceeded:
+        response['exceededTransferLimit'] = True
+    return response
+
+
+def grid(scale, translate, points):
+    """Coordinates on the quantization grid, as the JSON response rounds them"""
+    return [[round(translate[0] + dx * scale, 9), round(translate[1] + dy * scale, 9)] for dx, dy in points]
+
+
+# Every Value oneof member, one attribute each
+PERMIT_FIELDS = [
+    ('OBJECTID', 'esriFieldTypeOID', 'uint'),
+    ('ERP_PERMIT_NBR', 'esriFieldTypeString', 'string'),
+    ('REVISION_NBR', 'esriFieldTypeSmallInteger', 'sint'),
+    ('PROJECT_ACRES_MS', 'esriFieldTypeDouble', 'double'),
+    ('SHAPE_RATIO', 'esriFieldTypeSingle', 'float'),
+    ('PERMIT_ISSUE_DT', 'esriFieldTypeDate', 'int64'),
+    ('SOURCE_ROW_ID', 'esriFieldTypeInteger', 'uint64'),
+    ('ELEVATION_DELTA', 'esriFieldTypeInteger', 'sint64'),
+    ('IS_ACTIVE', 'esriFieldTypeSmallInteger', 'bool'),
+    ('PROJECT_NAME', 'esriFieldTypeString', 'string'),
+]
+
+SCALE = 1e-6
+TRANSLATE = (-83.0, 29.0)
+
+
+def permit_features():
+    square = [(0, 0), (0, -2000), (2000, -2000), (2000, 0), (0, 0)]
+    hole = [(500, -500), (1500, -500), (1500, -1500), (500, -1500), (500, -500)]
+    second_part = [(5000, -100), (5000, -900), (5800, -900), (5800, -100), (5000, -100)]
+    return [
+        {
+            'attributes': {
+                'OBJECTID': 101,
+                'ERP_PERMIT_NBR': '43012345.001',
+                'REVISION_NBR': -3,
+                'PROJECT_ACRES_MS': 12.345,
+                'SHAPE_RATIO': 2.5,
+                'PERMIT_ISSUE_DT': 1700006400000,
+                'SOURCE_ROW_ID': 2 ** 40 + 7,
+                'ELEVATION_DELTA': -2 ** 35,
+                'IS_ACTIVE': True,
+                'PROJECT_NAME': 'Lake Wales Ridge – Phase 2',
+            },
+            # Multipart with a hole: outer, hole, second outer
+            'geometry': {'rings': [grid(SCALE, TRANSLATE, ring) for ring in (square, hole, second_part)]},
+        },
+        {
+            'attributes': {
+                'OBJECTID': 102,
+                'ERP_PERMIT_NBR': '43000001.000',
+                'REVISION_NBR': 0,
+                'PROJECT_ACRES_MS': 0.0,
+                'SHAPE_RATIO': -0.75,
+                'PERMIT_ISSUE_DT': -157766400000,  # 1965
+                'SOURCE_ROW_ID': 0,
+                'ELEVATION_DELTA': 1,
+                'IS_ACTIVE': False,
+                'PROJECT_NAME': None,
+            },
+            # Starts far from the previous feature: deltas reset per feature
+            'geometry': {'rings': [grid(SCALE, TRANSLATE, [
+                (900000, -300000), (900000, -300250), (900250, -300250), (900000, -300000)
+            ])]},
+        },
+    ]
+
+
+def main():
+    pairs = {
+        'permits_upper_left': (
+            feature_collection(PERMIT_FIELDS, permit_features(), UPPER_LEFT, SCALE, TRANSLATE, exceeded=True),
+            json_response(PERMIT_FIELDS, permit_features(), exceeded=True),
+        ),
+    }
+
+    lower_left_fields = PERMIT_FIELDS[:2]
+    lower_left_translate = (-82.5, 27.5)
+    lower_left = [{
+        'attributes': {'OBJECTID': 7, 'ERP_PERMIT_NBR': '44000007.002'},
+        'geometry': {'rings': [grid(SCALE, lower_left_translate, [
+            (0, 0), (0, 3000), (3000, 3000), (3000, 0), (0, 0)
+        ])]},
+    }]
+    pairs['permits_lower_left'] = (
+        feature_collection(lower_left_fields, lower_left, LOWER_LEFT, SCALE, lower_left_translate),
+        json_response(lower_left_fields, lower_left),
+    )
+
+    # returnCountOnly / returnIdsOnly
+    pairs['count'] = (
+        string_field(1, '2.0') + message_field(2, message_field(2, uint_field(1, 48213))),
+        {'count': 48213},
+    )
+    object_ids = [3, 17, 18, 4096, 70000]
+    pairs['object_ids'] = (
+        string_field(1, '2.0') + message_field(2, message_field(
+            3, string_field(1, 'OBJECTID') + packed_field(3, object_ids)
+        )),
+        {'objectIdFieldName': 'OBJECTID', 'objectIds': object_ids},
+    )
+
+    for name, (pbf, response) in pairs.items():
+        (FIXTURE_DIR / f'{name}.pbf').write_bytes(pbf)
+        (FIXTURE_DIR / f'{name}.json').write_text(json.dumps(response, indent=2, ensure_ascii=False) + '\n')
+        print(f"Wrote {name}.pbf ({len(pbf)} bytes) and {name}.json")
+
+
+if __name__ == '__main__':
+    main()
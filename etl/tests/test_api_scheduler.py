@@ -0,0 +1,62 @@
+"""
+PermitIQ - API Scheduler
+
+Retried 429/5xx responses are closed before the retry, so streamed requests
+don't hold their connections. By default the scheduler waits out the
+window's closure; a wait beyond PERMITIQ_API_MAX_WINDOW_WAIT_HOURS fails at
+once instead of sleeping into the job timeout.
+"""
+
+from datetime import timedelta
+
+import pytest
+
+import api_scheduler
+from api_scheduler import APIScheduler, APIUnavailableError, AvailabilityWindow
+
+
+class FakeHTTPResponse:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.headers = {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_retried_responses_are_closed(monkeypatch):
+    monkeypatch.setattr(api_scheduler.time, 'sleep', lambda seconds: None)
+    responses = [FakeHTTPResponse(429), FakeHTTPResponse(503), FakeHTTPResponse(200)]
+    sent = iter(responses)
+    scheduler = APIScheduler(window=AvailabilityWindow(open_hour=0, close_hour=24, cutoff_margin=timedelta(0)))
+    monkeypatch.setattr(scheduler.bucket, 'acquire', lambda: None)
+
+    response = scheduler.request(lambda: next(sent))
+
+    assert response is responses[2]
+    assert [r.closed for r in responses] == [True, True, False]
+
+
+def test_overnight_closure_is_waited_out_by_default(monkeypatch):
+    window = AvailabilityWindow(open_hour=6, close_hour=22)
+    # From the 21:50 cutoff until 06:00
+    closure = timedelta(hours=8, minutes=10).total_seconds()
+    monkeypatch.setattr(window, 'seconds_until_open', lambda now=None: closure)
+    slept = []
+    monkeypatch.setattr(api_scheduler.time, 'sleep', slept.append)
+    monkeypatch.delenv('PERMITIQ_API_MAX_WINDOW_WAIT_HOURS', raising=False)
+
+    APIScheduler(window=window).wait_for_window()
+
+    assert slept == [closure]
+
+
+def test_window_wait_beyond_limit_fails_fast(monkeypatch):
+    window = AvailabilityWindow(open_hour=6, close_hour=22)
+    monkeypatch.setattr(window, 'seconds_until_open', lambda now=None: 8 * 3600)
+    monkeypatch.setattr(api_scheduler.time, 'sleep', lambda seconds: pytest.fail('slept'))
+    monkeypatch.setenv('PERMITIQ_API_MAX_WINDOW_WAIT_HOURS', '5')
+
+    with pytest.raises(APIUnavailableError, match='PERMITIQ_API_MAX_WINDOW_WAIT_HOURS'):
+        APIScheduler(window=window).wait_for_window()
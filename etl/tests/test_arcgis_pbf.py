@@ -0,0 +1,44 @@
+"""
+PermitIQ - ArcGIS PBF Decoding
+
+Each `f=pbf` query response in tests/fixtures decodes to the features of
+the matching `f=json` response: quantized delta/zigzag coordinates with the
+upperLeft y flip, multipart rings split by `lengths`, and every `Value`
+type. Fixtures come in <name>.pbf/<name>.json pairs (see
+fixtures/make_pbf_fixtures.py).
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from arcgis_pbf import PBFDecodeError, decode_feature_collection
+
+FIXTURE_DIR = Path(__file__).resolve().parent / 'fixtures'
+FIXTURES = sorted(path.stem for path in FIXTURE_DIR.glob('*.pbf'))
+
+
+def approx_rings(rings):
+    return [[pytest.approx(point, abs=1e-9) for point in ring] for ring in rings]
+
+
+@pytest.mark.parametrize('name', FIXTURES)
+def test_pbf_matches_json_response(name):
+    decoded = decode_feature_collection((FIXTURE_DIR / f'{name}.pbf').read_bytes())
+    expected = json.loads((FIXTURE_DIR / f'{name}.json').read_text())
+
+    if 'features' not in expected:
+        assert decoded == {key: expected[key] for key in decoded}
+        return
+
+    assert decoded['exceededTransferLimit'] == expected.get('exceededTransferLimit', False)
+    assert len(decoded['features']) == len(expected['features'])
+    for feature, expected_feature in zip(decoded['features'], expected['features']):
+        assert feature['attributes'] == expected_feature['attributes']
+        assert feature['geometry']['rings'] == approx_rings(expected_feature['geometry']['rings'])
+
+
+def test_response_without_query_result_is_rejected():
+    with pytest.raises(PBFDecodeError):
+        decode_feature_collection(b'\x0a\x032.0')
@@ -0,0 +1,67 @@
+"""
+PermitIQ - Dashboard Payloads
+
+recent_issue_counts pages erp_permits with a keyset on id, so every row is
+counted once even when the table is larger than a page.
+"""
+
+from datetime import date
+
+import dashboard_publish
+from dashboard_publish import DashboardPublisher
+
+TODAY = date.today().isoformat()
+
+
+class PermitPages:
+    """erp_permits query that applies the id keyset and limit"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.after = None
+        self.page_size = None
+        self.requests = []
+
+    def select(self, *_args):
+        return self
+
+    def gte(self, *_args):
+        return self
+
+    def is_(self, *_args):
+        return self
+
+    def order(self, *_args):
+        return self
+
+    def gt(self, column, value):
+        self.after = value
+        return self
+
+    def limit(self, count):
+        self.page_size = count
+        return self
+
+    def execute(self):
+        self.requests.append(self.after)
+        page = [row for row in self.rows if row['id'] > self.after][:self.page_size]
+        return type('Response', (), {'data': page})()
+
+
+class PermitTable:
+    def __init__(self, query):
+        self.query = query
+
+    def table(self, name):
+        assert name == 'erp_permits'
+        return self.query
+
+
+def test_recent_issue_counts_pages_by_id(monkeypatch):
+    monkeypatch.setattr(dashboard_publish, 'DashboardCache', lambda supabase: None)
+    query = PermitPages([{'id': i, 'issue_date': TODAY} for i in range(1, 2501)])
+
+    counts = DashboardPublisher(PermitTable(query))._recent_issue_counts()
+
+    assert counts == [{'issue_date': TODAY, 'permit_count': 2500}]
+    assert query.requests == [0, 1000, 2000]
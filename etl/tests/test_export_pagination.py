@@ -0,0 +1,63 @@
+"""
+PermitIQ - Export Pagination
+
+A shard ends on an empty page, not a short one: the server caps pages
+below the requested size. GeoParquet files declare the MULTIPOLYGON column
+type (migration 018).
+"""
+
+import json
+import queue
+import threading
+
+import pytest
+
+from export_permits import MAX_PAGE_SIZE, GeoParquetExportWriter, PermitExporter
+
+
+class CappedExporter(PermitExporter):
+    """Serves ids 1..total, at most `cap` rows per page"""
+
+    def __init__(self, total: int, cap: int, page_size: int):
+        super().__init__(supabase=None, page_size=page_size)
+        self.total = total
+        self.cap = cap
+
+    def fetch_page(self, after_id, max_id, geometry_format):
+        last = min(after_id + min(self.cap, self.page_size), max_id, self.total)
+        return [{'id': i} for i in range(after_id + 1, last + 1)]
+
+
+def read_all(exporter: PermitExporter, max_id: int):
+    pages = queue.Queue()
+    exporter.read_shard(0, max_id, 'none', pages, threading.Event())
+    rows = []
+    while True:
+        page = pages.get()
+        if page is None:
+            return rows
+        rows.extend(page)
+
+
+def test_short_pages_do_not_end_the_shard():
+    exporter = CappedExporter(total=2500, cap=400, page_size=1000)
+
+    rows = read_all(exporter, max_id=10_000)
+
+    assert [row['id'] for row in rows] == list(range(1, 2501))
+
+
+@pytest.mark.parametrize('page_size', [0, MAX_PAGE_SIZE + 1])
+def test_page_size_outside_cap_is_rejected(page_size):
+    with pytest.raises(ValueError):
+        PermitExporter(supabase=None, page_size=page_size)
+
+
+def test_geoparquet_declares_multipolygon(tmp_path):
+    pytest.importorskip('pyarrow')
+
+    writer = GeoParquetExportWriter(str(tmp_path / 'permits.parquet'))
+    geo = json.loads(writer.schema.metadata[b'geo'])
+    writer.close()
+
+    assert geo['columns']['geometry']['geometry_types'] == ['MultiPolygon']
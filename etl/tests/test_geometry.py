@@ -0,0 +1,61 @@
+"""
+PermitIQ - Polygon Ring Repair
+
+ArcGIS ring orientation decides the parts of a polygon: clockwise rings are
+outer boundaries, counter-clockwise rings are holes of the preceding outer
+ring. Multipart permits must keep every part.
+"""
+
+from geometry import polygons_to_wkt, repair_polygons, ring_signed_area
+
+
+def square(x: float, y: float, size: float, clockwise: bool):
+    ring = [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+    return ring[::-1] if clockwise else ring
+
+
+def test_clockwise_rings_are_separate_parts():
+    rings = [
+        square(0, 0, 10, clockwise=True),
+        square(2, 2, 2, clockwise=False),   # hole of the first part
+        square(20, 0, 5, clockwise=True),   # second part
+    ]
+
+    polygons = repair_polygons(rings)
+
+    assert [len(polygon) for polygon in polygons] == [2, 1]
+    # OGC orientation: outer counter-clockwise, holes clockwise
+    assert ring_signed_area(polygons[0][0]) > 0
+    assert ring_signed_area(polygons[0][1]) < 0
+    assert ring_signed_area(polygons[1][0]) > 0
+
+
+def test_leading_counter_clockwise_ring_is_outer():
+    polygons = repair_polygons([square(0, 0, 10, clockwise=False), square(2, 2, 2, clockwise=False)])
+
+    assert len(polygons) == 1
+    assert len(polygons[0]) == 2
+    assert ring_signed_area(polygons[0][0]) > 0
+
+
+def test_degenerate_rings_are_dropped():
+    rings = [
+        [[0, 0], [1, 1], [0, 0]],           # too few vertices
+        [[0, 0], [1, 1], [2, 2], [0, 0]],   # no area
+        square(0, 0, 1, clockwise=True),
+    ]
+
+    assert len(repair_polygons(rings)) == 1
+    assert repair_polygons([]) == []
+
+
+def test_multipolygon_wkt_keeps_every_part():
+    polygons = repair_polygons([square(0, 0, 1, clockwise=True), square(5, 5, 1, clockwise=True)])
+
+    wkt = polygons_to_wkt(polygons)
+
+    assert wkt == (
+        'MULTIPOLYGON(((0 0, 1 0, 1 1, 0 1, 0 0)), '
+        '((5 5, 6 5, 6 6, 5 6, 5 5)))'
+    )
+    assert polygons_to_wkt([]) is None
@@ -0,0 +1,81 @@
+"""
+PermitIQ - Geometry Fetch Misses
+
+A permit whose boundary changed but whose geometry the layer didn't return
+keeps its stored polygon and its stored geometry_fingerprint, so the next
+run sees the changed fingerprint and requests the geometry again.
+"""
+
+import pytest
+
+import fetch_permits
+from sources import SWFWMD_FIELD_MAP, PermitSource
+
+STORED_FINGERPRINT = 'stored-boundary'
+
+
+class FakeAPIClient:
+    def __init__(self, features, geometries):
+        self.features = features
+        self.geometries = geometries
+
+    def fetch_all_permits(self, return_geometry=True):
+        return self.features
+
+    def fetch_geometries(self, object_ids, out_fields=None):
+        return [g for g in self.geometries if g['attributes']['OBJECTID'] in object_ids]
+
+
+def feature(objectid: int, permit_number: str, area: float):
+    return {'attributes': {'OBJECTID': objectid, 'ERP_PERMIT_NBR': permit_number, 'SHAPE.AREA': area, 'SHAPE.LEN': 10.0}}
+
+
+@pytest.fixture
+def source(monkeypatch):
+    monkeypatch.setenv('PERMITIQ_SWFWMD_API_URL', 'https://swfwmd.example/MapServer/0')
+    return PermitSource('SWFWMD', 'Southwest Florida WMD', field_map=SWFWMD_FIELD_MAP)
+
+
+UNCHANGED = feature(3, 'P-3', 9.0)
+
+
+@pytest.fixture
+def etl(fake_supabase, source, monkeypatch):
+    monkeypatch.delenv('PERMITIQ_DRY_RUN', raising=False)
+    etl = fetch_permits.PermitIQETL('https://project.supabase.co', 'service-key', [source])
+    monkeypatch.setattr(etl, 'store_raw_payloads', lambda permits: 0)
+    unchanged_fingerprint = fetch_permits.geometry_fingerprint(UNCHANGED['attributes'], source.fingerprint_fields)
+    monkeypatch.setattr(etl, 'load_stored_permit_state', lambda source: {
+        'P-1': {'objectid': 1, 'geometry_fingerprint': STORED_FINGERPRINT},
+        'P-2': {'objectid': 2, 'geometry_fingerprint': STORED_FINGERPRINT},
+        'P-3': {'objectid': 3, 'geometry_fingerprint': unchanged_fingerprint},
+    })
+    return etl
+
+
+def test_missing_geometry_keeps_stored_fingerprint(etl, source, fake_supabase):
+    square = {'rings': [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]}
+    etl.api_clients[source.code] = FakeAPIClient(
+        features=[feature(1, 'P-1', 5.0), feature(2, 'P-2', 7.0), UNCHANGED],
+        geometries=[{'attributes': {'OBJECTID': 1, 'ERP_PERMIT_NBR': 'P-1'}, 'geometry': square}],
+    )
+
+    features = etl.fetch_incremental(source)
+    permits = [fetch_permits.transform_feature(f, source) for f in features]
+    etl.upsert_permits(permits)
+
+    # postgrest-py sends the union of a batch's keys as its columns and
+    # writes NULL where a row lacks one
+    columns = {}
+    for kind, table, batch in fake_supabase.calls:
+        if kind == 'upsert':
+            sent = set().union(*batch)
+            for row in batch:
+                columns[row['permit_number']] = sent
+
+    assert 'geometry' in columns['P-1']
+    assert 'geometry' not in columns['P-3']
+    assert 'geometry_fingerprint' in columns['P-3']
+    assert 'geometry' not in columns['P-2']
+    assert 'geometry_fingerprint' not in columns['P-2']
+    assert 'geometry_pending' not in columns['P-2']
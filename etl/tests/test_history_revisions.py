@@ -0,0 +1,58 @@
+"""
+PermitIQ - Revision History Capture
+
+Revisions carry the polygon only when append_permit_history() will store
+it: on keyframes and when the geometry fingerprint changed.
+"""
+
+import pytest
+
+import fetch_permits
+from sources import SWFWMD_FIELD_MAP, PermitSource
+
+POLYGON = 'MULTIPOLYGON(((0 0, 1 0, 1 1, 0 1, 0 0)))'
+
+
+@pytest.fixture
+def etl(fake_supabase, monkeypatch):
+    monkeypatch.setenv('PERMITIQ_SWFWMD_API_URL', 'https://swfwmd.example/MapServer/0')
+    monkeypatch.setenv('PERMITIQ_HISTORY_KEYFRAME_INTERVAL', '3')
+    source = PermitSource('SWFWMD', 'Southwest Florida WMD', field_map=SWFWMD_FIELD_MAP)
+    return fetch_permits.PermitIQETL('https://project.supabase.co', 'service-key', [source])
+
+
+def revision(objectid: int, fingerprint: str, status: str = 'Issued'):
+    return {
+        'objectid': objectid,
+        'permit_number': '43000001.000',
+        'permit_status': status,
+        'geometry_fingerprint': fingerprint,
+        'geometry': POLYGON,
+    }
+
+
+def test_geometry_sent_on_keyframes_and_fingerprint_changes(etl, fake_supabase):
+    fake_supabase.rpc_results['get_permit_history_heads'] = [{
+        'permit_number': '43000001.000',
+        'objectid': 10,
+        'revision_number': 2,
+        'state_hash': 'stored',
+        'geometry_fingerprint': 'a',
+    }]
+    permits = [
+        revision(11, 'a'),                      # revision 3: boundary unchanged
+        revision(12, 'a', status='Expired'),    # revision 4: keyframe (interval 3)
+        revision(13, 'b'),                      # revision 5: boundary changed
+        revision(14, 'b', status='Issued '),    # revision 6: unchanged
+    ]
+
+    revisions = etl.select_history_revisions(etl.sources[0], permits)
+
+    assert [r['objectid'] for r in revisions] == [11, 12, 13, 14]
+    assert [r['geometry'] is not None for r in revisions] == [False, True, True, False]
+
+
+def test_first_revision_carries_geometry(etl, fake_supabase):
+    revisions = etl.select_history_revisions(etl.sources[0], [revision(1, 'a')])
+
+    assert revisions[0]['geometry'] == POLYGON
@@ -0,0 +1,121 @@
+"""
+PermitIQ - Partial Runs
+
+A run where some districts fail and others load is recorded as 'partial'.
+The loaded data must still roll the dashboard cache over: the run becomes
+the cache version (latest_successful_etl_run_id, migration 011) and the
+cache is invalidated and pre-warmed before the job fails. The job exits with
+PARTIAL_RUN_EXIT_CODE, which the workflow's publish step accepts.
+"""
+
+import uuid
+
+import pytest
+
+import fetch_permits
+from sources import SWFWMD_FIELD_MAP, PermitSource
+
+FEATURES = [{'attributes': {'OBJECTID': objectid}} for objectid in (1, 2, 3)]
+
+
+class FakePublisher:
+    published = []
+
+    def __init__(self, supabase):
+        pass
+
+    def publish(self, etl_run_id: str):
+        FakePublisher.published.append(etl_run_id)
+
+
+@pytest.fixture
+def etl(fake_supabase, monkeypatch):
+    monkeypatch.setenv('PERMITIQ_SWFWMD_API_URL', 'https://swfwmd.example/MapServer/0')
+    monkeypatch.setenv('PERMITIQ_SFWMD_API_URL', 'https://sfwmd.example/MapServer/0')
+    monkeypatch.delenv('PERMITIQ_DRY_RUN', raising=False)
+    monkeypatch.setattr(fetch_permits, 'DashboardPublisher', FakePublisher)
+    FakePublisher.published = []
+
+    sources = [
+        PermitSource('SWFWMD', 'Southwest Florida WMD', field_map=SWFWMD_FIELD_MAP),
+        PermitSource('SFWMD', 'South Florida WMD', field_map=SWFWMD_FIELD_MAP),
+    ]
+    etl = fetch_permits.PermitIQETL('https://project.supabase.co', 'service-key', sources)
+
+    def run_source_pipeline(source):
+        if source.code == 'SFWMD':
+            raise RuntimeError('window closed')
+        return FEATURES, [{'permit_number': str(f['attributes']['OBJECTID'])} for f in FEATURES], []
+
+    monkeypatch.setattr(etl, 'run_source_pipeline', run_source_pipeline)
+    monkeypatch.setattr(etl, 'upsert_permits', lambda permits: len(permits))
+    monkeypatch.setattr(etl, 'reconcile_deletions', lambda source, ids: 0)
+    return etl
+
+
+def test_partial_run_rolls_dashboard_cache_over(etl, fake_supabase):
+    with pytest.raises(RuntimeError, match='SFWMD: window closed'):
+        etl.run()
+
+    runs = [row for kind, table, row in fake_supabase.calls if kind == 'insert' and table == 'etl_runs']
+    assert len(runs) == 1
+    assert runs[0]['status'] == 'partial'
+    assert runs[0]['records_updated'] == len(FEATURES)
+    assert runs[0]['etl_run_id'] == str(etl.etl_run_id)
+    assert runs[0]['metadata']['sources']['SWFWMD']['status'] == 'success'
+    assert runs[0]['metadata']['sources']['SFWMD']['status'] == 'failed'
+
+    # The cache rolls over only after the run is recorded as its version
+    recorded = fake_supabase.calls.index(('insert', 'etl_runs', runs[0]))
+    rpcs_after = [name for kind, name, _ in fake_supabase.calls[recorded:] if kind == 'rpc']
+    assert 'invalidate_dashboard_rpc_cache' in rpcs_after
+    assert 'get_cached_dashboard_rpc' in rpcs_after
+    assert FakePublisher.published == [str(etl.etl_run_id)]
+
+
+def _record_run(cursor, status: str, records_updated: int, minutes_ago: int) -> str:
+    run_id = str(uuid.uuid4())
+    cursor.execute(
+        """
+        INSERT INTO etl_runs (etl_run_id, status, records_updated, run_date)
+        VALUES (%s, %s, %s, NOW() - make_interval(mins => %s))
+        """,
+        (run_id, status, records_updated, minutes_ago)
+    )
+    return run_id
+
+
+def test_cache_version_follows_partial_run_that_loaded(db_cursor):
+    _record_run(db_cursor, 'success', 100, minutes_ago=30)
+    partial = _record_run(db_cursor, 'partial', 40, minutes_ago=20)
+
+    db_cursor.execute("SELECT latest_successful_etl_run_id()")
+    assert str(db_cursor.fetchone()[0]) == partial
+
+
+def test_cache_version_ignores_runs_that_loaded_nothing(db_cursor):
+    loaded = _record_run(db_cursor, 'partial', 40, minutes_ago=30)
+    _record_run(db_cursor, 'partial', 0, minutes_ago=20)
+    _record_run(db_cursor, 'failed', 0, minutes_ago=10)
+
+    db_cursor.execute("SELECT latest_successful_etl_run_id()")
+    assert str(db_cursor.fetchone()[0]) == loaded
+
+
+def test_partial_run_exits_with_distinct_status(fake_supabase, monkeypatch):
+    class PartialETL:
+        def __init__(self, **_kwargs):
+            pass
+
+        def run(self):
+            raise fetch_permits.PartialRunError('Source pipelines failed: SFWMD: window closed')
+
+    monkeypatch.setenv('PERMITIQ_SUPABASE_URL', 'https://project.supabase.co')
+    monkeypatch.setenv('PERMITIQ_SUPABASE_SERVICE_KEY', 'service-key')
+    monkeypatch.setenv('PERMITIQ_SWFWMD_API_URL', 'https://swfwmd.example/MapServer/0')
+    monkeypatch.setattr(fetch_permits, 'PermitIQETL', PartialETL)
+
+    with pytest.raises(SystemExit) as exit_info:
+        fetch_permits.main([])
+
+    assert exit_info.value.code == fetch_permits.PARTIAL_RUN_EXIT_CODE
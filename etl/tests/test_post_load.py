@@ -0,0 +1,47 @@
+"""
+PermitIQ - Post-Load Timeouts
+
+A task's timeout starts when a worker picks it up, so a task queued behind
+slower ones still gets its full time. A task that runs past its timeout is
+reported as 'timeout' and its dependents are skipped.
+"""
+
+import threading
+import time
+
+from post_load import PostLoadExecutor, PostLoadTask
+
+
+def sleeper(seconds: float, result: str):
+    def run():
+        time.sleep(seconds)
+        return result
+    return run
+
+
+def test_queued_task_gets_its_full_timeout():
+    tasks = [
+        PostLoadTask('slow', sleeper(0.3, 'slow')),
+        PostLoadTask('queued', sleeper(0.3, 'queued')),
+    ]
+
+    results = PostLoadExecutor(tasks, max_workers=1, timeout=0.5, retries=0).run()
+
+    assert results['slow']['status'] == 'success'
+    assert results['queued']['status'] == 'success'
+
+
+def test_task_past_its_timeout_skips_dependents():
+    release = threading.Event()
+    tasks = [
+        PostLoadTask('stuck', release.wait, timeout=0.1),
+        PostLoadTask('dependent', sleeper(0, 'ran'), depends_on=['stuck']),
+    ]
+
+    try:
+        results = PostLoadExecutor(tasks, max_workers=2, retries=0).run()
+    finally:
+        release.set()
+
+    assert results['stuck']['status'] == 'timeout'
+    assert results['dependent']['status'] == 'skipped'
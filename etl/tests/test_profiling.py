@@ -0,0 +1,50 @@
+"""
+PermitIQ - Stage Profiler Memory Peaks
+
+tracemalloc's peak is process-wide and reset_peak() resets it for every
+thread, so a peak is reported only for a stage that ran with no stage active
+in another thread.
+"""
+
+import threading
+
+import pytest
+
+from profiling import StageProfiler
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    profiler = StageProfiler(enabled=True, output_dir=tmp_path, trace_memory=True)
+    yield profiler
+    profiler.write_reports()
+
+
+def test_stage_running_alone_reports_its_peak(profiler):
+    with profiler.stage('load'):
+        with profiler.stage('load.batch'):
+            block = bytearray(2_000_000)
+        del block
+
+    assert profiler._allocations['load']['peak_bytes'] >= 2_000_000
+    assert profiler._allocations['load.batch']['peak_bytes'] is None
+
+
+def test_overlapping_stages_report_no_peak(profiler):
+    started = threading.Event()
+    release = threading.Event()
+
+    def pipeline():
+        with profiler.stage('SFWMD.fetch'):
+            started.set()
+            release.wait(5)
+
+    with profiler.stage('SWFWMD.fetch'):
+        thread = threading.Thread(target=pipeline)
+        thread.start()
+        started.wait(5)
+    release.set()
+    thread.join()
+
+    assert profiler._allocations['SWFWMD.fetch']['peak_bytes'] is None
+    assert profiler._allocations['SFWMD.fetch']['peak_bytes'] is None
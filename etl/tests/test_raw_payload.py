@@ -0,0 +1,32 @@
+"""
+PermitIQ - Raw Payloads
+
+The raw payload stored in erp_permit_raw is the feature's attributes as the
+API sent them: mapped fields keep their ArcGIS names and raw values.
+"""
+
+import pytest
+
+import fetch_permits
+from sources import SWFWMD_FIELD_MAP, PermitSource
+
+ATTRIBUTES = {
+    'OBJECTID': 7,
+    'ERP_PERMIT_NBR': 43012345,
+    'PERMIT_ISSUE_DT': 1700000000000,
+    'COUNTY_NAME': 'Polk',
+}
+
+
+@pytest.fixture
+def source(monkeypatch):
+    monkeypatch.setenv('PERMITIQ_SWFWMD_API_URL', 'https://swfwmd.example/MapServer/0')
+    return PermitSource('SWFWMD', 'Southwest Florida WMD', field_map=SWFWMD_FIELD_MAP)
+
+
+def test_payload_keeps_mapped_attributes_as_sent(source):
+    permit = fetch_permits.transform_feature({'attributes': ATTRIBUTES}, source)
+
+    assert permit['raw_data'] == ATTRIBUTES
+    assert permit['permit_number'] == '43012345'
+    assert permit['raw_hash'] == fetch_permits.raw_payload(dict(reversed(ATTRIBUTES.items())))[1]
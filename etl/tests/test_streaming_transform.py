@@ -0,0 +1,82 @@
+"""
+PermitIQ - Transform While Fetching
+
+In full mode, sources below PARALLEL_TRANSFORM_MIN_RECORDS transform each
+feature in the fetch thread as soon as it is decoded, so transform starts
+before a page has finished downloading. Larger sources send whole pages to
+the process pool. Both return the features and permits in feature order.
+"""
+
+import pytest
+
+import fetch_permits
+from sources import SWFWMD_FIELD_MAP, PermitSource
+
+
+def feature(objectid: int):
+    return {'attributes': {'OBJECTID': objectid, 'ERP_PERMIT_NBR': f'P{objectid}'}}
+
+
+@pytest.fixture
+def source(monkeypatch):
+    monkeypatch.setenv('PERMITIQ_SWFWMD_API_URL', 'https://swfwmd.example/MapServer/0')
+    return PermitSource('SWFWMD', 'Southwest Florida WMD', field_map=SWFWMD_FIELD_MAP)
+
+
+@pytest.fixture
+def etl(fake_supabase, source):
+    return fetch_permits.PermitIQETL('https://project.supabase.co', 'service-key', [source])
+
+
+def stub_api(etl, monkeypatch, total: int, events: list):
+    client = etl.api_clients['SWFWMD']
+
+    def iter_query_features(params, timeout=60):
+        offset = params['resultOffset']
+        for objectid in range(offset + 1, min(offset + params['resultRecordCount'], total) + 1):
+            events.append(('decoded', objectid))
+            yield feature(objectid)
+
+    def transform(feature, source):
+        objectid = feature['attributes']['OBJECTID']
+        events.append(('transformed', objectid))
+        return {'objectid': objectid}
+
+    monkeypatch.setattr(client, 'get_record_count', lambda: total)
+    monkeypatch.setattr(client, '_iter_query_features', iter_query_features)
+    monkeypatch.setattr(fetch_permits, 'transform_feature', transform)
+
+
+def test_small_source_transforms_features_as_they_are_decoded(etl, source, monkeypatch):
+    events = []
+    stub_api(etl, monkeypatch, 3, events)
+
+    raw, permits = etl.fetch_and_transform(source)
+
+    assert [f['attributes']['OBJECTID'] for f in raw] == [1, 2, 3]
+    assert [p['objectid'] for p in permits] == [1, 2, 3]
+    # Feature 1 is transformed before the rest of its page is decoded
+    assert events[:2] == [('decoded', 1), ('transformed', 1)]
+
+
+def test_large_source_keeps_feature_order(etl, source, monkeypatch):
+    events = []
+    total = fetch_permits.PARALLEL_TRANSFORM_MIN_RECORDS + 500
+    stub_api(etl, monkeypatch, total, events)
+    etl.transform_workers = 2
+    submitted = []
+
+    class InlinePool:
+        def submit(self, fn, page):
+            submitted.append(len(page[0]))
+            future = fetch_permits.Future()
+            future.set_result(fn(page))
+            return future
+
+    monkeypatch.setattr(etl, 'transform_pool', lambda: InlinePool())
+
+    raw, permits = etl.fetch_and_transform(source)
+
+    assert [p['objectid'] for p in permits] == list(range(1, total + 1))
+    assert len(raw) == total
+    assert sum(submitted) == total
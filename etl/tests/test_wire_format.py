@@ -0,0 +1,81 @@
+"""
+PermitIQ - PBF to JSON Fallback
+
+Feature queries fall back from f=pbf to f=json, for the rest of the run, only
+when the server refuses the format. Throttling and outages that outlast the
+scheduler's retries fail the query and keep PBF for later queries.
+"""
+
+import json
+
+import pytest
+
+import fetch_permits
+
+
+class HTTPStatusError(Exception):
+    pass
+
+
+class FakeHTTPResponse:
+    def __init__(self, status_code: int, content_type: str = 'application/json', body: bytes = b''):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.headers = {'Content-Type': content_type}
+        self.content = body
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise HTTPStatusError(f"HTTP {self.status_code}")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size):
+        yield self.content
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.delenv('PERMITIQ_API_FORMAT', raising=False)
+    return fetch_permits.SWFWMDAPIClient('https://swfwmd.example/MapServer/0')
+
+
+def query(client, pbf_response):
+    json_response = FakeHTTPResponse(200, body=b'{"features": [{"attributes": {"OBJECTID": 1}}]}')
+
+    def get(url, params, timeout, stream=False):
+        return pbf_response if params['f'] == 'pbf' else json_response
+
+    client._get = get
+    return list(client._iter_query_features({'where': '1=1'}))
+
+
+@pytest.mark.parametrize('response', [
+    FakeHTTPResponse(429),
+    FakeHTTPResponse(503),
+    FakeHTTPResponse(200, body=b'{"error": {"code": 429, "message": "Too many requests"}}'),
+])
+def test_throttling_keeps_pbf(client, response):
+    with pytest.raises((HTTPStatusError, ValueError)):
+        query(client, response)
+
+    assert client.wire_format == 'pbf'
+
+
+@pytest.mark.parametrize('response', [
+    FakeHTTPResponse(400),
+    FakeHTTPResponse(200, body=b'{"error": {"code": 400, "message": "Invalid format"}}'),
+    FakeHTTPResponse(200, content_type='text/html'),
+])
+def test_format_refusal_falls_back_to_json(client, response):
+    features = query(client, response)
+
+    assert features == [{'attributes': {'OBJECTID': 1}}]
+    assert client.wire_format == 'json'
@@ -76,7 +76,7 @@ function getTileLayerConfig(baseMapType: BaseMapType) {
 }
 
 // Helper function to parse geometry from GeoJSON and convert to Leaflet coordinate format
-function parseGeometry(geometryJson: Json | null | undefined): [number, number][] | [number, number][][] | null {
+function parseGeometry(geometryJson: Json | null | undefined): [number, number][] | [number, number][][][] | null {
   if (!geometryJson) return null
   
   try {
@@ -91,8 +91,10 @@ function parseGeometry(geometryJson: Json | null | undefined): [number, number][
       return geom.coordinates[0].map(([lng, lat]: [number, number]) => [lat, lng])
     } else if (geom.type === 'MultiPolygon') {
       // MultiPolygon coordinates are [[[[lng, lat], ...]], ...]
-      // Return the first polygon for simplicity
-      return geom.coordinates[0][0].map(([lng, lat]: [number, number]) => [lat, lng])
+      // Leaflet draws every part from [[[lat, lng], ...]], ...] (rings of each part)
+      return geom.coordinates.map((polygon: [number, number][][]) =>
+        polygon.map((ring) => ring.map(([lng, lat]) => [lat, lng] as [number, number]))
+      )
     }
     
     return null
@@ -156,6 +158,7 @@ export function PermitMap({ initialPermits = [] }: PermitMapProps) {
             .select('*')
             .not('latitude', 'is', null)
             .not('longitude', 'is', null)
+            .is('source_removed_at', null)
           
           // Apply date filter for 5 years if not "all"
           if (dataRange === '5years') {
@@ -192,6 +195,7 @@ export function PermitMap({ initialPermits = [] }: PermitMapProps) {
           .select('*', { count: 'exact', head: true })
           .not('latitude', 'is', null)
           .not('longitude', 'is', null)
+          .is('source_removed_at', null)
 
         setTotalAvailable(count || 0)
         console.log(`✅ Loaded ${allPermits.length} permits (${count} total available with coordinates)`)
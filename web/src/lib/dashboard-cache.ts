@@ -0,0 +1,32 @@
+import { createClient } from '@/lib/supabase/server'
+
+type ServerClient = Awaited<ReturnType<typeof createClient>>
+
+/**
+ * Call a dashboard RPC through the run-versioned result cache
+ * (get_cached_dashboard_rpc, see database/migrations/011_add_dashboard_rpc_cache.sql).
+ *
+ * Cached results are keyed by the latest successful ETL run, so they are
+ * exactly what the live RPC would return. Falls back to the live RPC if the
+ * cache function is unavailable.
+ */
+export async function cachedRpc<T = unknown>(
+  supabase: ServerClient,
+  functionName: string,
+  args: Record<string, unknown> = {}
+): Promise<{ data: T[] | null; error: unknown }> {
+  // eslint-disable-next-line @typescript-eslint/no-explicit-any
+  const client = supabase as any
+
+  const cached = await client.rpc('get_cached_dashboard_rpc', {
+    p_function_name: functionName,
+    p_args: args,
+  })
+  if (!cached.error) {
+    return { data: cached.data as T[] | null, error: null }
+  }
+
+  console.error(`Dashboard cache unavailable for ${functionName}, using live RPC:`, cached.error)
+  const live = await client.rpc(functionName, args)
+  return { data: live.data as T[] | null, error: live.error }
+}
@@ -0,0 +1,92 @@
+import { gunzipSync } from 'node:zlib'
+
+/**
+ * Static dashboard payloads published by the ETL (etl/dashboard_publish.py)
+ * into public/data/dashboard and served from the CDN.
+ */
+
+const PAYLOAD_PATH = '/data/dashboard'
+
+// Revalidate in step with the dashboard page
+const REVALIDATE_SECONDS = 300
+
+export interface DashboardManifest {
+  version: string
+  generated_at: string
+  payloads: Record<string, string>
+}
+
+type QueryResult<T> = { data: T[] | null; error: unknown }
+
+function siteUrl(): string | null {
+  // URL is set by Netlify at build and runtime; NEXT_PUBLIC_APP_URL elsewhere
+  return process.env.URL || process.env.NEXT_PUBLIC_APP_URL || null
+}
+
+export async function loadDashboardManifest(): Promise<DashboardManifest | null> {
+  const baseUrl = siteUrl()
+  if (!baseUrl) return null
+
+  try {
+    const response = await fetch(`${baseUrl}${PAYLOAD_PATH}/manifest.json`, {
+      next: { revalidate: REVALIDATE_SECONDS },
+    })
+    if (!response.ok) return null
+
+    const manifest = await response.json()
+    return manifest?.version && manifest?.payloads ? manifest as DashboardManifest : null
+  } catch {
+    return null
+  }
+}
+
+export async function loadDashboardPayload<T>(
+  manifest: DashboardManifest | null,
+  name: string
+): Promise<T | null> {
+  const baseUrl = siteUrl()
+  const file = manifest?.payloads[name]
+  if (!baseUrl || !file) return null
+
+  try {
+    // Payload paths are versioned, so the CDN can cache them forever
+    const response = await fetch(`${baseUrl}${PAYLOAD_PATH}/${file}`, {
+      cache: 'force-cache',
+    })
+    if (!response.ok) return null
+
+    const body = Buffer.from(await response.arrayBuffer())
+    return JSON.parse(gunzipSync(body).toString('utf-8')) as T
+  } catch {
+    // Missing file (SPA fallback returns HTML) or corrupt payload
+    return null
+  }
+}
+
+/**
+ * Read a published payload, falling back to a live query when it is missing.
+ */
+export async function payloadOrLive<T>(
+  manifest: DashboardManifest | null,
+  name: string,
+  live: () => PromiseLike<QueryResult<T>>
+): Promise<QueryResult<T>> {
+  const payload = await loadDashboardPayload<T[]>(manifest, name)
+  if (payload) {
+    return { data: payload, error: null }
+  }
+  return live()
+}
+
+/**
+ * Count permits issued in the last `days` days from the published daily counts.
+ */
+export function countRecentIssues(
+  rows: { issue_date: string; permit_count: number }[],
+  days: number
+): number {
+  const since = new Date(Date.now() - days * 24 * 60 * 60 * 1000).toISOString().slice(0, 10)
+  return rows
+    .filter(row => row.issue_date >= since)
+    .reduce((sum, row) => sum + row.permit_count, 0)
+}